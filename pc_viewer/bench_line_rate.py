@@ -0,0 +1,212 @@
+"""Maximum sustained line rate of the viewer's receive path, before and after batching.
+
+Two measurements, both without the cv2 window:
+  decode   - header parse + scatter into the frame, datagrams already in memory
+             (legacy unpacks every line; the batched path keeps lines packed like the viewer)
+  loopback - datagrams queued on a loopback UDP socket and drained by the receive loop
+             (recvfrom per line vs. RecvBatch.fill + decode_batch + FrameAssembler)
+
+Usage:
+    python bench_line_rate.py [--frames 20] [--burst 2000] [--rounds 20]
+"""
+import argparse
+import socket
+import struct
+import time
+
+import numpy as np
+
+import udp_binary_viewer as viewer
+
+# 1280x720 @ 30 fps
+REALTIME_LINE_RATE = viewer.IMAGE_HEIGHT * 30
+
+# Optional: map incoming line index by modulo H to absorb wrap-around/overflow
+MAP_LINEIDX_BY_MOD = True
+
+
+# ---- Per-line helpers of the original receive loop, kept as the legacy baseline ----
+def bitpack_to_bytes(line_bits: bytes) -> np.ndarray:
+    """Convert 160 bytes (each bit a pixel) to 1280 uint8 pixels {0,255}.
+
+    V1: Each byte from FPGA assumed MSB->LSB is left->right pixel order.
+        If your hardware packs in LSB-first, flip with np.unpackbits(bitorder='little').
+    """
+    assert len(line_bits) == viewer.BYTES_PER_LINE
+    # Convert to bits array of shape (1280,) values in {0,1}
+    bitorder = 'big' if viewer.BITORDER_MSB_FIRST else 'little'
+    bits = np.unpackbits(np.frombuffer(line_bits, dtype=np.uint8), bitorder=bitorder)
+    # Map to 0/255 and ensure shape (H, W)
+    return (bits * 255).astype(np.uint8)
+
+
+def parse_line_index(hdr2: bytes) -> tuple[int | None, str]:
+    """Return (line_idx, how) with auto-handling of endianness and 0/1-based.
+    how in {"BE","LE","AMB","INV"} for diagnostics.
+    """
+    be = struct.unpack('>H', hdr2)[0]
+    le = struct.unpack('<H', hdr2)[0]
+    # Try the configured byte order (LINE_NUM_STRUCT) first
+    orders = [(be, 'BE'), (le, 'LE')]
+    if viewer.LINE_NUM_STRUCT.startswith('<'):
+        orders.reverse()
+
+    candidates = []
+    for value, how in orders:
+        # Accept 0-based direct
+        if 0 <= value < viewer.IMAGE_HEIGHT:
+            candidates.append((value, how))
+        # Accept 1-based -> 0-based
+        if 1 <= value <= viewer.IMAGE_HEIGHT:
+            candidates.append((value - 1, how))
+
+    # Deduplicate by index value, keep preference: configured order first
+    if not candidates:
+        return None, 'INV'
+    # pick the first unique value; prefer a candidate in the configured order if available
+    # group by index
+    preferred = orders[0][1]
+    seen = {}
+    for idx, how in candidates:
+        if idx not in seen:
+            seen[idx] = how
+            # prefer the configured order if it appears
+            if how == preferred:
+                break
+    # choose first entry in seen
+    idx = next(iter(seen.keys()))
+    how = seen[idx]
+    return idx, how
+
+
+def make_datagrams(n_lines: int, seed: int = 0) -> list[bytes]:
+    """Random edge lines with the viewer's default header layout, cycling through line numbers."""
+    rng = np.random.default_rng(seed)
+    payload = rng.integers(0, 256, size=(n_lines, viewer.BYTES_PER_LINE), dtype=np.uint8)
+    return [struct.pack(viewer.LINE_NUM_STRUCT, i % viewer.IMAGE_HEIGHT) + payload[i].tobytes()
+            for i in range(n_lines)]
+
+
+def legacy_decode(data: bytes, frame: np.ndarray, lines_received: np.ndarray) -> None:
+    """Per-line body of the original main() loop (without the debug print)."""
+    if len(data) < viewer.PAYLOAD_LEN:
+        return
+    line_idx, how = parse_line_index(data[0:2])
+    if line_idx is None:
+        return
+    if MAP_LINEIDX_BY_MOD:
+        line_idx = int(line_idx) % viewer.IMAGE_HEIGHT
+    line_bits = data[viewer.LINE_HEADER_LEN:viewer.LINE_HEADER_LEN + viewer.BYTES_PER_LINE]
+    frame[line_idx, :] = bitpack_to_bytes(line_bits)
+    lines_received[line_idx] = True
+
+
+def assemble(assembler: "viewer.FrameAssembler", batch: "viewer.RecvBatch") -> None:
+    rows, pixels, frames = viewer.decode_batch(batch, packed=True)
+    assembler.add_lines(rows, pixels, time.time(), frames)
+
+
+def bench_decode(datagrams: list[bytes]) -> tuple[float, float]:
+    frame = viewer.make_frame_buffer()
+    lines_received = np.zeros(viewer.IMAGE_HEIGHT, dtype=np.bool_)
+
+    t0 = time.perf_counter()
+    for data in datagrams:
+        legacy_decode(data, frame, lines_received)
+    legacy = len(datagrams) / (time.perf_counter() - t0)
+
+    # Batches are pre-filled outside the timed region; RecvBatch.fill is covered by the loopback run
+    batches = []
+    for start in range(0, len(datagrams), viewer.RECV_BATCH):
+        chunk = datagrams[start:start + viewer.RECV_BATCH]
+        batch = viewer.RecvBatch(slot_size=viewer.PAYLOAD_LEN)
+        batch.buf[:len(chunk)] = np.frombuffer(b"".join(chunk), dtype=np.uint8).reshape(len(chunk), -1)
+        batch.lengths[:len(chunk)] = viewer.PAYLOAD_LEN
+        batch.count = len(chunk)
+        batches.append(batch)
+    assembler = viewer.FrameAssembler(lambda f: None, packed=True)
+    assemble(assembler, batches[-1])  # warm-up (lazy imports)
+    t0 = time.perf_counter()
+    for batch in batches:
+        assemble(assembler, batch)
+    batched = len(datagrams) / (time.perf_counter() - t0)
+    return legacy, batched
+
+
+def drain_legacy(sock: socket.socket, frame: np.ndarray, lines_received: np.ndarray) -> int:
+    n = 0
+    while True:
+        try:
+            data, _ = sock.recvfrom(viewer.RECV_BUF_SIZE)
+        except (BlockingIOError, socket.timeout):
+            return n
+        legacy_decode(data, frame, lines_received)
+        n += 1
+
+
+def drain_batched(sock: socket.socket, batch: "viewer.RecvBatch", assembler: "viewer.FrameAssembler") -> int:
+    n = 0
+    while True:
+        count = batch.fill(sock)
+        assemble(assembler, batch)
+        n += count
+        if count < batch.capacity:
+            return n
+
+
+def bench_loopback(datagrams: list[bytes], rounds: int) -> tuple[float, float, int]:
+    """Queue `len(datagrams)` datagrams, then time how fast each loop drains them."""
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, viewer.SOCKET_RCVBUF)
+    rx.bind(("127.0.0.1", 0))
+    rx.settimeout(0.0)
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    dst = rx.getsockname()
+
+    frame = viewer.make_frame_buffer()
+    lines_received = np.zeros(viewer.IMAGE_HEIGHT, dtype=np.bool_)
+    batch = viewer.RecvBatch()
+    assembler = viewer.FrameAssembler(lambda f: None, packed=True)
+    rates = {"legacy": [], "batched": []}
+    lost = 0
+    for _ in range(rounds):
+        for name in rates:
+            for data in datagrams:
+                tx.sendto(data, dst)
+            t0 = time.perf_counter()
+            if name == "legacy":
+                got = drain_legacy(rx, frame, lines_received)
+            else:
+                got = drain_batched(rx, batch, assembler)
+            rates[name].append(got / (time.perf_counter() - t0))
+            lost += len(datagrams) - got
+    tx.close()
+    rx.close()
+    return float(np.median(rates["legacy"])), float(np.median(rates["batched"])), lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20, help="frames decoded in the in-memory benchmark")
+    parser.add_argument("--burst", type=int, default=2000,
+                        help="datagrams queued per loopback round (keep below what SO_RCVBUF holds)")
+    parser.add_argument("--rounds", type=int, default=20, help="loopback rounds per receive loop")
+    args = parser.parse_args()
+    viewer.DEBUG_PRINT_FIRST_N = 0
+
+    datagrams = make_datagrams(args.frames * viewer.IMAGE_HEIGHT)
+    legacy, batched = bench_decode(datagrams)
+    print(f"decode   legacy : {legacy:12,.0f} lines/s  ({legacy / REALTIME_LINE_RATE:6.2f}x realtime)")
+    print(f"decode   batched: {batched:12,.0f} lines/s  ({batched / REALTIME_LINE_RATE:6.2f}x realtime)"
+          f"  speedup {batched / legacy:.1f}x")
+
+    legacy, batched, lost = bench_loopback(datagrams[:args.burst], args.rounds)
+    print(f"loopback legacy : {legacy:12,.0f} lines/s  ({legacy / REALTIME_LINE_RATE:6.2f}x realtime)")
+    print(f"loopback batched: {batched:12,.0f} lines/s  ({batched / REALTIME_LINE_RATE:6.2f}x realtime)"
+          f"  speedup {batched / legacy:.1f}x")
+    if lost:
+        print(f"WARNING: {lost} datagrams dropped by the kernel; lower --burst or raise SO_RCVBUF (rmem_max)")
+
+
+if __name__ == "__main__":
+    main()
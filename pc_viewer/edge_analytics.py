@@ -0,0 +1,197 @@
+"""Per-frame analytics on received edge frames, computed in a worker pool beside the receiver.
+
+For every frame handed to AnalyticsStage.submit():
+    edge_count, density        edge pixels (0 bits in sobel.v output) and their fraction
+    row_hist, col_hist         edge pixels per image row / column
+    bbox                       (x0, y0, x1, y1) of all edge pixels, None if there are none
+    region_density             edge fraction per cell of a REGION_GRID grid
+    components                 8-connected edge components of at least MIN_COMPONENT_AREA pixels
+    largest                    (x, y, w, h, area) of the largest components
+Rows that were never received count as edge-free.
+
+submit() never blocks: frames wait in a bounded queue, and when it is full
+the frame is skipped (policy "skip") or the oldest queued frame is replaced
+(policy "drop-oldest"); both are counted in `skipped`. Results carry the
+frame's sequence number and can arrive out of order with several workers.
+
+    python udp_binary_viewer.py --analytics --analytics-out results.jsonl
+"""
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+REGION_GRID = (4, 8)         # rows x columns of the region density grid
+MIN_COMPONENT_AREA = 20      # pixels; smaller components are counted as noise
+LARGEST_COMPONENTS = 5
+ANALYTICS_QUEUE = 4          # frames waiting for a worker
+ANALYTICS_WORKERS = 2
+
+SKIP = "skip"
+DROP_OLDEST = "drop-oldest"
+
+# Number of set bits per byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+class FrameStats:
+    """Analytics result for one frame."""
+
+    def __init__(self, seq: int, t_first: float, missing: int):
+        self.seq = seq
+        self.t_first = t_first
+        self.missing = missing
+        self.edge_count = 0
+        self.density = 0.0
+        self.row_hist = None
+        self.col_hist = None
+        self.bbox = None
+        self.region_density = None
+        self.components = 0
+        self.largest = []
+        self.seconds = 0.0     # time spent computing this result
+
+    def to_json(self) -> dict:
+        return {
+            "seq": self.seq, "t_first": self.t_first, "missing": self.missing,
+            "edge_count": self.edge_count, "density": self.density, "bbox": self.bbox,
+            "components": self.components, "largest": self.largest,
+            "region_density": self.region_density.round(5).tolist(),
+            "row_hist": self.row_hist.tolist(), "col_hist": self.col_hist.tolist(),
+        }
+
+
+def analyze(packed: np.ndarray, lines_received: np.ndarray, seq: int = -1, t_first: float = 0.0,
+            msb_first: bool = True, grid: tuple[int, int] = REGION_GRID) -> FrameStats:
+    """Compute FrameStats for one packed (height, width / 8) frame."""
+    t0 = time.perf_counter()
+    height, bytes_per_line = packed.shape
+    width = bytes_per_line * 8
+    result = FrameStats(seq, t_first, height - int(np.count_nonzero(lines_received)))
+
+    edges_packed = np.invert(packed)  # 1 bit = edge
+    if result.missing:
+        edges_packed[~lines_received] = 0
+    counts = POPCOUNT[edges_packed]   # edge pixels per byte, (height, bytes_per_line)
+
+    result.row_hist = counts.sum(axis=1, dtype=np.int32)
+    result.edge_count = int(result.row_hist.sum())
+    result.density = result.edge_count / (height * width)
+
+    grid_rows, grid_cols = grid
+    if height % grid_rows == 0 and bytes_per_line % grid_cols == 0:
+        # Whole bytes per cell: sum the per-byte counts, no unpacking needed
+        cells = counts.reshape(grid_rows, height // grid_rows, grid_cols, bytes_per_line // grid_cols)
+        result.region_density = cells.sum(axis=(1, 3)) / ((height // grid_rows) * (width // grid_cols))
+
+    edges = np.unpackbits(edges_packed, axis=1, bitorder="big" if msb_first else "little")
+    result.col_hist = edges.sum(axis=0, dtype=np.int32)
+    if result.region_density is None:
+        row_edges = np.linspace(0, height, grid_rows + 1).astype(int)
+        col_edges = np.linspace(0, width, grid_cols + 1).astype(int)
+        sums = np.add.reduceat(np.add.reduceat(edges, row_edges[:-1], axis=0, dtype=np.int32),
+                               col_edges[:-1], axis=1)
+        result.region_density = sums / np.outer(np.diff(row_edges), np.diff(col_edges))
+
+    if result.edge_count:
+        ys = np.flatnonzero(result.row_hist)
+        xs = np.flatnonzero(result.col_hist)
+        result.bbox = (int(xs[0]), int(ys[0]), int(xs[-1]), int(ys[-1]))
+        n, _, stats, _ = cv2.connectedComponentsWithStats(edges, connectivity=8)
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        keep = np.flatnonzero(areas >= MIN_COMPONENT_AREA) + 1
+        result.components = int(keep.size)
+        top = keep[np.argsort(stats[keep, cv2.CC_STAT_AREA])[::-1][:LARGEST_COMPONENTS]]
+        result.largest = stats[top].tolist()
+    result.seconds = time.perf_counter() - t0
+    return result
+
+
+class AnalyticsStage:
+    """Bounded queue + worker threads running analyze() on submitted frames.
+
+    on_result(FrameStats) is called from a worker thread. The latest result
+    is also kept in `latest`, and every result is appended to `out_path` as
+    one JSON line if given.
+    """
+
+    def __init__(self, on_result=None, workers: int = ANALYTICS_WORKERS, maxsize: int = ANALYTICS_QUEUE,
+                 policy: str = SKIP, out_path: str | None = None, msb_first: bool = True):
+        if policy not in (SKIP, DROP_OLDEST):
+            raise ValueError(f"policy must be {SKIP!r} or {DROP_OLDEST!r}, got {policy!r}")
+        self.on_result = on_result
+        self.policy = policy
+        self.msb_first = msb_first
+        self.submitted = 0
+        self.skipped = 0
+        self.done = 0
+        self.busy_seconds = 0.0
+        self.latest: FrameStats | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._out = open(out_path, "w") if out_path else None
+        self._workers = [threading.Thread(target=self._run, name=f"analytics-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, packed: np.ndarray, lines_received: np.ndarray, seq: int, t_first: float) -> bool:
+        """Queue a copy of the frame; return False if it (or an older frame) was skipped."""
+        item = (packed.copy(), lines_received.copy(), seq, t_first)
+        self.submitted += 1
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        self.skipped += 1
+        if self.policy == DROP_OLDEST:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                pass  # another submitter refilled it; this frame counts as the skipped one
+        return False
+
+    def submit_frame(self, frame) -> bool:
+        """submit() a packed fpga_stream.AssembledFrame."""
+        return self.submit(frame.pixels, frame.lines_received, frame.seq, frame.t_first)
+
+    def stats(self) -> str:
+        latest = self.latest
+        summary = (f" seq={latest.seq} density={latest.density:.4f} components={latest.components}"
+                   if latest is not None else "")
+        per_frame = self.busy_seconds / max(1, self.done) * 1e3
+        return (f"analytics done={self.done} skipped={self.skipped} queued={self._queue.qsize()} "
+                f"{per_frame:.1f} ms/frame{summary}")
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._out is not None:
+            self._out.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            packed, lines_received, seq, t_first = item
+            result = analyze(packed, lines_received, seq, t_first, self.msb_first)
+            with self._lock:
+                self.done += 1
+                self.busy_seconds += result.seconds
+                if self.latest is None or result.seq > self.latest.seq:
+                    self.latest = result
+                if self._out is not None:
+                    self._out.write(json.dumps(result.to_json()) + "\n")
+            if self.on_result is not None:
+                self.on_result(result)
@@ -0,0 +1,365 @@
+"""Compact archive format for sparse 1bpp edge frames, encoded in a worker pool.
+
+Each frame is stored as one zlib stream of
+    [row mode bitmap, height bits][height x bytes_per_line transformed rows]
+where every row is either XOR-ed with the same row of the previous frame
+(mode bit 1: static parts of the scene become zero bytes) or inverted
+(mode bit 0: edges are 0 bits in sobel.v output, so a mostly empty row
+becomes zero bytes), whichever leaves fewer non-zero bytes. Every
+`keyframe_interval`-th frame uses inverted rows only, so decoding can start
+there; frames between keyframes decode from their predecessor in O(1).
+
+Typical ratios on 1280x720 Sobel output (4 % edges): ~5x while the camera
+moves, 50-90x for a static scene.
+
+Layout of `<name>`:
+    file header   magic, version, height, bytes_per_line, keyframe_interval
+    records       [record header: length, flags, seq, t_first, t_last, missing]
+                  [missing-line bitmap if missing > 0][zlib payload]
+Layout of `<name>.idx.npy` (written on close; rebuilt by scanning if absent):
+    offset, length, key, seq, t_first, t_last, missing, missing_mask
+
+Usage:
+    python edge_codec.py encode capture.frames capture.edgez --workers 4
+    python edge_codec.py play capture.edgez
+    python edge_codec.py bench capture.edgez
+"""
+import argparse
+import collections
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+MAGIC = b"EDGEZIP1"
+VERSION = 1
+KEYFRAME_INTERVAL = 30
+ZLIB_LEVEL = 6
+MAX_PENDING = 64  # frames queued for the pool before append() starts dropping
+
+_FILE_HEADER = struct.Struct("<8sIIII")  # magic, version, height, bytes_per_line, keyframe_interval
+_RECORD = struct.Struct("<IBqddH")       # payload length, flags, seq, t_first, t_last, missing
+FLAG_KEY = 1
+
+
+def index_dtype(height: int) -> np.dtype:
+    return np.dtype([
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("key", "u1"),
+        ("seq", "<i8"),
+        ("t_first", "<f8"),
+        ("t_last", "<f8"),
+        ("missing", "<u2"),
+        ("missing_mask", "u1", ((height + 7) // 8,)),
+    ])
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx.npy"
+
+
+def encode_frame(cur: np.ndarray, prev: np.ndarray | None, level: int = ZLIB_LEVEL) -> tuple[bytes, float]:
+    """Encode one packed frame against its predecessor (None = keyframe); return (payload, seconds)."""
+    t0 = time.perf_counter()
+    rows = np.invert(cur)
+    if prev is None:
+        delta = np.zeros(cur.shape[0], dtype=np.bool_)
+    else:
+        xor = np.bitwise_xor(cur, prev)
+        delta = np.count_nonzero(xor, axis=1) < np.count_nonzero(rows, axis=1)
+        rows[delta] = xor[delta]
+    payload = zlib.compress(np.packbits(delta).tobytes() + rows.tobytes(), level)
+    return payload, time.perf_counter() - t0
+
+
+def decode_frame(payload: bytes, prev: np.ndarray | None, height: int, bytes_per_line: int) -> np.ndarray:
+    """Inverse of encode_frame; returns a new (height, bytes_per_line) array."""
+    raw = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+    mask_len = (height + 7) // 8
+    delta = np.unpackbits(raw[:mask_len], count=height).view(np.bool_)
+    rows = raw[mask_len:].reshape(height, bytes_per_line)
+    frame = np.invert(rows)
+    if delta.any():
+        if prev is None:
+            raise ValueError("delta frame without a previous frame")
+        frame[delta] = rows[delta] ^ prev[delta]
+    return frame
+
+
+class EdgeEncoder:
+    """Appends frames to an edge archive; encoding runs in a thread (or process) pool.
+
+    append() copies the frame, hands it to the pool and writes out whatever
+    earlier frames have finished, in order; it never waits for an encode.
+    When `max_pending` frames are already queued the frame is dropped and
+    counted in `dropped` (the next frame is then encoded against the last
+    frame that was kept), unless block=True, as used for offline transcoding.
+    """
+
+    def __init__(self, path: str, max_frames: int | None = None, height: int = 720, bytes_per_line: int = 160,
+                 keyframe_interval: int = KEYFRAME_INTERVAL, level: int = ZLIB_LEVEL, workers: int = 2,
+                 processes: bool = False, max_pending: int = MAX_PENDING):
+        self.path = path
+        self.max_frames = max_frames
+        self.height = height
+        self.bytes_per_line = bytes_per_line
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.max_pending = max_pending
+        pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._pool: Executor = pool_class(max_workers=workers)
+        self._file = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, height, bytes_per_line, keyframe_interval))
+        self._offset = _FILE_HEADER.size
+        self._index = []
+        self._pending = collections.deque()
+        self._prev = None
+        self._submitted = 0
+        self.count = 0            # frames written
+        self.dropped = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.encode_seconds = 0.0  # summed over workers
+        self._t_start = time.perf_counter()
+
+    @property
+    def full(self) -> bool:
+        return self.max_frames is not None and self._submitted >= self.max_frames
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / max(1, self.encoded_bytes)
+
+    def stats(self) -> str:
+        per_worker = self.count / max(1e-9, self.encode_seconds)
+        wall = self.count / max(1e-9, time.perf_counter() - self._t_start)
+        return (f"encoded={self.count} dropped={self.dropped} pending={len(self._pending)} "
+                f"ratio={self.ratio:.1f}x encode={per_worker:.0f} frames/s/worker ({wall:.1f} frames/s written)")
+
+    def append(self, packed: np.ndarray, lines_received: np.ndarray,
+               seq: int, t_first: float, t_last: float, block: bool = False) -> int:
+        """Queue one (height, bytes_per_line) frame; return its index, or -1 if full or dropped."""
+        self._write_done()
+        if self.full:
+            return -1
+        if len(self._pending) >= self.max_pending:
+            if not block:
+                self.dropped += 1
+                return -1
+            self._write_done(wait=len(self._pending) - self.max_pending + 1)
+        cur = packed.copy()
+        missing = self.height - int(np.count_nonzero(lines_received))
+        if missing:
+            cur[~lines_received] = 0  # as FrameArchiveWriter: missing lines are stored zeroed
+        k = self._submitted
+        key = k % self.keyframe_interval == 0
+        future = self._pool.submit(encode_frame, cur, None if key else self._prev, self.level)
+        mask = np.packbits(~lines_received) if missing else None
+        self._pending.append((future, key, seq, t_first, t_last, missing, mask))
+        self._prev = cur
+        self._submitted = k + 1
+        return k
+
+    def flush(self) -> None:
+        self._write_done(wait=len(self._pending))
+        self._file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._pool.shutdown()
+        self._file.close()
+        index = np.zeros(len(self._index), dtype=index_dtype(self.height))
+        for i, entry in enumerate(self._index):
+            index[i] = entry
+        np.save(index_path(self.path), index)
+
+    def _write_done(self, wait: int = 0) -> None:
+        """Write finished frames in order, waiting for at least the first `wait` of them."""
+        pending = self._pending
+        mask_len = (self.height + 7) // 8
+        while pending and (wait > 0 or pending[0][0].done()):
+            wait -= 1
+            future, key, seq, t_first, t_last, missing, mask = pending.popleft()
+            payload, seconds = future.result()
+            header = _RECORD.pack(len(payload), FLAG_KEY if key else 0, seq, t_first, t_last, missing)
+            self._file.write(header)
+            if missing:
+                self._file.write(mask.tobytes())
+            self._file.write(payload)
+            record_len = len(header) + (mask_len if missing else 0) + len(payload)
+            self._index.append((self._offset + record_len - len(payload), len(payload), key, seq, t_first,
+                                t_last, missing, mask if missing else np.zeros(mask_len, dtype=np.uint8)))
+            self._offset += record_len
+            self.count += 1
+            self.raw_bytes += self.height * self.bytes_per_line
+            self.encoded_bytes += record_len
+            self.encode_seconds += seconds
+
+
+class EdgeArchive:
+    """Random access to an edge archive; sequential reads decode one delta per frame."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, height, bytes_per_line, keyframe_interval = _FILE_HEADER.unpack(
+            self._map[:_FILE_HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an edge archive (magic={magic!r}, version={version})")
+        self.height = height
+        self.bytes_per_line = bytes_per_line
+        self.keyframe_interval = keyframe_interval
+        try:
+            self.index = np.load(index_path(path), mmap_mode="r")
+        except FileNotFoundError:
+            self.index = self._scan()  # e.g. the recorder was killed before close()
+        self._keys = np.flatnonzero(self.index["key"])
+        self._cached = -1
+        self._frame = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, k: int) -> np.ndarray:
+        return self.frame(k)
+
+    def frame(self, k: int) -> np.ndarray:
+        """Packed frame k, (height, bytes_per_line). Valid until the next call."""
+        n = len(self)
+        if not -n <= k < n:
+            raise IndexError(f"frame {k} out of range (archive holds {n})")
+        k %= n
+        if k == self._cached:
+            return self._frame
+        if self._cached < 0 or not self._cached < k <= self._cached + self.keyframe_interval:
+            # Restart from the nearest keyframe at or before k
+            self._cached = int(self._keys[np.searchsorted(self._keys, k, side="right") - 1]) - 1
+            self._frame = None
+        for i in range(self._cached + 1, k + 1):
+            entry = self.index[i]
+            start = int(entry["offset"])
+            payload = self._map[start:start + int(entry["length"])].tobytes()
+            self._frame = decode_frame(payload, None if entry["key"] else self._frame,
+                                       self.height, self.bytes_per_line)
+        self._cached = k
+        return self._frame
+
+    def lines_received(self, k: int) -> np.ndarray:
+        mask = np.unpackbits(self.index[k]["missing_mask"], count=self.height)
+        return mask == 0
+
+    def unpack(self, k: int, msb_first: bool = True) -> np.ndarray:
+        """Frame k expanded to one uint8 {0, 255} per pixel."""
+        bits = np.unpackbits(self.frame(k), axis=1, bitorder="big" if msb_first else "little")
+        np.multiply(bits, 255, out=bits)
+        return bits
+
+    def _scan(self) -> np.ndarray:
+        entries = []
+        mask_len = (self.height + 7) // 8
+        offset, end = _FILE_HEADER.size, self._map.size
+        while offset + _RECORD.size <= end:
+            length, flags, seq, t_first, t_last, missing = _RECORD.unpack(
+                self._map[offset:offset + _RECORD.size].tobytes())
+            offset += _RECORD.size
+            mask = np.zeros(mask_len, dtype=np.uint8)
+            if missing:
+                mask = np.array(self._map[offset:offset + mask_len])
+                offset += mask_len
+            if offset + length > end:
+                break  # truncated last record
+            entries.append((offset, length, flags & FLAG_KEY, seq, t_first, t_last, missing, mask))
+            offset += length
+        index = np.zeros(len(entries), dtype=index_dtype(self.height))
+        for i, entry in enumerate(entries):
+            index[i] = entry
+        return index
+
+
+def transcode(src: str, dst: str, workers: int, processes: bool, level: int, keyframe_interval: int) -> None:
+    from frame_archive import FrameArchive
+    archive = FrameArchive(src)
+    encoder = EdgeEncoder(dst, None, archive.height, archive.bytes_per_line, keyframe_interval, level,
+                          workers, processes, max_pending=4 * workers)
+    t0 = time.perf_counter()
+    for k in range(len(archive)):
+        entry = archive.index[k]
+        encoder.append(archive[k], archive.lines_received(k), int(entry["seq"]),
+                       float(entry["t_first"]), float(entry["t_last"]), block=True)
+    encoder.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{src} -> {dst}: {encoder.stats()}")
+    print(f"{encoder.raw_bytes:,} -> {encoder.encoded_bytes:,} bytes in {elapsed:.2f} s "
+          f"({encoder.count / elapsed:.0f} frames/s with {workers} {'processes' if processes else 'threads'})")
+
+
+def bench(path: str) -> None:
+    archive = EdgeArchive(path)
+    n = len(archive)
+    t0 = time.perf_counter()
+    for k in range(n):
+        archive.frame(k)
+    sequential = n / (time.perf_counter() - t0)
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, n, size=min(200, n))
+    t0 = time.perf_counter()
+    for k in picks.tolist():
+        archive.frame(k)
+    seek_ms = (time.perf_counter() - t0) / picks.size * 1e3
+    print(f"{path}: {n} frames, sequential decode {sequential:.0f} frames/s, random seek {seek_ms:.2f} ms/frame")
+
+
+def play(path: str, fps: float, start: int) -> None:
+    """Scrub through an archive: space = pause, a/d = step, j/l = -/+ one keyframe interval, ESC = quit."""
+    import cv2
+    archive = EdgeArchive(path)
+    k, paused = start, False
+    delay = max(1, int(1000 / fps))
+    while len(archive):
+        cv2.imshow(path, archive.unpack(k))
+        key = cv2.waitKey(0 if paused else delay) & 0xFF
+        if key == 27:
+            break
+        step = {ord('a'): -1, ord('d'): 1, ord('j'): -archive.keyframe_interval,
+                ord('l'): archive.keyframe_interval}.get(key)
+        if key == ord(' '):
+            paused = not paused
+        elif step is not None:
+            k = min(max(k + step, 0), len(archive) - 1)
+        elif not paused:
+            k = (k + 1) % len(archive)
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    enc = sub.add_parser("encode", help="transcode a frame archive (udp_binary_viewer.py --record)")
+    enc.add_argument("src")
+    enc.add_argument("dst")
+    enc.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    enc.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    enc.add_argument("--level", type=int, default=ZLIB_LEVEL, help="zlib level (default: %(default)s)")
+    enc.add_argument("--keyframe-interval", type=int, default=KEYFRAME_INTERVAL)
+    pl = sub.add_parser("play", help="scrub through an edge archive")
+    pl.add_argument("path")
+    pl.add_argument("--fps", type=float, default=30.0)
+    pl.add_argument("--start", type=int, default=0)
+    be = sub.add_parser("bench", help="sequential decode and random seek speed")
+    be.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        transcode(args.src, args.dst, args.workers, args.processes, args.level, args.keyframe_interval)
+    elif args.command == "play":
+        play(args.path, args.fps, args.start)
+    else:
+        bench(args.path)
+
+
+if __name__ == "__main__":
+    main()
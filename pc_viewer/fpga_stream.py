@@ -0,0 +1,544 @@
+"""FPGA edge-image line stream: protocol decoding, frame assembly and an asyncio receiver.
+
+Wire format (image_eth_formatter.v + udp_send.v), one UDP datagram per image line (v1):
+    [line number, 2 bytes][width / 8 bytes of pixels, 1 bit each]
+The line number is little-endian as sent by the FPGA; pixels are packed MSB
+first, 1 = white/no edge, 0 = edge (sobel.v). Both orders are configurable
+through StreamFormat for other senders.
+
+Protocol v2 (image_eth_formatter.v with PROTOCOL_VERSION = 2) packs K
+consecutive lines into one datagram behind a 6-byte header:
+    [version = 2][K][frame counter, 2 bytes LE][first line, 2 bytes LE][K * width / 8 bytes of pixels]
+K = 9 fits a 1500-byte MTU (1446 bytes) and divides 720. v1 and v2
+datagrams are told apart by version byte and length (6 + K * width / 8 is
+never a v1 length), so receivers need no configuration. The frame counter
+assigns lines to frames directly instead of inferring it from line-number
+wraparound.
+
+Usage from asyncio code:
+
+    async with await open_stream(port=6102, maxsize=4, policy="drop-oldest") as stream:
+        async for frame in stream:
+            frame.pixels            # (720, 160) packed bytes, or (720, 1280) {0, 255} if packed=False
+            frame.lines_received    # which rows arrived
+            frame.unpack()          # (720, 1280) {0, 255}
+
+Nothing here depends on cv2 or on the viewer's module-level settings; the
+viewer (udp_binary_viewer.py) builds on the same decoding and assembly code.
+"""
+import asyncio
+import collections
+import socket
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+LINE_HEADER_LEN = 2  # line number (uint16)
+
+PROTOCOL_V2 = 2      # version byte of v2 datagrams
+V2_HEADER_LEN = 6    # version, line count, frame counter (uint16 LE), first line (uint16 LE)
+V2_LINES_PER_PACKET = 9
+
+# Vectorized header parse result codes (see parse_line_indices)
+HOW_INV, HOW_BE, HOW_LE = 0, 1, 2
+
+RECV_SLOT_SIZE = 2048  # bytes reserved per datagram in the batch buffer (>= one MTU payload)
+
+DROP_OLDEST = "drop-oldest"
+BLOCK = "block"
+
+
+@dataclass(frozen=True)
+class StreamFormat:
+    """Geometry and byte/bit order of one line stream."""
+    width: int = 1280
+    height: int = 720
+    line_order: str = "<"     # byte order of the line number: '<' little-endian (FPGA), '>' big-endian
+    msb_first: bool = True    # first pixel of each byte in its most significant bit
+
+    def __post_init__(self):
+        if self.width % 8:
+            raise ValueError(f"width must be a multiple of 8, got {self.width}")
+        if self.line_order not in ("<", ">"):
+            raise ValueError(f"line_order must be '<' or '>', got {self.line_order!r}")
+
+    @property
+    def bytes_per_line(self) -> int:
+        return self.width // 8
+
+    @property
+    def payload_len(self) -> int:
+        return LINE_HEADER_LEN + self.bytes_per_line
+
+    @property
+    def bitorder(self) -> str:
+        return "big" if self.msb_first else "little"
+
+    def v2_payload_len(self, lines_per_packet: int = V2_LINES_PER_PACKET) -> int:
+        return V2_HEADER_LEN + lines_per_packet * self.bytes_per_line
+
+
+DEFAULT_FORMAT = StreamFormat()
+
+
+def parse_line_indices(hdr: np.ndarray, fmt: StreamFormat = DEFAULT_FORMAT) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse an (N, 2) uint8 array of line headers.
+
+    Returns (line_idx, how) arrays; how holds HOW_BE / HOW_LE / HOW_INV and
+    line_idx is only meaningful where how != HOW_INV. The configured byte order
+    is tried first, then the other one; 0-based and 1-based numbering are both
+    accepted (an index equal to the height can only be the 1-based last line).
+    """
+    b0 = hdr[:, 0].astype(np.int32)
+    b1 = hdr[:, 1].astype(np.int32)
+    be = (b0 << 8) | b1
+    le = (b1 << 8) | b0
+    if fmt.line_order == "<":
+        how = np.select([le <= fmt.height, be <= fmt.height], [HOW_LE, HOW_BE], HOW_INV)
+    else:
+        how = np.select([be <= fmt.height, le <= fmt.height], [HOW_BE, HOW_LE], HOW_INV)
+    line_idx = np.minimum(np.where(how == HOW_BE, be, le), fmt.height - 1)
+    return line_idx, how
+
+
+def no_lines(fmt: StreamFormat = DEFAULT_FORMAT, packed: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    width = fmt.bytes_per_line if packed else fmt.width
+    return np.empty(0, dtype=np.int32), np.empty((0, width), dtype=np.uint8)
+
+
+def decode_lines(data: np.ndarray, lengths: np.ndarray, fmt: StreamFormat = DEFAULT_FORMAT,
+                 packed: bool = False, counters: dict | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode N received datagrams in one pass.
+
+    data is (N, >= payload_len) uint8, one datagram per row, lengths their
+    sizes. Returns (line_idx, lines) in arrival order for the valid datagrams:
+    lines are the raw (n, bytes_per_line) payload bytes when `packed` is set,
+    else (n, width) pixels of {0, 255}. If given, `counters` is updated with
+    "pkts", "idx_from_BE", "idx_from_LE" and "idx_invalid".
+    """
+    rows, lines, _ = decode_datagrams(data, lengths, fmt, packed, counters)
+    return rows, lines
+
+
+def decode_datagrams(data: np.ndarray, lengths: np.ndarray, fmt: StreamFormat = DEFAULT_FORMAT,
+                     packed: bool = False, counters: dict | None = None, with_valid: bool = False):
+    """decode_lines() for v1 and v2 datagrams, also returning each line's frame counter.
+
+    The frame counters (uint16, one per returned line) are None unless every
+    valid datagram of the batch is v2; FrameAssembler.add_lines() then falls
+    back to line-number wraparound. v2 headers are counted as "idx_from_LE".
+    With `with_valid` a fourth item, the (N,) mask of the datagrams that were
+    decoded, is returned; a v2 datagram yields several lines, so invalid
+    datagrams cannot be counted from the lines.
+    """
+    out = _decode_datagrams(data, lengths, fmt, packed, counters)
+    return out if with_valid else out[:3]
+
+
+def _decode_datagrams(data: np.ndarray, lengths: np.ndarray, fmt: StreamFormat, packed: bool,
+                      counters: dict | None) -> Tuple[np.ndarray, np.ndarray, np.ndarray | None, np.ndarray]:
+    if data.shape[0] == 0:
+        return (*no_lines(fmt, packed), None, np.zeros(0, dtype=np.bool_))
+    bpl = fmt.bytes_per_line
+    k = data[:, 1].astype(np.int64)
+    v2 = (data[:, 0] == PROTOCOL_V2) & (k > 0) & (lengths == V2_HEADER_LEN + k * bpl)
+    if not v2.any():
+        line_idx, valid = _decode_v1(data, lengths, fmt, counters)
+        payload = data[valid, LINE_HEADER_LEN:fmt.payload_len]
+        return (*_lines_out(line_idx[valid], payload, fmt, packed), None, valid)
+
+    first = data[:, 4].astype(np.int32) | (data[:, 5].astype(np.int32) << 8)
+    v2_ok = v2 & (first + k <= fmt.height)
+    if counters is not None:
+        counters["pkts"] += int(np.count_nonzero(v2))
+        counters["idx_from_LE"] += int(np.count_nonzero(v2_ok))
+        counters["idx_invalid"] += int(np.count_nonzero(v2 & ~v2_ok))
+    if v2.all():
+        n = int(np.count_nonzero(v2_ok))
+        if n == 0:
+            return (*no_lines(fmt, packed), None, v2_ok)
+        sel = np.flatnonzero(v2_ok)
+        kk = k[sel]
+        if (kk == kk[0]).all():
+            # Common case: every datagram holds the same number of lines
+            per = int(kk[0])
+            payload = data[sel, V2_HEADER_LEN:V2_HEADER_LEN + per * bpl].reshape(n * per, bpl)
+            rows = (first[sel, None] + np.arange(per, dtype=np.int32)).ravel()
+            frames = np.repeat(data[sel, 2].astype(np.int32) | (data[sel, 3].astype(np.int32) << 8), per)
+            return (*_lines_out(rows, payload, fmt, packed), frames, v2_ok)
+
+    # Mixed v1 / v2 (e.g. while a board is reconfigured) or varying K: rare, decode per datagram
+    line_idx, v1_rows = _decode_v1(data, lengths, fmt, counters, exclude=v2)
+    rows_out, payload_out = [], []
+    for i in range(data.shape[0]):
+        if v2_ok[i]:
+            per = int(k[i])
+            rows_out.append(first[i] + np.arange(per, dtype=np.int32))
+            payload_out.append(data[i, V2_HEADER_LEN:V2_HEADER_LEN + per * bpl].reshape(per, bpl))
+        elif v1_rows[i]:
+            rows_out.append(line_idx[i:i + 1])
+            payload_out.append(data[i:i + 1, LINE_HEADER_LEN:fmt.payload_len])
+    valid = v2_ok | v1_rows
+    if not rows_out:
+        return (*no_lines(fmt, packed), None, valid)
+    return (*_lines_out(np.concatenate(rows_out), np.concatenate(payload_out), fmt, packed), None, valid)
+
+
+def _decode_v1(data: np.ndarray, lengths: np.ndarray, fmt: StreamFormat, counters: dict | None,
+               exclude: np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """v1 datagrams: (line_idx, valid mask) for all of them."""
+    ok = lengths >= fmt.payload_len  # ignore malformed/short packets
+    if exclude is not None:
+        ok &= ~exclude
+    line_idx, how = parse_line_indices(data[:, :LINE_HEADER_LEN], fmt)
+    how[~ok] = HOW_INV
+    if counters is not None:
+        counters["pkts"] += int(np.count_nonzero(ok))
+        counters["idx_from_BE"] += int(np.count_nonzero(how == HOW_BE))
+        counters["idx_from_LE"] += int(np.count_nonzero(how == HOW_LE))
+        counters["idx_invalid"] += int(np.count_nonzero(ok & (how == HOW_INV)))
+
+    return line_idx, how != HOW_INV
+
+
+def _lines_out(rows: np.ndarray, payload: np.ndarray, fmt: StreamFormat,
+               packed: bool) -> Tuple[np.ndarray, np.ndarray]:
+    if rows.size == 0:
+        return no_lines(fmt, packed)
+    if packed:
+        return rows, payload
+    bits = np.unpackbits(payload, axis=1, bitorder=fmt.bitorder)
+    np.multiply(bits, 255, out=bits)
+    return rows, bits
+
+
+class AssembledFrame:
+    """One frame slot of the assembler ring; handed to on_frame when emitted.
+
+    pixels is (height, width), or (height, bytes_per_line) packed bytes for a
+    packed assembler.
+    """
+
+    def __init__(self, fmt: StreamFormat = DEFAULT_FORMAT, packed: bool = False):
+        self.fmt = fmt
+        self.packed = packed
+        self.pixels = np.zeros((fmt.height, fmt.bytes_per_line if packed else fmt.width), dtype=np.uint8)
+        self.lines_received = np.zeros(fmt.height, dtype=np.bool_)
+        self.seq = -1          # frame number counted from the first wraparound seen
+        self.t_first = 0.0     # arrival time of the first / last line
+        self.t_last = 0.0
+        self.missing = 0       # lines never received, set on emit
+
+    @property
+    def complete(self) -> bool:
+        return self.missing == 0
+
+    def unpack(self) -> np.ndarray:
+        """The frame as (height, width) pixels of {0, 255}."""
+        if not self.packed:
+            return self.pixels
+        bits = np.unpackbits(self.pixels, axis=1, bitorder=self.fmt.bitorder)
+        np.multiply(bits, 255, out=bits)
+        return bits
+
+    def copy(self) -> "AssembledFrame":
+        frame = AssembledFrame.__new__(AssembledFrame)
+        frame.__dict__.update(self.__dict__)
+        frame.pixels = self.pixels.copy()
+        frame.lines_received = self.lines_received.copy()
+        return frame
+
+
+class FrameAssembler:
+    """Groups decoded lines into frames using line-index wraparound or v2 frame counters.
+
+    Every line gets a frame number from the cumulative count of wraps in the
+    index sequence (a jump back by more than half the height starts a new
+    frame, a jump forward by as much is a late line of the previous frame),
+    or, when add_lines() is given the lines' v2 frame counters, from the
+    counter differences (modulo 2 ** 16; a step back by more than
+    `jitter_frames` is a counter reset and starts a new frame).
+    Up to `jitter_frames` frames stay in flight; a frame is emitted, in order,
+    when it is complete, when `frame_timeout` seconds pass without new lines
+    for it, or when a newer frame needs its slot. Work is per batch and per
+    frame, never per line.
+
+    on_frame(frame) is called synchronously; frame.pixels is reused afterwards.
+    With packed=True lines are kept as the raw payload bytes (see decode_lines).
+    """
+
+    def __init__(self, on_frame, packed: bool = False, fmt: StreamFormat = DEFAULT_FORMAT,
+                 jitter_frames: int = 3, frame_timeout: float = 0.05):
+        self.on_frame = on_frame
+        self.packed = packed
+        self.fmt = fmt
+        self.jitter_frames = jitter_frames
+        self.frame_timeout = frame_timeout
+        self._wrap = fmt.height // 2
+        self._free = [AssembledFrame(fmt, packed) for _ in range(jitter_frames)]
+        self._inflight: dict[int, AssembledFrame] = {}
+        self._seq = 0              # frame number of the newest line
+        self._last_line = None     # line index of the newest line
+        self._last_counter = None  # v2 frame counter of the newest line
+        self._emitted_seq = -1     # frames up to this number have been emitted
+        self.frames_emitted = 0
+        self.frames_incomplete = 0
+        self.missing_lines = 0     # total over all emitted frames
+        self.late_lines = 0        # lines for frames that were already emitted
+
+    def add_lines(self, rows: np.ndarray, pixels: np.ndarray, now: float,
+                  frames: np.ndarray | None = None) -> None:
+        if rows.size == 0:
+            self.poll(now)
+            return
+        rows = rows.astype(np.int32, copy=False)
+        if frames is not None:
+            counters = frames.astype(np.int64)
+            last = counters[0] if self._last_counter is None else self._last_counter
+            step = (np.diff(counters, prepend=last) + 0x8000) % 0x10000 - 0x8000
+            # Further back than any frame still in flight: the board restarted its counter
+            step[step < -self.jitter_frames] = 1
+            if self._last_counter is None and self._last_line is not None:
+                # Switching from v1: the first line continues or wraps like a v1 line would
+                jump = int(rows[0]) - self._last_line
+                step[0] = int(jump < -self._wrap) - int(jump > self._wrap)
+            seqs = self._seq + np.cumsum(step)
+            self._last_counter = int(counters[-1])
+        else:
+            prev = np.empty_like(rows)
+            prev[0] = rows[0] if self._last_line is None else self._last_line
+            prev[1:] = rows[:-1]
+            jump = rows - prev
+            seqs = self._seq + np.cumsum((jump < -self._wrap).astype(np.int64) - (jump > self._wrap))
+            self._last_counter = None
+        self._seq = int(seqs[-1])
+        self._last_line = int(rows[-1])
+
+        first, last = int(seqs[0]), int(seqs[-1])
+        if first == last:
+            # Common case: the whole batch belongs to one frame
+            self._scatter(first, rows, pixels, now)
+        else:
+            for seq in np.unique(seqs).tolist():
+                sel = seqs == seq
+                self._scatter(seq, rows[sel], pixels[sel], now)
+        self.poll(now)
+
+    def poll(self, now: float) -> None:
+        """Emit frames that are complete or timed out (and every older frame before them)."""
+        if not self._inflight:
+            return
+        ready = [seq for seq, f in self._inflight.items()
+                 if f.lines_received.all() or now - f.t_last >= self.frame_timeout]
+        if ready:
+            self._emit_through(max(ready))
+
+    def flush(self) -> None:
+        if self._inflight:
+            self._emit_through(max(self._inflight))
+
+    def _scatter(self, seq: int, rows: np.ndarray, pixels: np.ndarray, now: float) -> None:
+        if seq <= self._emitted_seq:
+            self.late_lines += int(rows.size)
+            return
+        frame = self._inflight.get(seq)
+        if frame is None:
+            # Make room: frames more than jitter_frames behind are given up on
+            if self._inflight and seq - min(self._inflight) >= self.jitter_frames:
+                self._emit_through(seq - self.jitter_frames)
+            if not self._free:
+                self._emit_through(min(self._inflight))
+            frame = self._free.pop()
+            frame.seq, frame.t_first = seq, now
+            frame.lines_received.fill(False)
+            self._inflight[seq] = frame
+        frame.pixels[rows] = pixels
+        frame.lines_received[rows] = True
+        frame.t_last = now
+
+    def _emit_through(self, last_seq: int) -> None:
+        for seq in sorted(s for s in self._inflight if s <= last_seq):
+            frame = self._inflight.pop(seq)
+            frame.missing = self.fmt.height - int(np.count_nonzero(frame.lines_received))
+            self.frames_emitted += 1
+            if frame.missing:
+                self.frames_incomplete += 1
+                self.missing_lines += frame.missing
+            self.on_frame(frame)
+            self._free.append(frame)
+        self._emitted_seq = max(self._emitted_seq, last_seq)
+
+
+class _LineProtocol(asyncio.DatagramProtocol):
+    def __init__(self, stream: "FrameStream"):
+        self.stream = stream
+
+    def connection_made(self, transport) -> None:
+        self.stream._transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.stream._datagram(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self.stream.errors += 1  # e.g. ICMP port unreachable; UDP keeps going
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.stream._finish()
+
+
+class FrameStream:
+    """Asynchronous iterator over the frames of one UDP line stream.
+
+    The asyncio datagram transport reads one datagram per event-loop pass, so
+    when the protocol is handed a datagram the stream also drains whatever
+    else is queued on its socket (recv_into() into a preallocated batch
+    buffer, up to `batch_size` datagrams) and decodes and assembles the batch
+    in one go. Emitted frames are copied out of the assembler ring once and
+    queued for the consumer; at most `maxsize` frames are queued:
+
+      drop-oldest   the oldest queued frame is discarded (counted in `dropped`);
+                    the receiver never waits for the consumer
+      block         the transport stops reading until the consumer catches up;
+                    the kernel socket buffer absorbs the backlog, then drops
+
+    Create with open_stream(); iterate with `async for`; close() or leaving
+    `async with` stops the receiver and ends the iteration once the queue is
+    drained.
+    """
+
+    def __init__(self, sock: socket.socket, fmt: StreamFormat = DEFAULT_FORMAT, packed: bool = True,
+                 maxsize: int = 4, policy: str = DROP_OLDEST, jitter_frames: int = 3,
+                 frame_timeout: float = 0.05, batch_size: int = 256):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"policy must be {DROP_OLDEST!r} or {BLOCK!r}, got {policy!r}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.sock = sock
+        self.fmt = fmt
+        self.maxsize = maxsize
+        self.policy = policy
+        self.assembler = FrameAssembler(self._on_frame, packed, fmt, jitter_frames, frame_timeout)
+        self.dropped = 0    # frames discarded by the drop-oldest policy
+        self.errors = 0     # socket errors reported by the transport
+        self.counters = {"pkts": 0, "idx_from_BE": 0, "idx_from_LE": 0, "idx_invalid": 0}
+
+        self._loop = asyncio.get_running_loop()
+        self._transport = None
+        self._queue: collections.deque[AssembledFrame] = collections.deque()
+        self._waiter: asyncio.Future | None = None
+        self._paused = False
+        self._closed = False
+        # Slots larger than a line, so oversized datagrams show up as such instead of being truncated
+        self._buf = np.zeros((batch_size, max(fmt.payload_len, RECV_SLOT_SIZE)), dtype=np.uint8)
+        self._rows = [memoryview(row) for row in self._buf]
+        self._lengths = np.zeros(batch_size, dtype=np.int64)
+        self._poll_handle = self._loop.call_later(frame_timeout / 2, self._poll)
+
+    @property
+    def qsize(self) -> int:
+        return len(self._queue)
+
+    def close(self) -> None:
+        """Stop receiving; frames already queued can still be iterated."""
+        if self._transport is not None:
+            self._transport.close()  # connection_lost() -> _finish()
+        else:
+            self._finish()
+
+    async def __aenter__(self) -> "FrameStream":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    def __aiter__(self) -> "FrameStream":
+        return self
+
+    async def __anext__(self) -> AssembledFrame:
+        while not self._queue:
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        frame = self._queue.popleft()
+        if self._paused and len(self._queue) < self.maxsize and not self._closed:
+            self._paused = False
+            self._transport.resume_reading()
+        return frame
+
+    # ---- receive side (event loop callbacks) ----
+
+    def _datagram(self, data: bytes) -> None:
+        rows, lengths = self._rows, self._lengths
+        n = len(data)
+        k = min(n, len(rows[0]))
+        rows[0][:k] = memoryview(data)[:k] if k < n else data
+        lengths[0] = n
+        count = 1
+        recv_into = self.sock.recv_into
+        while count < len(rows):
+            try:
+                lengths[count] = recv_into(rows[count])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self.errors += 1
+                continue
+            count += 1
+        self._decode(count)
+
+    def _decode(self, count: int) -> None:
+        rows, lines, frames = decode_datagrams(self._buf[:count], self._lengths[:count], self.fmt,
+                                               self.assembler.packed, self.counters)
+        self.assembler.add_lines(rows, lines, time.time(), frames)
+
+    def _poll(self) -> None:
+        self.assembler.poll(time.time())
+        self._poll_handle = self._loop.call_later(self.assembler.frame_timeout / 2, self._poll)
+
+    def _on_frame(self, frame: AssembledFrame) -> None:
+        queue = self._queue
+        if len(queue) >= self.maxsize and self.policy == DROP_OLDEST:
+            queue.popleft()
+            self.dropped += 1
+        queue.append(frame.copy())
+        if self.policy == BLOCK and len(queue) >= self.maxsize and not self._paused and self._transport:
+            self._paused = True
+            self._transport.pause_reading()
+        self._wake()
+
+    def _finish(self) -> None:
+        if self._closed:
+            return
+        self.assembler.flush()
+        self._poll_handle.cancel()
+        self._closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+async def open_stream(host: str = "0.0.0.0", port: int = 6102, fmt: StreamFormat = DEFAULT_FORMAT,
+                      packed: bool = True, maxsize: int = 4, policy: str = DROP_OLDEST,
+                      rcvbuf: int = 8 * 1024 * 1024, **kwargs) -> FrameStream:
+    """Bind a UDP socket and return a FrameStream receiving on it.
+
+    Extra keyword arguments (jitter_frames, frame_timeout, batch_size) go to FrameStream.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    except OSError:
+        pass
+    sock.bind((host, port))
+    sock.setblocking(False)
+    stream = FrameStream(sock, fmt, packed, maxsize, policy, **kwargs)
+    await asyncio.get_running_loop().create_datagram_endpoint(lambda: _LineProtocol(stream), sock=sock)
+    return stream
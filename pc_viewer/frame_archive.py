@@ -0,0 +1,145 @@
+"""Memory-mapped archive of packed 1bpp frames, written by the viewer's record mode.
+
+Layout of `<name>` (the data file):
+    [0, HEADER_SIZE)                    header: magic, version, geometry, capacity, frame count
+    HEADER_SIZE + k * frame_bytes       frame k, height x bytes_per_line packed bytes as sent
+                                        by the FPGA (720 x 160 = 115,200 bytes at 1280x720),
+                                        missing lines zeroed
+
+Layout of `<name>.idx.npy` (the sidecar index, one record per frame slot):
+    seq       frame number assigned by the assembler
+    t_first   arrival time of the first / last line (time.time())
+    t_last
+    missing   number of lines never received
+    missing_mask  packed bitmap, bit set = line missing (np.packbits, MSB first)
+
+Both files are preallocated at their full size, so appending a frame is one
+memcpy into the mapping and reading frame k is an O(1) zero-copy view.
+
+Usage:
+    archive = FrameArchive("capture.frames")
+    packed = archive[k]            # (720, 160) uint8 view into the file
+    image = archive.unpack(k)      # (720, 1280) uint8 {0, 255}
+"""
+import struct
+
+import numpy as np
+
+MAGIC = b"EDGEFRM1"
+HEADER_SIZE = 4096  # one page, keeps every frame slot page aligned
+_HEADER = struct.Struct("<8sIIIQQ")  # magic, version, height, bytes_per_line, max_frames, count
+VERSION = 1
+
+
+def index_dtype(height: int) -> np.dtype:
+    return np.dtype([
+        ("seq", "<i8"),
+        ("t_first", "<f8"),
+        ("t_last", "<f8"),
+        ("missing", "<u2"),
+        ("missing_mask", "u1", ((height + 7) // 8,)),
+    ])
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx.npy"
+
+
+class FrameArchiveWriter:
+    """Appends packed frames into a preallocated, memory-mapped archive."""
+
+    def __init__(self, path: str, max_frames: int, height: int = 720, bytes_per_line: int = 160):
+        self.path = path
+        self.max_frames = max_frames
+        self.height = height
+        self.bytes_per_line = bytes_per_line
+        frame_bytes = height * bytes_per_line
+
+        # Sized up front (sparse where the filesystem allows), then mapped once
+        with open(path, "wb") as f:
+            f.truncate(HEADER_SIZE + max_frames * frame_bytes)
+        self._map = np.memmap(path, dtype=np.uint8, mode="r+")
+        self._header = self._map[:HEADER_SIZE]
+        self._frames = self._map[HEADER_SIZE:].reshape(max_frames, height, bytes_per_line)
+        self._index = np.lib.format.open_memmap(index_path(path), mode="w+",
+                                                dtype=index_dtype(height), shape=(max_frames,))
+        self.count = 0
+        self._write_header()
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.max_frames
+
+    def append(self, packed: np.ndarray, lines_received: np.ndarray,
+               seq: int, t_first: float, t_last: float) -> int:
+        """Store one (height, bytes_per_line) frame; return its slot, or -1 if the archive is full."""
+        if self.full:
+            return -1
+        k = self.count
+        slot = self._frames[k]
+        slot[:] = packed
+        missing = self.height - int(np.count_nonzero(lines_received))
+        if missing:
+            slot[~lines_received] = 0  # don't leave stale lines from a reused assembler slot
+        entry = self._index[k]
+        entry["seq"] = seq
+        entry["t_first"] = t_first
+        entry["t_last"] = t_last
+        entry["missing"] = missing
+        entry["missing_mask"] = np.packbits(~lines_received)
+        self.count = k + 1
+        self._write_header()
+        return k
+
+    def flush(self) -> None:
+        self._map.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self.flush()
+        del self._frames, self._header, self._map, self._index
+
+    def _write_header(self) -> None:
+        self._header[:_HEADER.size] = np.frombuffer(
+            _HEADER.pack(MAGIC, VERSION, self.height, self.bytes_per_line, self.max_frames, self.count),
+            dtype=np.uint8)
+
+
+class FrameArchive:
+    """Read-only access to an archive written by FrameArchiveWriter."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, height, bytes_per_line, max_frames, count = _HEADER.unpack(
+            self._map[:_HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a frame archive (magic={magic!r}, version={version})")
+        self.height = height
+        self.bytes_per_line = bytes_per_line
+        self.max_frames = max_frames
+        self.count = count
+        self._frames = self._map[HEADER_SIZE:].reshape(max_frames, height, bytes_per_line)
+        self.index = np.load(index_path(path), mmap_mode="r")[:count]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, k: int) -> np.ndarray:
+        return self.frame(k)
+
+    def frame(self, k: int) -> np.ndarray:
+        """Packed frame k as a (height, bytes_per_line) view into the file."""
+        if not -self.count <= k < self.count:
+            raise IndexError(f"frame {k} out of range (archive holds {self.count})")
+        return self._frames[k % self.count]
+
+    def lines_received(self, k: int) -> np.ndarray:
+        mask = np.unpackbits(self.index[k]["missing_mask"], count=self.height)
+        return mask == 0
+
+    def unpack(self, k: int, msb_first: bool = True) -> np.ndarray:
+        """Frame k expanded to one uint8 {0, 255} per pixel."""
+        bits = np.unpackbits(self.frame(k), axis=1, bitorder="big" if msb_first else "little")
+        np.multiply(bits, 255, out=bits)
+        return bits
@@ -0,0 +1,283 @@
+"""Shared-memory frame bus: one receiver process publishes, any number of processes read zero-copy.
+
+    # receiver: headless, publishes every assembled frame
+    python udp_binary_viewer.py --bus edges
+
+    # consumers, each in its own process
+    python frame_bus.py edges --show
+    python frame_bus.py edges --record capture.frames
+    python frame_bus.py edges --analytics results.jsonl
+    python frame_bus.py edges              # per-second stats only
+
+Layout of the shared memory block (multiprocessing.shared_memory, attached by name):
+    header      magic, version, slot count, geometry, packed flag, frames published
+    slot meta   per slot: seqlock counter, frame seq, t_first, t_last, missing
+    lines       per slot: lines_received mask (height bools)
+    pixels      per slot: (height, row_bytes) frame, page aligned
+
+The writer never waits for readers. Frame n goes to slot n % slots and is
+written under a seqlock: the slot counter is set to 2n+1 before the copy and
+2n+2 after it. A reader maps the slot as NumPy views without copying and
+checks the counter again when it is done (BusFrame.stale()); a frame that
+was overwritten in the meantime is detected and skipped, and a reader that
+falls more than `slots` frames behind skips ahead and counts the loss.
+(The seqlock relies on stores becoming visible in program order, which
+holds on x86.)
+"""
+import argparse
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = b"EDGEBUS1"
+VERSION = 1
+BUS_SLOTS = 8
+POLL_INTERVAL = 0.001  # s between checks for a new frame in BusReader.next()
+
+_HEADER = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("slots", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("row_bytes", "<u4"),
+    ("packed", "u1"),
+    ("published", "<u8"),
+], align=True)
+_META = np.dtype([
+    ("lock", "<u8"),
+    ("seq", "<i8"),
+    ("t_first", "<f8"),
+    ("t_last", "<f8"),
+    ("missing", "<u4"),
+], align=True)
+_HEADER_SIZE = 64
+
+_created_here: set[str] = set()  # buses owned by a BusWriter in this process
+
+
+def _align(offset: int, alignment: int) -> int:
+    return -(-offset // alignment) * alignment
+
+
+def _layout(slots: int, height: int, row_bytes: int) -> tuple[int, int, int, int]:
+    """Offsets of slot meta, lines and pixels, and the total size."""
+    meta = _HEADER_SIZE
+    lines = _align(meta + slots * _META.itemsize, 64)
+    pixels = _align(lines + slots * height, 4096)
+    return meta, lines, pixels, pixels + slots * height * row_bytes
+
+
+class _Bus:
+    def _map(self, shm: shared_memory.SharedMemory) -> None:
+        buf = shm.buf
+        self._header = np.ndarray((), dtype=_HEADER, buffer=buf)
+        slots, height, row_bytes = (int(self._header[k]) for k in ("slots", "height", "row_bytes"))
+        meta, lines, pixels, _ = _layout(slots, height, row_bytes)
+        self.slots, self.height, self.width, self.row_bytes = slots, height, int(self._header["width"]), row_bytes
+        self.packed = bool(self._header["packed"])
+        self._meta = np.ndarray((slots,), dtype=_META, buffer=buf, offset=meta)
+        self._lock = self._meta["lock"]
+        self._lines = np.ndarray((slots, height), dtype=np.bool_, buffer=buf, offset=lines)
+        self._pixels = np.ndarray((slots, height, row_bytes), dtype=np.uint8, buffer=buf, offset=pixels)
+
+    def _unmap(self) -> None:
+        del self._header, self._meta, self._lock, self._lines, self._pixels
+
+    @property
+    def published(self) -> int:
+        return int(self._header["published"])
+
+
+class BusWriter(_Bus):
+    """Creates the bus and publishes frames into it; owns (and unlinks) the shared memory."""
+
+    def __init__(self, name: str, slots: int = BUS_SLOTS, height: int = 720, width: int = 1280,
+                 packed: bool = True):
+        row_bytes = width // 8 if packed else width
+        size = _layout(slots, height, row_bytes)[3]
+        self.name = name
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created_here.add(self._shm.name)
+        header = np.ndarray((), dtype=_HEADER, buffer=self._shm.buf)
+        header[()] = (MAGIC, VERSION, slots, height, width, row_bytes, packed, 0)
+        self._map(self._shm)
+        self._count = 0
+
+    def publish(self, pixels: np.ndarray, lines_received: np.ndarray, seq: int,
+                t_first: float, t_last: float, missing: int) -> int:
+        """Copy one frame into the next slot; return its bus index. Never blocks."""
+        n = self._count
+        k = n % self.slots
+        self._lock[k] = 2 * n + 1  # readers of this slot now see it as being written
+        np.copyto(self._pixels[k], pixels)
+        np.copyto(self._lines[k], lines_received)
+        meta = self._meta[k]
+        meta["seq"], meta["t_first"], meta["t_last"], meta["missing"] = seq, t_first, t_last, missing
+        self._lock[k] = 2 * n + 2
+        self._count = n + 1
+        self._header["published"] = n + 1
+        return n
+
+    def publish_frame(self, frame) -> int:
+        """publish() an fpga_stream.AssembledFrame."""
+        return self.publish(frame.pixels, frame.lines_received, frame.seq, frame.t_first, frame.t_last,
+                            frame.missing)
+
+    def close(self) -> None:
+        self._unmap()
+        self._shm.close()
+        self._shm.unlink()
+        _created_here.discard(self._shm.name)
+
+
+class BusFrame:
+    """Zero-copy views of one published frame; check stale() after using them."""
+
+    def __init__(self, reader: "BusReader", index: int, slot: int):
+        self.index = index
+        self.pixels = reader._pixels[slot]
+        self.lines_received = reader._lines[slot]
+        meta = reader._meta[slot]
+        self.seq = int(meta["seq"])
+        self.t_first = float(meta["t_first"])
+        self.t_last = float(meta["t_last"])
+        self.missing = int(meta["missing"])
+        self.packed = reader.packed
+        self._lock = reader._lock
+        self._slot = slot
+
+    def stale(self) -> bool:
+        """True if the writer has started overwriting this slot since the frame was mapped."""
+        return int(self._lock[self._slot]) != 2 * self.index + 2
+
+    def unpack(self, msb_first: bool = True) -> np.ndarray:
+        """The frame as one uint8 {0, 255} per pixel (a new array)."""
+        if not self.packed:
+            return self.pixels.copy()
+        bits = np.unpackbits(self.pixels, axis=1, bitorder="big" if msb_first else "little")
+        np.multiply(bits, 255, out=bits)
+        return bits
+
+
+class BusReader(_Bus):
+    """Attaches to a bus by name. Reading never blocks or slows down the writer."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the block when they exit (the resource tracker would)
+        if self._shm.name not in _created_here:
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        header = np.ndarray((), dtype=_HEADER, buffer=self._shm.buf)
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{name} is not a frame bus (magic={header['magic']!r})")
+        del header
+        self._map(self._shm)
+        self._next = self.published  # start with the next frame
+        self.lost = 0                # frames overwritten before this reader got to them
+
+    def get(self, index: int) -> BusFrame | None:
+        """Frame `index` if it is still in its slot and fully written, else None."""
+        slot = index % self.slots
+        if int(self._lock[slot]) != 2 * index + 2:
+            return None
+        frame = BusFrame(self, index, slot)
+        return None if frame.stale() else frame
+
+    def latest(self) -> BusFrame | None:
+        published = self.published
+        return self.get(published - 1) if published else None
+
+    def next(self, timeout: float | None = None) -> BusFrame | None:
+        """The next frame after the last one returned, waiting up to `timeout` (None = forever)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            published = self.published
+            # The slot of `published - slots` may be under rewrite already
+            oldest = max(0, published - self.slots + 1)
+            if self._next < oldest:
+                self.lost += oldest - self._next
+                self._next = oldest
+            while self._next < published:
+                frame = self.get(self._next)
+                self._next += 1
+                if frame is not None:
+                    return frame
+                self.lost += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def close(self) -> None:
+        self._unmap()
+        self._shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("name", help="bus name given to udp_binary_viewer.py --bus")
+    parser.add_argument("--show", action="store_true", help="display the frames (cv2 window)")
+    parser.add_argument("--record", metavar="PATH", help="append the frames to a memory-mapped frame archive")
+    parser.add_argument("--max-frames", type=int, default=30 * 3600, help="archive capacity in frames")
+    parser.add_argument("--analytics", metavar="PATH", help="write per-frame edge statistics to PATH (JSON lines)")
+    args = parser.parse_args()
+
+    reader = BusReader(args.name)
+    print(f"Attached to {args.name}: {reader.slots} slots of {reader.height} x {reader.row_bytes} bytes "
+          f"({'packed' if reader.packed else 'unpacked'})")
+    writer = renderer = stage = None
+    if args.record:
+        from frame_archive import FrameArchiveWriter
+        writer = FrameArchiveWriter(args.record, args.max_frames, reader.height, reader.row_bytes)
+    if args.analytics:
+        from edge_analytics import AnalyticsStage
+        stage = AnalyticsStage(out_path=args.analytics)
+    if args.show:
+        import cv2
+        import udp_binary_viewer as viewer
+        cv2.namedWindow(args.name, cv2.WINDOW_NORMAL)
+        if reader.packed:
+            renderer = viewer.PackedRenderer(viewer.make_display_lut(viewer.BITORDER_MSB_FIRST,
+                                                                     viewer.INVERT_DISPLAY))
+
+    frames = stale = 0
+    next_report = time.time() + 1.0
+    try:
+        while writer is None or not writer.full:
+            frame = reader.next(timeout=0.1 if args.show else 1.0)
+            if frame is not None:
+                if writer is not None:
+                    writer.append(frame.pixels, frame.lines_received, frame.seq, frame.t_first, frame.t_last)
+                if stage is not None:
+                    stage.submit(frame.pixels, frame.lines_received, frame.seq, frame.t_first)
+                if args.show:
+                    if renderer is not None:
+                        renderer.render(frame.pixels, frame.lines_received)
+                        image = renderer.image
+                    else:
+                        image = frame.pixels
+                    cv2.imshow(args.name, image)
+                if frame.stale():
+                    stale += 1  # overwritten while we used it; the archive slot / image may be torn
+                frames += 1
+            if args.show and cv2.waitKey(1) & 0xFF == 27:
+                break
+            if time.time() >= next_report:
+                print(f"{time.strftime('%H:%M:%S')} frames={frames} lost={reader.lost} stale={stale}"
+                      + (f" recorded={writer.count}" if writer is not None else "")
+                      + (f" {stage.stats()}" if stage is not None else ""))
+                next_report = time.time() + 1.0
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+        if stage is not None:
+            stage.close()
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
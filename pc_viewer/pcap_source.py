@@ -0,0 +1,405 @@
+"""Offline source: FPGA line streams from pcap / pcapng captures.
+
+The capture is memory-mapped and indexed without a Python object per packet:
+records of equal size follow each other at a fixed stride, so the scanner
+guesses the stride from one record header, views every header of the run
+in place through a strided NumPy array and checks them all at once; a
+mismatch ends the run and the next one starts there. A capture of FPGA
+traffic is a handful of runs. pcapng Enhanced Packet Blocks are scanned the
+same way; the other block types (section / interface headers, ...) are
+few and read one by one.
+
+The link, IPv4 and UDP headers of all records are then parsed with array
+operations and the UDP payloads for one destination port are handed, in
+batches, to fpga_stream.decode_datagrams() and a FrameAssembler, i.e. the
+same path the live receivers use. Batches are zero-copy views into the
+mapping when their datagrams are evenly spaced in the file.
+
+Two pacings:
+    speed=None  as fast as possible (decode-throughput benchmark)
+    speed=1.0   at the capture timestamps (2.0 = twice as fast, ...)
+The assembler always sees capture time, so frame timeouts and the
+frames' t_first / t_last are those of the original traffic, to within one
+batch (REPLAY_TICK when replaying, up to BATCH datagrams otherwise).
+
+Supported: pcap (micro- / nanosecond, either byte order) and pcapng, link
+types Ethernet (with up to two VLAN tags), Linux cooked capture and raw
+IPv4. Fragmented IP datagrams (never sent by the FPGA) are skipped.
+
+    python pcap_source.py capture.pcapng                  # benchmark, loss statistics
+    python pcap_source.py capture.pcap --speed 1 --record capture.frames
+"""
+import argparse
+import mmap
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from fpga_stream import DEFAULT_FORMAT, FrameAssembler, StreamFormat, decode_datagrams
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAP_HEADER_LEN = 24
+PCAP_RECORD_LEN = 16       # ts_sec, ts_frac, incl_len, orig_len
+
+PCAPNG_SHB = 0x0A0D0D0A    # section header block
+PCAPNG_IDB = 1             # interface description block
+PCAPNG_SPB = 3             # simple packet block
+PCAPNG_EPB = 6             # enhanced packet block
+PCAPNG_BOM = 0x1A2B3C4D
+PCAPNG_EPB_LEN = 28        # block type, length, interface, ts high, ts low, caplen, origlen
+PCAPNG_OPT_TSRESOL = 9
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+IPPROTO_UDP = 17
+
+SCAN_WINDOW = 1 << 16      # records checked at once while a run of equal-sized records goes on
+BATCH = 4096               # datagrams per decode_datagrams() call
+REPLAY_TICK = 0.001        # s of capture time per batch when replaying at the timestamps
+LISTEN_PORT = 6102
+
+
+@dataclass
+class Records:
+    """Every packet of a capture: where its bytes are in the file, how many, when and on which link."""
+    offset: np.ndarray     # int64, file offset of the first captured byte
+    caplen: np.ndarray     # int64, captured bytes
+    stamp: np.ndarray      # float64, capture time in seconds
+    linktype: np.ndarray   # int32, link-layer header type
+
+    def __len__(self) -> int:
+        return self.offset.size
+
+
+@dataclass
+class Datagrams:
+    """UDP payloads of a capture for one port, plus what was filtered out."""
+    offset: np.ndarray
+    length: np.ndarray
+    stamp: np.ndarray
+    records: int = 0
+    other: int = 0         # not IPv4/UDP or another port
+    fragments: int = 0
+    truncated: int = 0     # cut by the capture's snaplen
+
+    def __len__(self) -> int:
+        return self.offset.size
+
+
+class CaptureReader:
+    """A memory-mapped pcap or pcapng file and the index of its packets."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = np.frombuffer(self._map, dtype=np.uint8)
+        self.truncated = False      # the file ends in the middle of a record
+        magic = bytes(self._map[:4])
+        if int.from_bytes(magic, "little") == PCAPNG_SHB:
+            self.format = "pcapng"
+            self.records = self._scan_pcapng()
+        elif {int.from_bytes(magic, "little"), int.from_bytes(magic, "big")} & {PCAP_MAGIC_US, PCAP_MAGIC_NS}:
+            self.format = "pcap"
+            self.records = self._scan_pcap()
+        else:
+            self.close()
+            raise ValueError(f"{path}: not a pcap or pcapng file (magic {magic.hex()})")
+
+    def close(self) -> None:
+        self.buf = None
+        self.records = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _words(self, order: str, pos: int, n: int, stride: int, count: int) -> np.ndarray:
+        """(n, count) uint32 fields of n records `stride` bytes apart, viewed in place."""
+        return np.ndarray((n, count), dtype=f"{order}u4", buffer=self._map, offset=pos, strides=(stride, 4))
+
+    def _runs(self, order: str, pos: int, end: int, fields: int, stride_of, matches):
+        """Scan records of equal size in runs; yields (pos, stride, headers of the run), headers as (n, fields)."""
+        window = 16
+        while pos + fields * 4 <= end:
+            stride = stride_of(pos)
+            if stride < fields * 4 or pos + stride > end:
+                return pos
+            n = min((end - pos) // stride, window)
+            heads = self._words(order, pos, n, stride, fields)
+            bad = np.flatnonzero(~matches(heads, stride))
+            run = int(bad[0]) if bad.size else n
+            if run == 0:
+                return pos
+            yield pos, stride, heads[:run]
+            pos += run * stride
+            window = min(SCAN_WINDOW, window * 2) if run == n else 16
+        return pos
+
+    def _scan_pcap(self) -> Records:
+        order = "<" if int.from_bytes(self._map[:4], "little") in (PCAP_MAGIC_US, PCAP_MAGIC_NS) else ">"
+        magic, _, _, _, _, linktype = self._words(order, 0, 1, PCAP_HEADER_LEN, 6)[0].tolist()
+        resolution = 1e-9 if magic == PCAP_MAGIC_NS else 1e-6
+        end = len(self._map)
+
+        def stride_of(pos):
+            return PCAP_RECORD_LEN + int(self._words(order, pos + 8, 1, 4, 1)[0, 0])
+
+        offsets, heads = [], []
+        runs = self._runs(order, PCAP_HEADER_LEN, end, 4, stride_of,
+                          lambda h, stride: h[:, 2] == stride - PCAP_RECORD_LEN)
+        last = PCAP_HEADER_LEN
+        for pos, stride, run in runs:
+            offsets.append(pos + PCAP_RECORD_LEN + stride * np.arange(run.shape[0], dtype=np.int64))
+            heads.append(run)
+            last = pos + stride * run.shape[0]
+        self.truncated = last < end
+        heads = np.concatenate(heads) if heads else np.empty((0, 4), dtype=np.uint32)
+        offset = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+        stamp = heads[:, 0].astype(np.float64) + heads[:, 1].astype(np.float64) * resolution
+        return Records(offset, heads[:, 2].astype(np.int64), stamp, np.full(offset.size, linktype, dtype=np.int32))
+
+    def _scan_pcapng(self) -> Records:
+        end = len(self._map)
+        mm = self._map
+        order = "<"
+        linktypes, resolutions = [], []     # per interface, over all sections
+        section_base = 0                    # interface ids restart in every section
+        parts = []                          # (offset, caplen, interface, ts_high, ts_low) arrays
+        pos = 0
+        while pos + 12 <= end:
+            if int.from_bytes(mm[pos:pos + 4], "little") == PCAPNG_SHB:     # same in both byte orders
+                order = "<" if int.from_bytes(mm[pos + 8:pos + 12], "little") == PCAPNG_BOM else ">"
+                section_base = len(linktypes)
+            block_type = int(self._words(order, pos, 1, 4, 1)[0, 0])
+            length = int(self._words(order, pos + 4, 1, 4, 1)[0, 0])
+            if length < 12 or pos + length > end:
+                break
+            if block_type == PCAPNG_EPB:
+                def stride_of(p):
+                    return int(self._words(order, p + 4, 1, 4, 1)[0, 0])
+
+                runs = self._runs(order, pos, end, 7, stride_of,
+                                  lambda h, stride: (h[:, 0] == PCAPNG_EPB) & (h[:, 1] == stride))
+                first = pos
+                for start, stride, run in runs:
+                    n = run.shape[0]
+                    parts.append((start + PCAPNG_EPB_LEN + stride * np.arange(n, dtype=np.int64),
+                                  np.minimum(run[:, 5], stride - PCAPNG_EPB_LEN - 4).astype(np.int64),
+                                  run[:, 2].astype(np.int64) + section_base, run[:, 3], run[:, 4]))
+                    pos = start + stride * n
+                if pos == first:
+                    break
+                continue
+            if block_type == PCAPNG_IDB:
+                linktypes.append(int.from_bytes(mm[pos + 8:pos + 10], "little" if order == "<" else "big"))
+                resolutions.append(self._tsresol(pos + 16, pos + length - 4, order))
+            elif block_type == PCAPNG_SPB:
+                origlen = int(self._words(order, pos + 8, 1, 4, 1)[0, 0])
+                parts.append((np.array([pos + 12]), np.array([min(origlen, length - 16)]),
+                              np.array([section_base]), np.zeros(1, np.uint32), np.zeros(1, np.uint32)))
+            pos += length
+        self.truncated = pos < end
+        if not parts:
+            return Records(*(np.empty(0, dtype=t) for t in (np.int64, np.int64, np.float64, np.int32)))
+        offset, caplen, iface, high, low = (np.concatenate(column) for column in zip(*parts))
+        order_in_file = np.argsort(offset, kind="stable")   # SPBs were appended out of place
+        offset, caplen, iface, high, low = (a[order_in_file] for a in (offset, caplen, iface, high, low))
+        known = iface < len(linktypes)
+        iface = np.where(known, iface, 0)
+        linktype = np.asarray(linktypes or [0], dtype=np.int32)[iface]
+        linktype[~known] = 0
+        ticks = (high.astype(np.uint64) << np.uint64(32)) | low.astype(np.uint64)
+        stamp = ticks.astype(np.float64) * np.asarray(resolutions or [1e-6])[iface]
+        return Records(offset, caplen, stamp, linktype)
+
+    def _tsresol(self, pos: int, end: int, order: str) -> float:
+        """if_tsresol option of an interface description block, default microseconds."""
+        byteorder = "little" if order == "<" else "big"
+        mm = self._map
+        while pos + 4 <= end:
+            code = int.from_bytes(mm[pos:pos + 2], byteorder)
+            length = int.from_bytes(mm[pos + 2:pos + 4], byteorder)
+            if code == 0:
+                break
+            if code == PCAPNG_OPT_TSRESOL and length >= 1:
+                value = mm[pos + 4]
+                return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            pos += 4 + (length + 3) // 4 * 4
+        return 1e-6
+
+    def udp_datagrams(self, port: int | None = LISTEN_PORT) -> Datagrams:
+        """Payload offsets, lengths and timestamps of the UDP datagrams to `port` (None = any)."""
+        rec = self.records
+        buf = self.buf
+        last = buf.size - 1
+
+        def u8(pos):
+            return buf[np.minimum(pos, last)].astype(np.int64)
+
+        def u16(pos):
+            return (u8(pos) << 8) | u8(pos + 1)
+
+        start, caplen, linktype = rec.offset, rec.caplen, rec.linktype
+        # Link layer -> offset of the IPv4 header
+        ethernet = linktype == LINKTYPE_ETHERNET
+        sll = linktype == LINKTYPE_LINUX_SLL
+        raw = (linktype == LINKTYPE_RAW) | (linktype == LINKTYPE_IPV4)
+        l3 = np.where(sll, 16, 14)
+        ethertype = np.where(sll, u16(start + 14), u16(start + 12))
+        for _ in range(2):
+            tagged = ethernet & np.isin(ethertype, ETHERTYPE_VLAN)
+            ethertype = np.where(tagged, u16(start + l3 + 2), ethertype)
+            l3 = l3 + 4 * tagged
+        l3 = np.where(raw, 0, l3)
+        ip = ((ethernet | sll) & (ethertype == ETHERTYPE_IPV4)) | raw
+        ip &= caplen >= l3 + 20
+        version_ihl = u8(start + l3)
+        ihl = (version_ihl & 0x0F) * 4
+        ip &= ((version_ihl >> 4) == 4) & (ihl >= 20) & (u8(start + l3 + 9) == IPPROTO_UDP)
+        fragment = ip & ((u16(start + l3 + 6) & 0x3FFF) != 0)
+        udp = l3 + ihl
+        ok = ip & ~fragment & (caplen >= udp + 8)
+        if port is not None:
+            ok &= u16(start + udp + 2) == port
+        length = u16(start + udp + 4) - 8
+        truncated = ok & (caplen < udp + 8 + length)
+        ok &= ~truncated & (length >= 0)
+        return Datagrams(offset=(start + udp + 8)[ok], length=length[ok], stamp=rec.stamp[ok], records=len(rec),
+                         other=int(len(rec) - np.count_nonzero(ok) - np.count_nonzero(fragment)
+                                   - np.count_nonzero(truncated)),
+                         fragments=int(np.count_nonzero(fragment)), truncated=int(np.count_nonzero(truncated)))
+
+    def gather(self, offset: np.ndarray, length: np.ndarray) -> np.ndarray:
+        """(n, max length) payload rows; a view into the mapping when the rows are evenly spaced."""
+        width = int(length.max())
+        n = offset.size
+        if n > 1:
+            stride = int(offset[1] - offset[0])
+            if stride >= width and (np.diff(offset) == stride).all() and int(offset[-1]) + width <= self.buf.size:
+                return np.ndarray((n, width), dtype=np.uint8, buffer=self._map, offset=int(offset[0]),
+                                  strides=(stride, 1))
+        index = offset[:, None] + np.arange(width, dtype=np.int64)
+        return self.buf[np.minimum(index, self.buf.size - 1)]
+
+
+def batch_bounds(stamp: np.ndarray, batch: int = BATCH, gap: float | None = None,
+                 tick: float | None = None) -> list[tuple[int, int]]:
+    """Split datagrams into batches of at most `batch`, also cut where the capture time
+    jumps by `gap` or more and at every multiple of `tick` seconds."""
+    n = stamp.size
+    cuts = [np.arange(batch, n, batch)]
+    if gap is not None:
+        cuts.append(np.flatnonzero(np.diff(stamp) >= gap) + 1)
+    if tick is not None and n:
+        cuts.append(np.flatnonzero(np.diff(np.floor((stamp - stamp[0]) / tick))) + 1)
+    edges = np.unique(np.concatenate([[0, n], *cuts])).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def play(reader: CaptureReader, assembler: FrameAssembler, port: int | None = LISTEN_PORT,
+         fmt: StreamFormat = DEFAULT_FORMAT, speed: float | None = None, batch: int = BATCH,
+         counters: dict | None = None, stop=None, on_batch=None) -> dict:
+    """Feed the capture's datagrams for `port` through decode_datagrams() into `assembler`.
+
+    speed=None runs as fast as possible, otherwise batches are released at
+    the capture timestamps divided by `speed`. `stop` (e.g. a
+    threading.Event) ends the playback early; on_batch(count, lengths,
+    stamps, accepted, seconds) is called after every batch, `accepted`
+    being the number of datagrams decoded. The assembler is
+    flushed at the end. Returns the filter and timing statistics.
+    """
+    t_start = time.perf_counter()
+    grams = reader.udp_datagrams(port)
+    t_index = time.perf_counter() - t_start
+    if speed is None:
+        bounds = batch_bounds(grams.stamp, batch, gap=assembler.frame_timeout / 2)
+    else:
+        bounds = batch_bounds(grams.stamp, batch, tick=REPLAY_TICK)
+    t0 = float(grams.stamp[0]) if len(grams) else 0.0
+    wall0 = time.perf_counter()
+    lines = 0
+    for a, b in bounds:
+        if stop is not None and stop.is_set():
+            break
+        now = float(grams.stamp[b - 1])
+        if speed is not None:
+            delay = wall0 + (now - t0) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t_batch = time.perf_counter()
+        lengths = grams.length[a:b]
+        data = reader.gather(grams.offset[a:b], lengths)
+        rows, pixels, frames, valid = decode_datagrams(data, lengths, fmt, assembler.packed, counters,
+                                                       with_valid=True)
+        assembler.add_lines(rows, pixels, now, frames)
+        lines += rows.size
+        if on_batch is not None:
+            on_batch(b - a, lengths, grams.stamp[a:b], int(np.count_nonzero(valid)),
+                     time.perf_counter() - t_batch)
+    assembler.flush()
+    return {"records": grams.records, "datagrams": len(grams), "other": grams.other,
+            "fragments": grams.fragments, "truncated": grams.truncated, "lines": lines,
+            "bytes": int(grams.length.sum()), "batches": len(bounds),
+            "capture_seconds": float(grams.stamp[-1] - t0) if len(grams) else 0.0,
+            "index_seconds": t_index, "play_seconds": time.perf_counter() - wall0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble FPGA frames from a pcap / pcapng capture.")
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("--port", type=int, default=LISTEN_PORT, help="UDP destination port (default: %(default)s)")
+    parser.add_argument("--width", type=int, default=DEFAULT_FORMAT.width)
+    parser.add_argument("--height", type=int, default=DEFAULT_FORMAT.height)
+    parser.add_argument("--speed", type=float,
+                        help="replay at the capture timestamps, SPEED times faster (default: as fast as possible)")
+    parser.add_argument("--batch", type=int, default=BATCH, help="datagrams per decode pass (default: %(default)s)")
+    parser.add_argument("--record", metavar="PATH", help="write the assembled frames to a FrameArchive")
+    parser.add_argument("--max-frames", type=int, default=30 * 3600, help="archive capacity with --record")
+    args = parser.parse_args()
+
+    fmt = StreamFormat(args.width, args.height)
+    writer = None
+    if args.record:
+        from frame_archive import FrameArchiveWriter
+        writer = FrameArchiveWriter(args.record, args.max_frames, fmt.height, fmt.bytes_per_line)
+
+    def on_frame(frame) -> None:
+        if writer is not None and not writer.full:
+            writer.append(frame.pixels, frame.lines_received, frame.seq, frame.t_first, frame.t_last)
+
+    counters = {"pkts": 0, "idx_from_BE": 0, "idx_from_LE": 0, "idx_invalid": 0}
+    assembler = FrameAssembler(on_frame, packed=True, fmt=fmt, jitter_frames=3, frame_timeout=0.05)
+    with CaptureReader(args.capture) as reader:
+        print(f"{args.capture}: {reader.format}, {len(reader.records)} records"
+              + (" (file truncated)" if reader.truncated else ""))
+        stats = play(reader, assembler, args.port, fmt, args.speed, args.batch, counters)
+    if writer is not None:
+        writer.close()
+        print(f"Recorded {writer.count} frames to {args.record}")
+
+    seconds = stats["play_seconds"]
+    print(f"UDP to port {args.port}: {stats['datagrams']} datagrams, {stats['lines']} lines "
+          f"(other={stats['other']} fragments={stats['fragments']} truncated={stats['truncated']} "
+          f"invalid={counters['idx_invalid']})")
+    print(f"index {stats['index_seconds'] * 1e3:.1f} ms, decode + assembly {seconds * 1e3:.1f} ms: "
+          f"{stats['datagrams'] / max(seconds, 1e-9):,.0f} datagrams/s, "
+          f"{stats['bytes'] * 8 / max(seconds, 1e-9) / 1e9:.2f} Gb/s, "
+          f"{stats['lines'] / fmt.height / max(seconds, 1e-9):,.1f} frames/s "
+          f"(capture spans {stats['capture_seconds']:.3f} s)")
+    print(f"frames={assembler.frames_emitted} incomplete={assembler.frames_incomplete} "
+          f"missing_lines={assembler.missing_lines} late_lines={assembler.late_lines}")
+
+
+if __name__ == "__main__":
+    main()
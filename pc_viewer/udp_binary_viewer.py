@@ -1,18 +1,31 @@
+import argparse
+import math
+import os
+import selectors
 import socket
 import struct
 import sys
+import threading
 import time
 from typing import Tuple
 
 import cv2
 import numpy as np
 
+from fpga_stream import (AssembledFrame, FrameAssembler, LINE_HEADER_LEN, V2_LINES_PER_PACKET, StreamFormat,
+                         decode_datagrams, no_lines)
+from edge_analytics import ANALYTICS_WORKERS, AnalyticsStage
+from edge_codec import EdgeEncoder
+from frame_archive import FrameArchiveWriter
+from frame_bus import BUS_SLOTS, BusWriter
+from pcap_source import CaptureReader, play
+from viewer_metrics import MetricsRegistry, ViewerMetrics, serve_metrics
+
 # ---- User params ----
 IMAGE_WIDTH = 1280
 IMAGE_HEIGHT = 720
 BITS_PER_PIXEL = 1  # binary image
 BYTES_PER_LINE = IMAGE_WIDTH // 8  # 160
-LINE_HEADER_LEN = 2  # line number (uint16)
 PAYLOAD_LEN = LINE_HEADER_LEN + BYTES_PER_LINE  # 162
 
 # Network params (adjust to your sender configuration)
@@ -20,15 +33,31 @@ LISTEN_IP = "0.0.0.0"  # bind all interfaces
 LISTEN_PORT = 6102      # must match DES_UDP_PORT on FPGA
 RECV_BUF_SIZE = 10240    # socket recv buffer per call (UDP datagram max read)
 SOCKET_RCVBUF = 8 * 1024 * 1024  # kernel socket buffer size
+RECV_BATCH = 256         # datagrams drained into one preallocated buffer per pass
+RECV_SLOT_SIZE = 2048    # bytes reserved per datagram in the batch buffer (>= one MTU payload)
+METRICS_HOST = "127.0.0.1"  # --metrics-port serves http://METRICS_HOST:port/metrics
+REPLAY_SPEED = 1.0       # --pcap: capture time per wall-clock time (0 = as fast as possible)
+
+# Linux socket options for kernel drop counts and receive timestamps (the socket module lacks them)
+KERNEL_STATS = sys.platform.startswith("linux")
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40)
 
 # Display params
 WINDOW_NAME = "FPGA Binary Image (1bpp)"
 DISPLAY_SCALE = 1  # 1 = 1280x720; set 2/3/4 to scale up for visibility
 FPS_SMOOTHING = 0.9
+RECORD_MAX_FRAMES = 30 * 3600  # default archive capacity for --record (1 hour at 30 fps, ~12.4 GB)
+DISPLAY_MAX_FPS = 60  # display refresh cap; frames completed in between are dropped (latest wins)
+
+# Frame assembly: a new frame starts when the line index jumps back by more than
+# half the height (image_eth_formatter resets line_count on vsync)
+JITTER_FRAMES = 3        # frames kept in flight for late/reordered lines
+FRAME_TIMEOUT = 0.05     # s without new lines before a frame is emitted incomplete
 
 # Line numbering: define endianness used by FPGA for the 2-byte line index
-# Commonly network byte order (big-endian). Change to '<H' if little-endian.
-LINE_NUM_STRUCT = ">H"  # preferred/default (will auto-detect per packet as well)
+# image_eth_formatter.v sends the low byte first (little-endian). Change to '>H' for big-endian senders.
+LINE_NUM_STRUCT = "<H"  # preferred/default (will auto-detect per packet as well)
 
 # Bit order within each data byte: True => MSB->LSB maps left->right; False => LSB-first
 BITORDER_MSB_FIRST = True
@@ -46,72 +75,45 @@ DEBUG_COUNTERS = {
     "idx_invalid": 0,
 }
 
-# Optional: map incoming line index by modulo H to absorb wrap-around/overflow
-MAP_LINEIDX_BY_MOD = True
+# Protocol settings above, for the shared decoding/assembly code in fpga_stream
+STREAM_FORMAT = StreamFormat(IMAGE_WIDTH, IMAGE_HEIGHT, LINE_NUM_STRUCT[0], BITORDER_MSB_FIRST)
 
 
-def init_socket() -> socket.socket:    
+def init_socket(host: str | None = None, port: int | None = None) -> socket.socket:
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     # improve robustness under bursty traffic
     try:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
     except OSError:
         pass
-    s.bind((LISTEN_IP, LISTEN_PORT))
+    s.bind((LISTEN_IP if host is None else host, LISTEN_PORT if port is None else port))
     s.settimeout(0.0)  # non-blocking
     return s
 
 
-def bitpack_to_bytes(line_bits: bytes) -> np.ndarray:
-    """Convert 160 bytes (each bit a pixel) to 1280 uint8 pixels {0,255}.
+def enable_kernel_stats(sock: socket.socket) -> bool:
+    """Ask the kernel to attach its drop count and a receive timestamp to every datagram."""
+    if not KERNEL_STATS:
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        return False
+    return True
 
-    V1: Each byte from FPGA assumed MSB->LSB is left->right pixel order.
-        If your hardware packs in LSB-first, flip with np.unpackbits(bitorder='little').
-    """
-    assert len(line_bits) == BYTES_PER_LINE
-    # Convert to bits array of shape (1280,) values in {0,1}
-    bitorder = 'big' if BITORDER_MSB_FIRST else 'little'
-    bits = np.unpackbits(np.frombuffer(line_bits, dtype=np.uint8), bitorder=bitorder)
-    # Map to 0/255 and ensure shape (H, W)
-    return (bits * 255).astype(np.uint8)
 
+def make_display_lut(msb_first: bool = True, invert: bool = False) -> np.ndarray:
+    """(256, 8) uint8 table: packed byte -> its 8 pixels left to right, as {0, 255}.
 
-def parse_line_index(hdr2: bytes) -> tuple[int | None, str]:
-    """Return (line_idx, how) with auto-handling of endianness and 0/1-based.
-    how in {"BE","LE","AMB","INV"} for diagnostics.
+    Bit order and display inversion are folded into the table, so expanding a
+    packed line is a single table lookup per byte.
     """
-    be = struct.unpack('>H', hdr2)[0]
-    le = struct.unpack('<H', hdr2)[0]
-
-    candidates = []
-    # Accept 0-based direct
-    if 0 <= be < IMAGE_HEIGHT:
-        candidates.append((be, 'BE'))
-    # Accept 1-based -> 0-based
-    if 1 <= be <= IMAGE_HEIGHT:
-        candidates.append((be - 1, 'BE'))
-
-    if 0 <= le < IMAGE_HEIGHT:
-        candidates.append((le, 'LE'))
-    if 1 <= le <= IMAGE_HEIGHT:
-        candidates.append((le - 1, 'LE'))
-
-    # Deduplicate by index value, keep preference: BE over LE if same index
-    if not candidates:
-        return None, 'INV'
-    # pick the first unique value; prefer a BE candidate if available
-    # group by index
-    seen = {}
-    for idx, how in candidates:
-        if idx not in seen:
-            seen[idx] = how
-            # prefer BE if appears
-            if how == 'BE':
-                break
-    # choose first entry in seen
-    idx = next(iter(seen.keys()))
-    how = seen[idx]
-    return idx, how
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1,
+                         bitorder='big' if msb_first else 'little')
+    if invert:
+        bits ^= 1
+    return bits * np.uint8(255)
 
 
 def make_frame_buffer() -> np.ndarray:
@@ -119,110 +121,670 @@ def make_frame_buffer() -> np.ndarray:
     return np.zeros((IMAGE_HEIGHT, IMAGE_WIDTH), dtype=np.uint8)
 
 
-def main():
-    print(f"Listening on UDP {LISTEN_IP}:{LISTEN_PORT}, expecting payload={PAYLOAD_LEN} bytes per line")
-    sock = init_socket()
+class RecvBatch:
+    """Preallocated (capacity, slot_size) receive buffer, one row per datagram.
 
-    frame = make_frame_buffer()
-    lines_received = np.zeros(IMAGE_HEIGHT, dtype=np.bool_)
-    last_vsync_time = time.time()
-    last_fps = 0.0
-    next_report = time.time() + 1.0
+    fill() drains the non-blocking socket with recv_into() straight into the rows,
+    so no bytes object is created per packet; lengths[i] holds the size of row i.
 
-    if DISPLAY_SCALE != 1:
-        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(WINDOW_NAME, IMAGE_WIDTH * DISPLAY_SCALE, IMAGE_HEIGHT * DISPLAY_SCALE)
-    else:
-        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
-        cv2.resizeWindow(WINDOW_NAME, IMAGE_WIDTH, IMAGE_HEIGHT)
+    With ancillary=True (metrics enabled) it uses recvmsg_into() instead and also
+    records a per-datagram arrival time in stamps[i] (the kernel timestamp when
+    enable_kernel_stats() succeeded, else time.time()) and the kernel's
+    cumulative drop count for the socket in kernel_drops.
+    """
 
-    while True:
-        # Gather packets available at this moment
-        processed_any = False
-        while True:
+    def __init__(self, capacity: int = RECV_BATCH, slot_size: int = RECV_SLOT_SIZE, ancillary: bool = False):
+        self.capacity = capacity
+        self.buf = np.zeros((capacity, slot_size), dtype=np.uint8)
+        self.lengths = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+        self._rows = [memoryview(row) for row in self.buf]
+        self.ancillary = ancillary
+        self.stamps = np.zeros(capacity, dtype=np.float64) if ancillary else None
+        self.kernel_drops = 0
+
+    def fill(self, sock: socket.socket) -> int:
+        """Receive up to `capacity` datagrams that are already queued; return how many."""
+        if self.ancillary:
+            return self._fill_ancillary(sock)
+        recv_into = sock.recv_into
+        lengths = self.lengths
+        count = 0
+        for row in self._rows:
             try:
-                data, addr = sock.recvfrom(RECV_BUF_SIZE)
-            except BlockingIOError:
+                nbytes = recv_into(row)
+            except (BlockingIOError, socket.timeout):
                 break
-            except socket.timeout:
+            except OSError:
+                # e.g. WSAECONNRESET / WSAEMSGSIZE on Windows: drop this datagram
+                continue
+            lengths[count] = nbytes
+            count += 1
+        self.count = count
+        return count
+
+    def _fill_ancillary(self, sock: socket.socket) -> int:
+        recvmsg_into = sock.recvmsg_into
+        lengths, stamps = self.lengths, self.stamps
+        cmsg_size = socket.CMSG_SPACE(4) + socket.CMSG_SPACE(16) if KERNEL_STATS else 0
+        count = 0
+        for row in self._rows:
+            try:
+                nbytes, ancdata, _, _ = recvmsg_into([row], cmsg_size)
+            except (BlockingIOError, socket.timeout):
                 break
-
-            if len(data) < PAYLOAD_LEN:
-                # Ignore malformed/short packets
+            except OSError:
                 continue
+            stamp = None
+            for level, kind, data in ancdata:
+                if level != socket.SOL_SOCKET:
+                    continue
+                if kind == SO_TIMESTAMPNS and len(data) >= 16:
+                    sec, nsec = _TIMESPEC.unpack_from(data)
+                    stamp = sec + nsec * 1e-9
+                elif kind == SO_RXQ_OVFL and len(data) >= 4:
+                    self.kernel_drops = _DROP_COUNT.unpack_from(data)[0]
+            lengths[count] = nbytes
+            stamps[count] = time.time() if stamp is None else stamp
+            count += 1
+        self.count = count
+        return count
+
+
+_TIMESPEC = struct.Struct("@qq")  # struct timespec on 64-bit Linux
+_DROP_COUNT = struct.Struct("@I")
+
+
+def decode_batch(batch: RecvBatch, packed: bool = False, with_valid: bool = False):
+    """Decode every datagram in `batch` in one pass (see fpga_stream.decode_datagrams).
+
+    Returns (line_idx, pixels, frame_counters) in arrival order, pixels being
+    an (N, IMAGE_WIDTH) array of {0, 255}, or the raw (N, BYTES_PER_LINE)
+    payload bytes when `packed` is set; frame_counters is None unless the
+    batch is all protocol v2. `with_valid` appends the mask of the datagrams
+    that were decoded.
+    """
+    n = batch.count
+    if n == 0:
+        out = (*no_lines(STREAM_FORMAT, packed), None, np.zeros(0, dtype=np.bool_))
+        return out if with_valid else out[:3]
+    data = batch.buf[:n]
+
+    # Debug: header and length for first few packets
+    seen = DEBUG_COUNTERS["pkts"]
+    if seen < DEBUG_PRINT_FIRST_N:
+        ok = batch.lengths[:n] >= PAYLOAD_LEN
+        for i, row in enumerate(np.flatnonzero(ok)[:DEBUG_PRINT_FIRST_N - seen], start=seen + 1):
+            be_hdr = struct.unpack('>H', data[row, :2].tobytes())[0]
+            le_hdr = struct.unpack('<H', data[row, :2].tobytes())[0]
+            print(f"DEBUG pkt#{i}: len={batch.lengths[row]} hdr_be={be_hdr} hdr_le={le_hdr}")
+
+    return decode_datagrams(data, batch.lengths[:n], STREAM_FORMAT, packed, DEBUG_COUNTERS, with_valid)
+
+
+class FrameExchange:
+    """Triple buffer handing frames from the receive thread to the display loop.
+
+    publish() copies a frame (and the mask of lines it received) into the back
+    buffer and swaps it with the ready buffer; latest() swaps the ready buffer
+    with the front buffer. Neither side waits for the other: a ready frame that
+    is replaced before the display picks it up is dropped and counted in
+    `dropped`.
+    """
 
-            # Debug: header and length for first few packets
-            DEBUG_COUNTERS["pkts"] += 1
-            if DEBUG_COUNTERS["pkts"] <= DEBUG_PRINT_FIRST_N:
-                be_hdr = struct.unpack('>H', data[:2])[0]
-                le_hdr = struct.unpack('<H', data[:2])[0]
-                print(f"DEBUG pkt#{DEBUG_COUNTERS['pkts']}: len={len(data)} hdr_be={be_hdr} hdr_le={le_hdr}")
-
-            # Parse line index robustly
-            line_idx, how = parse_line_index(data[0:2])
-            if line_idx is None:
-                DEBUG_COUNTERS["idx_invalid"] += 1
-                continue
-            if MAP_LINEIDX_BY_MOD:
-                line_idx = int(line_idx) % IMAGE_HEIGHT
-            if how == 'BE':
-                DEBUG_COUNTERS["idx_from_BE"] += 1
-            elif how == 'LE':
-                DEBUG_COUNTERS["idx_from_LE"] += 1
-            else:
-                DEBUG_COUNTERS["idx_ambiguous"] += 1
-
-            line_bits = data[LINE_HEADER_LEN:LINE_HEADER_LEN + BYTES_PER_LINE]
-            line_pixels = bitpack_to_bytes(line_bits)
-            frame[line_idx, :] = line_pixels
-            lines_received[line_idx] = True
-            processed_any = True
-
-        # If at least one line updated, show frame and compute FPS
-        now = time.time()
-        if processed_any:
-            # Estimate FPS by detecting frame completion or using EWMA of line rate
-            complete = bool(lines_received.all())
-            if complete:
-                last_vsync_time, last_fps = now, 1.0 / max(1e-6, now - last_vsync_time)
-                lines_received.fill(False)
-            else:
-                # EWMA approximation based on line updates
-                last_fps = FPS_SMOOTHING * last_fps + (1.0 - FPS_SMOOTHING) * (processed_any)
-
-            show = frame if not INVERT_DISPLAY else (255 - frame)
-            cv2.imshow(WINDOW_NAME, show)
-            # 1ms wait keeps window responsive; ESC to quit
-            k = cv2.waitKey(1) & 0xFF
+    def __init__(self, shape: Tuple[int, ...], dtype=np.uint8):
+        self._back, self._ready, self._front = (
+            (np.zeros(shape, dtype=dtype), np.zeros(shape[0], dtype=np.bool_)) for _ in range(3))
+        self._lock = threading.Lock()
+        self._published = 0  # sequence number of the frame in the ready buffer
+        self._taken = 0      # sequence number last handed to the display
+        self.dropped = 0
+
+    def publish(self, frame: np.ndarray, lines_received: np.ndarray | None = None) -> None:
+        pixels, lines = self._back
+        np.copyto(pixels, frame)
+        if lines_received is None:
+            lines.fill(True)
+        else:
+            np.copyto(lines, lines_received)
+        with self._lock:
+            self._back, self._ready = self._ready, self._back
+            if self._published != self._taken:
+                self.dropped += 1  # the display never saw the previous ready frame
+            self._published += 1
+
+    def latest(self) -> Tuple[int, np.ndarray | None, np.ndarray | None]:
+        """Return (seq, frame, lines_received) for a frame newer than the last call, else (seq, None, None).
+
+        The returned arrays stay valid until the next call.
+        """
+        with self._lock:
+            if self._published == self._taken:
+                return self._taken, None, None
+            self._ready, self._front = self._front, self._ready
+            self._taken = self._published
+        return self._taken, *self._front
+
+
+class PackedRenderer:
+    """Expands packed (IMAGE_HEIGHT, BYTES_PER_LINE) frames into a persistent display image.
+
+    Only dirty rows are expanded: rows the frame received whose bytes differ
+    from what is on screen. Each run of consecutive dirty rows is one np.take
+    through the display LUT, viewed as one uint64 (8 pixels) per byte value,
+    straight into the image. All scratch buffers are preallocated, so rendering
+    allocates no frame-sized temporaries. Rows a frame did not receive keep
+    their previous content.
+
+    `tile` is where the image is shown (e.g. a view into a mosaic); if it is
+    not contiguous the rows are expanded into a private buffer and the dirty
+    runs copied over.
+    """
+
+    def __init__(self, lut: np.ndarray, tile: np.ndarray | None = None):
+        self.tile = make_frame_buffer() if tile is None else tile
+        self.image = self.tile if self.tile.flags.c_contiguous else make_frame_buffer()
+        self._words = self.image.view(np.uint64)  # (IMAGE_HEIGHT, BYTES_PER_LINE), 8 pixels each
+        self._shown = np.zeros((IMAGE_HEIGHT, BYTES_PER_LINE), dtype=np.uint8)  # packed rows on screen
+        self._index = np.zeros((IMAGE_HEIGHT, BYTES_PER_LINE), dtype=np.intp)  # _shown as take() indices
+        self._diff = np.empty((IMAGE_HEIGHT, BYTES_PER_LINE), dtype=np.bool_)
+        self._dirty = np.empty(IMAGE_HEIGHT, dtype=np.bool_)
+        self.set_lut(lut)
+
+    def set_lut(self, lut: np.ndarray) -> None:
+        """Switch bit order / inversion: re-expand every row from the packed copy on screen."""
+        self.lut = np.ascontiguousarray(lut, dtype=np.uint8).view(np.uint64).reshape(256)
+        self._expand(0, IMAGE_HEIGHT)
+
+    def render(self, packed: np.ndarray, lines_received: np.ndarray) -> int:
+        """Bring the image up to date with `packed`; return the number of rows expanded."""
+        dirty = self._dirty
+        np.not_equal(packed, self._shown, out=self._diff)
+        np.any(self._diff, axis=1, out=dirty)
+        np.logical_and(dirty, lines_received, out=dirty)
+        rows = np.flatnonzero(dirty)
+        if rows.size == 0:
+            return 0
+        # Split into runs of consecutive rows
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        starts = rows[np.r_[0, breaks]].tolist()
+        ends = (rows[np.r_[breaks - 1, rows.size - 1]] + 1).tolist()
+        for a, b in zip(starts, ends):
+            self._shown[a:b] = packed[a:b]
+            np.copyto(self._index[a:b], packed[a:b], casting='unsafe')
+            self._expand(a, b)
+        return int(rows.size)
+
+    def _expand(self, a: int, b: int) -> None:
+        np.take(self.lut, self._index[a:b], out=self._words[a:b], mode='clip')
+        if self.image is not self.tile:
+            self.tile[a:b] = self.image[a:b]
+
+
+class BoardStream:
+    """Receive state of one source (one FPGA board on one UDP port).
+
+    Owns the socket, its batch buffer, its FrameAssembler and its stats; every
+    frame the assembler emits is passed to on_frame. Driven by FrameReceiver.
+    Subclasses that feed the assembler themselves pass sock=None and a name.
+    """
+
+    def __init__(self, sock: socket.socket | None, on_frame, packed: bool = False,
+                 metrics: ViewerMetrics | None = None, name: str | None = None):
+        self.sock = sock
+        self.name = name or "%s:%d" % sock.getsockname()[:2]
+        self.on_frame = on_frame
+        self.packed = packed
+        self.metrics = metrics
+        self.assembler = FrameAssembler(self._on_frame, packed, STREAM_FORMAT, JITTER_FRAMES, FRAME_TIMEOUT)
+        self.batch = RecvBatch(ancillary=metrics is not None) if sock is not None else None
+        self.kernel_stats = sock is not None and metrics is not None and enable_kernel_stats(sock)
+        self.last_fps = 0.0
+        self.last_missing = 0
+        self._last_frame_time = None
+
+    def _on_frame(self, frame: AssembledFrame) -> None:
+        # FPS from the spacing of frame starts, smoothed
+        if self._last_frame_time is not None:
+            fps = 1.0 / max(1e-6, frame.t_first - self._last_frame_time)
+            self.last_fps = FPS_SMOOTHING * self.last_fps + (1.0 - FPS_SMOOTHING) * fps
+        self._last_frame_time = frame.t_first
+        self.last_missing = frame.missing
+        if self.metrics is not None:
+            self.metrics.observe_frame(frame.missing, self.assembler.late_lines)
+        self.on_frame(frame)
+
+    def drain(self) -> None:
+        """Gather packets available at this moment, RECV_BATCH datagrams per pass."""
+        batch, assembler, metrics = self.batch, self.assembler, self.metrics
+        while True:
+            count = batch.fill(self.sock)
+            if count == 0:
+                break
+            t0 = time.perf_counter()
+            rows, pixels, frames, valid = decode_batch(batch, self.packed, with_valid=True)
+            assembler.add_lines(rows, pixels, time.time(), frames)
+            if metrics is not None:
+                metrics.observe_batch(count, batch.lengths, batch.stamps, int(np.count_nonzero(valid)),
+                                      time.perf_counter() - t0,
+                                      batch.kernel_drops if self.kernel_stats else None)
+            if count < batch.capacity:
+                break  # socket drained
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class CaptureStream(BoardStream):
+    """A BoardStream fed from a pcap / pcapng file instead of a socket.
+
+    The datagrams of the capture addressed to `port` go through the same
+    decoding and FrameAssembler as live traffic (see pcap_source.play), at
+    the capture timestamps divided by `speed`, or as fast as possible when
+    `speed` is None. Frame times are capture times.
+    """
+
+    def __init__(self, path: str, port: int, on_frame, packed: bool = False,
+                 metrics: ViewerMetrics | None = None, speed: float | None = REPLAY_SPEED):
+        super().__init__(None, on_frame, packed, metrics, name="%s:%d" % (os.path.basename(path), port))
+        self.reader = CaptureReader(path)
+        self.port = port
+        self.speed = speed
+        self.stats = None       # filter and timing statistics of play(), once finished
+
+    def _observe_batch(self, count, lengths, stamps, accepted, seconds) -> None:
+        self.metrics.observe_batch(count, lengths, stamps, accepted, seconds, None)
+
+    def replay(self, stop: threading.Event) -> None:
+        on_batch = self._observe_batch if self.metrics is not None else None
+        self.stats = play(self.reader, self.assembler, self.port, STREAM_FORMAT, self.speed,
+                          counters=DEBUG_COUNTERS, stop=stop, on_batch=on_batch)
+        print(f"{time.strftime('%H:%M:%S')} [{self.name}] end of capture: {self.stats['datagrams']} datagrams "
+              f"in {self.stats['play_seconds']:.3f} s (other={self.stats['other']} "
+              f"fragments={self.stats['fragments']} truncated={self.stats['truncated']})")
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+class FrameReceiver(threading.Thread):
+    """Receive thread: multiplexes any number of BoardStreams with one selector.
+
+    Runs independently of the GUI (socket waits, NumPy and cv2 release the GIL),
+    so cv2.imshow()/waitKey() never leave the kernel buffers unattended. Each
+    readable stream is drained in batches; every stream's assembler is polled
+    for timed-out frames at least every FRAME_TIMEOUT / 2, even while the
+    other streams keep the selector busy.
+    """
+
+    def __init__(self, streams: list[BoardStream]):
+        super().__init__(name="udp-receiver", daemon=True)
+        self.streams = streams
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        poll_interval = FRAME_TIMEOUT / 2
+        next_poll = time.time() + poll_interval
+        with selectors.DefaultSelector() as sel:
+            for stream in self.streams:
+                sel.register(stream.sock, selectors.EVENT_READ, stream)
+            while not self._stop_event.is_set():
+                for key, _ in sel.select(timeout=poll_interval):
+                    key.data.drain()
+                now = time.time()
+                if now >= next_poll:
+                    for stream in self.streams:
+                        stream.assembler.poll(now)
+                    next_poll = now + poll_interval
+
+
+class CaptureReceiver:
+    """FrameReceiver counterpart for CaptureStreams: one replay thread per capture stream.
+
+    The streams replay side by side, each at its own capture timestamps; a
+    stream that reaches the end of its capture flushes its assembler and
+    its thread ends.
+    """
+
+    def __init__(self, streams: list[CaptureStream]):
+        self.streams = streams
+        self._stop_event = threading.Event()
+        self._threads = [threading.Thread(target=stream.replay, args=(self._stop_event,),
+                                          name=f"pcap-replay-{i}", daemon=True)
+                         for i, stream in enumerate(streams)]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+
+def print_stats(stream: BoardStream, extra: str = "") -> None:
+    asm = stream.assembler
+    print(f"{time.strftime('%H:%M:%S')} [{stream.name}] "
+          f"lines_in_frame={IMAGE_HEIGHT - stream.last_missing}/{IMAGE_HEIGHT} "
+          f"fps~={stream.last_fps:.2f} frames={asm.frames_emitted} incomplete={asm.frames_incomplete} "
+          f"missing={asm.missing_lines} late={asm.late_lines}{extra}")
+
+
+def print_analytics(analytics: list[AnalyticsStage] | None) -> None:
+    for stage in analytics or ():
+        print(f"{time.strftime('%H:%M:%S')} {stage.stats()}")
+
+
+def print_debug_counters() -> None:
+    print(f"{time.strftime('%H:%M:%S')} pkts={DEBUG_COUNTERS['pkts']} BE={DEBUG_COUNTERS['idx_from_BE']} "
+          f"LE={DEBUG_COUNTERS['idx_from_LE']} AMB={DEBUG_COUNTERS['idx_ambiguous']} "
+          f"INV={DEBUG_COUNTERS['idx_invalid']}")
+
+
+def parse_endpoint(spec: str) -> Tuple[str, int]:
+    """'PORT' or 'HOST:PORT' -> (host, port); the host defaults to LISTEN_IP."""
+    host, _, port = spec.rpartition(":")
+    return host or LISTEN_IP, int(port)
+
+
+def open_streams(endpoints: list[Tuple[str, int]], on_frame_for, packed: bool = False,
+                 metrics_port: int | None = None,
+                 analytics: list[AnalyticsStage] | None = None,
+                 capture: Tuple[str, float | None] | None = None) -> list[BoardStream]:
+    """Bind one socket per endpoint; on_frame_for(i) gives stream i's frame callback.
+
+    With `analytics`, stream i's frames are also submitted to analytics[i]
+    (packed streams only); submitting never blocks the receiver. With
+    `capture` = (pcap path, replay speed) no socket is bound: stream i
+    replays the capture's datagrams for port i instead.
+    """
+    registry = start_metrics(metrics_port)
+    streams = []
+    for i, (host, port) in enumerate(endpoints):
+        metrics = ViewerMetrics(registry, {"port": str(port)}) if registry is not None else None
+        on_frame = on_frame_for(i)
+        if analytics is not None:
+            on_frame = _with_analytics(on_frame, analytics[i])
+        if capture is not None:
+            streams.append(CaptureStream(capture[0], port, on_frame, packed, metrics, capture[1]))
+        else:
+            streams.append(BoardStream(init_socket(host, port), on_frame, packed, metrics))
+    return streams
+
+
+def make_receiver(streams: list[BoardStream]):
+    """The receive thread(s) for `streams`: a FrameReceiver, or a CaptureReceiver for capture streams."""
+    if streams and isinstance(streams[0], CaptureStream):
+        return CaptureReceiver(streams)
+    return FrameReceiver(streams)
+
+
+def describe_source(host: str, port: int, capture: Tuple[str, float | None] | None = None) -> str:
+    if capture is None:
+        return f"Listening on UDP {host}:{port}"
+    pace = "as fast as possible" if capture[1] is None else f"at x{capture[1]:g} capture time"
+    return f"Replaying UDP port {port} of {capture[0]} {pace}"
+
+
+def _with_analytics(on_frame, stage: AnalyticsStage):
+    def on_frame_and_submit(frame: AssembledFrame) -> None:
+        on_frame(frame)
+        stage.submit_frame(frame)
+    return on_frame_and_submit
+
+
+def start_analytics(enabled: bool, endpoints: list[Tuple[str, int]], out_path: str | None = None,
+                    workers: int = ANALYTICS_WORKERS) -> list[AnalyticsStage] | None:
+    """One AnalyticsStage per endpoint (None = disabled); results go to `out_path[.<port>]` as JSON lines."""
+    if not enabled:
+        return None
+    paths = [out_path] * len(endpoints)
+    if out_path and len(endpoints) > 1:
+        paths = [f"{out_path}.{port}" for _, port in endpoints]
+    return [AnalyticsStage(workers=workers, out_path=path, msb_first=BITORDER_MSB_FIRST) for path in paths]
+
+
+def close_analytics(analytics: list[AnalyticsStage] | None) -> None:
+    for stage in analytics or ():
+        stage.close()
+
+
+def start_metrics(port: int | None) -> MetricsRegistry | None:
+    """Serve the receive-path metrics on http://METRICS_HOST:port/metrics (None = disabled)."""
+    if port is None:
+        return None
+    registry = MetricsRegistry()
+    server = serve_metrics(registry, port, METRICS_HOST)
+    print(f"Metrics on http://{METRICS_HOST}:{server.server_address[1]}/metrics")
+    return registry
+
+
+def record(path: str, max_frames: int, endpoints: list[Tuple[str, int]] | None = None,
+           metrics_port: int | None = None, compress: bool = False,
+           analytics: list[AnalyticsStage] | None = None,
+           capture: Tuple[str, float | None] | None = None) -> None:
+    """Headless record mode: packed frames straight into a FrameArchive, no window, no unpacking.
+
+    With compress=True frames go to an edge_codec archive instead, encoded in a
+    thread pool beside the receiver. With several endpoints each stream gets
+    its own archive, `<path>.<port>`.
+    """
+    endpoints = endpoints or [(LISTEN_IP, LISTEN_PORT)]
+    paths = [path] if len(endpoints) == 1 else [f"{path}.{port}" for _, port in endpoints]
+    for (host, port), out in zip(endpoints, paths):
+        print(f"{describe_source(host, port, capture)}, recording up to {max_frames} frames to {out}")
+    if compress:
+        writers = [EdgeEncoder(out, max_frames, IMAGE_HEIGHT, BYTES_PER_LINE) for out in paths]
+    else:
+        writers = [FrameArchiveWriter(out, max_frames, IMAGE_HEIGHT, BYTES_PER_LINE) for out in paths]
+
+    def on_frame_for(i: int):
+        writer = writers[i]
+
+        def on_frame(frame: AssembledFrame) -> None:
+            writer.append(frame.pixels, frame.lines_received, frame.seq, frame.t_first, frame.t_last)
+        return on_frame
+
+    streams = open_streams(endpoints, on_frame_for, packed=True, metrics_port=metrics_port, analytics=analytics,
+                           capture=capture)
+    receiver = make_receiver(streams)
+    receiver.start()
+    try:
+        while not all(writer.full for writer in writers):
+            if capture is not None and not receiver.is_alive():
+                print("End of capture, stopping.")
+                break
+            time.sleep(1.0)
+            for stream, writer in zip(streams, writers):
+                print_stats(stream, f" recorded={writer.count}/{max_frames}"
+                                    + (f" {writer.stats()}" if compress else ""))
+            print_analytics(analytics)
+            print_debug_counters()
+        else:
+            print("Archives full, stopping.")
+    finally:
+        receiver.stop()
+        receiver.join()
+        for stream in streams:
+            stream.close()
+        for writer, out in zip(writers, paths):
+            writer.close()
+            print(f"Recorded {writer.count} frames to {out}")
+        close_analytics(analytics)
+
+
+def publish(name: str, slots: int = BUS_SLOTS, endpoints: list[Tuple[str, int]] | None = None,
+            metrics_port: int | None = None, analytics: list[AnalyticsStage] | None = None,
+            capture: Tuple[str, float | None] | None = None) -> None:
+    """Headless bus mode: publish packed frames to a shared-memory frame bus for other processes.
+
+    With several endpoints each stream gets its own bus, `<name>.<port>`.
+    """
+    endpoints = endpoints or [(LISTEN_IP, LISTEN_PORT)]
+    names = [name] if len(endpoints) == 1 else [f"{name}.{port}" for _, port in endpoints]
+    buses = [BusWriter(bus, slots, IMAGE_HEIGHT, IMAGE_WIDTH, packed=True) for bus in names]
+    for (host, port), bus in zip(endpoints, names):
+        print(f"{describe_source(host, port, capture)}, publishing frames to bus '{bus}' ({slots} slots)")
+    streams = open_streams(endpoints, lambda i: buses[i].publish_frame, packed=True, metrics_port=metrics_port,
+                           analytics=analytics, capture=capture)
+    receiver = make_receiver(streams)
+    receiver.start()
+    try:
+        while True:
+            time.sleep(1.0)
+            for stream, bus in zip(streams, buses):
+                print_stats(stream, f" published={bus.published}")
+            print_analytics(analytics)
+            print_debug_counters()
+    finally:
+        receiver.stop()
+        receiver.join()
+        for stream in streams:
+            stream.close()
+        for bus in buses:
+            bus.close()
+        close_analytics(analytics)
+
+
+def mosaic_layout(n: int) -> Tuple[int, int]:
+    """(rows, cols) of the most square grid holding n tiles."""
+    cols = math.ceil(math.sqrt(n))
+    return math.ceil(n / cols), cols
+
+
+def main(endpoints: list[Tuple[str, int]] | None = None, metrics_port: int | None = None,
+         analytics: list[AnalyticsStage] | None = None, capture: Tuple[str, float | None] | None = None):
+    endpoints = endpoints or [(LISTEN_IP, LISTEN_PORT)]
+    for host, port in endpoints:
+        print(f"{describe_source(host, port, capture)}, expecting payload={PAYLOAD_LEN} bytes per line "
+              f"(or {STREAM_FORMAT.v2_payload_len()} per {V2_LINES_PER_PACKET} lines with protocol v2)")
+    # Frames stay packed from the socket to the display; only the renderer expands them
+    exchanges = [FrameExchange((IMAGE_HEIGHT, BYTES_PER_LINE)) for _ in endpoints]
+    streams = open_streams(endpoints,
+                           lambda i: lambda frame: exchanges[i].publish(frame.pixels, frame.lines_received),
+                           packed=True, metrics_port=metrics_port, analytics=analytics, capture=capture)
+    receiver = make_receiver(streams)
+    next_report = time.time() + 1.0
+
+    # One window; stream i is tile i of a row-major grid, each tile a full-size frame
+    grid_rows, grid_cols = mosaic_layout(len(streams))
+    mosaic = np.zeros((grid_rows * IMAGE_HEIGHT, grid_cols * IMAGE_WIDTH), dtype=np.uint8)
+    lut = make_display_lut(BITORDER_MSB_FIRST, INVERT_DISPLAY)
+    renderers = [PackedRenderer(lut, mosaic[r * IMAGE_HEIGHT:(r + 1) * IMAGE_HEIGHT,
+                                            c * IMAGE_WIDTH:(c + 1) * IMAGE_WIDTH])
+                 for r in range(grid_rows) for c in range(grid_cols)][:len(streams)]
+    cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+    cv2.resizeWindow(WINDOW_NAME, IMAGE_WIDTH * DISPLAY_SCALE,
+                     IMAGE_HEIGHT * DISPLAY_SCALE * grid_rows // grid_cols)
+
+    def label(stream: BoardStream, renderer: PackedRenderer) -> None:
+        if len(streams) > 1:
+            cv2.putText(renderer.tile, stream.name, (16, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 128, 3)
+
+    receiver.start()
+    # waitKey() doubles as the refresh pacing: at most DISPLAY_MAX_FPS redraws per second
+    wait_ms = max(1, int(1000 / DISPLAY_MAX_FPS))
+    redraw = True
+    try:
+        while True:
+            for stream, exchange, renderer in zip(streams, exchanges, renderers):
+                _, packed, lines = exchange.latest()
+                if packed is not None and renderer.render(packed, lines):
+                    label(stream, renderer)
+                    redraw = True
+            if redraw:
+                cv2.imshow(WINDOW_NAME, mosaic)
+                redraw = False
+
+            # ESC to quit
+            k = cv2.waitKey(wait_ms) & 0xFF
             if k == 27:  # ESC
                 break
-            elif k == ord('i'):
-                # toggle invert
-                globals()['INVERT_DISPLAY'] = not INVERT_DISPLAY
-                print(f"Invert display: {INVERT_DISPLAY}")
-            elif k == ord('b'):
-                # toggle bit order
-                globals()['BITORDER_MSB_FIRST'] = not BITORDER_MSB_FIRST
-                print(f"Bit order set to: {'MSB->LSB' if BITORDER_MSB_FIRST else 'LSB->MSB'}")
+            elif k in (ord('i'), ord('b')):
+                if k == ord('i'):
+                    # toggle invert
+                    globals()['INVERT_DISPLAY'] = not INVERT_DISPLAY
+                    print(f"Invert display: {INVERT_DISPLAY}")
+                else:
+                    # toggle bit order (display only: frames are kept packed as received)
+                    globals()['BITORDER_MSB_FIRST'] = not BITORDER_MSB_FIRST
+                    print(f"Bit order set to: {'MSB->LSB' if BITORDER_MSB_FIRST else 'LSB->MSB'}")
+                lut = make_display_lut(BITORDER_MSB_FIRST, INVERT_DISPLAY)
+                for stream, renderer in zip(streams, renderers):
+                    renderer.set_lut(lut)
+                    label(stream, renderer)
+                redraw = True
             elif k == ord('s'):
                 out = f"frame_{int(time.time())}.png"
-                cv2.imwrite(out, show)
+                cv2.imwrite(out, mosaic)
                 print(f"Saved {out}")
 
-        # Periodic stats
-        if now >= next_report:
-            filled = int(lines_received.sum())
-            print(f"{time.strftime('%H:%M:%S')} lines_in_frame={filled}/{IMAGE_HEIGHT} fps~={last_fps:.2f} "
-                  f"pkts={DEBUG_COUNTERS['pkts']} BE={DEBUG_COUNTERS['idx_from_BE']} LE={DEBUG_COUNTERS['idx_from_LE']} "
-                  f"AMB={DEBUG_COUNTERS['idx_ambiguous']} INV={DEBUG_COUNTERS['idx_invalid']}")
-            next_report = now + 1.0
-
-    sock.close()
-    cv2.destroyAllWindows()
+            # Periodic stats
+            now = time.time()
+            if now >= next_report:
+                for stream, exchange in zip(streams, exchanges):
+                    print_stats(stream, f" dropped_display={exchange.dropped}")
+                print_analytics(analytics)
+                print_debug_counters()
+                next_report = now + 1.0
+    finally:
+        receiver.stop()
+        receiver.join()
+        for stream in streams:
+            stream.close()
+        close_analytics(analytics)
+        cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Display (or record) the FPGA's 1bpp UDP image stream(s).")
+    parser.add_argument("--listen", nargs="+", metavar="[HOST:]PORT",
+                        help=f"one or more UDP endpoints, one per board, shown as a mosaic "
+                             f"(default: {LISTEN_IP}:{LISTEN_PORT})")
+    parser.add_argument("--record", metavar="PATH",
+                        help="headless: append packed frames to a memory-mapped archive instead of displaying")
+    parser.add_argument("--max-frames", type=int, default=RECORD_MAX_FRAMES,
+                        help="archive capacity in frames, preallocated up front (default: %(default)s)")
+    parser.add_argument("--compress", action="store_true",
+                        help="with --record: write a compressed edge archive (see edge_codec.py)")
+    parser.add_argument("--bus", metavar="NAME",
+                        help="headless: publish frames to a shared-memory frame bus (read with frame_bus.py NAME)")
+    parser.add_argument("--bus-slots", type=int, default=BUS_SLOTS,
+                        help="frames kept on the bus for slow readers (default: %(default)s)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help=f"serve Prometheus-style metrics on http://{METRICS_HOST}:PORT/metrics")
+    parser.add_argument("--analytics", action="store_true",
+                        help="compute per-frame edge statistics in a worker pool (see edge_analytics.py)")
+    parser.add_argument("--analytics-out", metavar="PATH",
+                        help="with --analytics: append every result to PATH as one JSON line")
+    parser.add_argument("--analytics-workers", type=int, default=ANALYTICS_WORKERS,
+                        help="analytics worker threads per stream (default: %(default)s)")
+    parser.add_argument("--pcap", metavar="FILE",
+                        help="read a pcap / pcapng capture instead of the network; --listen ports select "
+                             "the UDP destination ports to replay (see pcap_source.py)")
+    parser.add_argument("--replay-speed", type=float, default=REPLAY_SPEED,
+                        help="with --pcap: replay at the capture timestamps this many times faster, "
+                             "0 = as fast as possible (default: %(default)s)")
+    args = parser.parse_args()
+    endpoints = [parse_endpoint(spec) for spec in args.listen] if args.listen else None
+    capture = (args.pcap, args.replay_speed or None) if args.pcap else None
+    analytics = start_analytics(args.analytics or bool(args.analytics_out),
+                                endpoints or [(LISTEN_IP, LISTEN_PORT)], args.analytics_out, args.analytics_workers)
     try:
-        main()
+        if args.bus:
+            publish(args.bus, args.bus_slots, endpoints, args.metrics_port, analytics, capture)
+        elif args.record:
+            record(args.record, args.max_frames, endpoints, args.metrics_port, args.compress, analytics, capture)
+        else:
+            main(endpoints, args.metrics_port, analytics, capture)
     except KeyboardInterrupt:
         pass
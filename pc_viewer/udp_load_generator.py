@@ -0,0 +1,265 @@
+"""UDP load generator emulating the FPGA line stream, for stress-testing the viewer without a board.
+
+Each datagram has the exact layout produced by image_eth_formatter.v + udp_send.v:
+a 2-byte line number, low byte first, followed by 160 bytes holding 1280 pixels,
+MSB first (1 = white/no edge, 0 = edge, as output by sobel.v). With --protocol 2
+each datagram carries --lines-per-packet lines behind the v2 header (see
+fpga_stream.py), with a frame counter that advances with every frame sent.
+
+Sources:
+    --png FILE       any image, thresholded at 128 (resized to 1280x720 if needed)
+    --golden FILE    sobel_golden.txt-style hex dump (one 00/01 per line), tiled over the frame
+    (default)        random frames
+
+Examples:
+    # stream to a running udp_binary_viewer.py at 30 fps, with 0.1% loss
+    python udp_load_generator.py --png ..\\sim\\image_process\\test.jpg --fps 30 --loss 0.001
+
+    # find the viewer's ceiling on this machine: in-process receiver, several rates
+    python udp_load_generator.py --self-test --rate 21600 43200 86400 172800 --duration 5
+
+    # the same with 9 lines per datagram (protocol v2)
+    python udp_load_generator.py --self-test --protocol 2 --rate 21600 86400 172800 --duration 5
+
+    # check the viewer's metrics counters against what was sent, for both protocols
+    python udp_load_generator.py --self-test --metrics --protocol 1 --duration 2
+    python udp_load_generator.py --self-test --metrics --protocol 2 --duration 2
+"""
+import argparse
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import udp_binary_viewer as viewer
+from fpga_stream import PROTOCOL_V2, V2_HEADER_LEN, V2_LINES_PER_PACKET
+from viewer_metrics import MetricsRegistry, ViewerMetrics
+
+W, H = viewer.IMAGE_WIDTH, viewer.IMAGE_HEIGHT
+
+
+def frames_from_png(path: str) -> np.ndarray:
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(path)
+    if img.shape != (H, W):
+        img = cv2.resize(img, (W, H), interpolation=cv2.INTER_AREA)
+    return (img >= 128).astype(np.uint8)[None]
+
+
+def frames_from_golden(path: str, width: int, height: int) -> np.ndarray:
+    with open(path) as f:
+        pixels = np.array([int(line, 16) for line in f if line.strip()], dtype=np.uint8)
+    tile = pixels.reshape(height, width)
+    reps = (-(-H // height), -(-W // width))
+    return np.tile(tile, reps)[:H, :W][None]
+
+
+def random_frames(count: int, edge_density: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.random((count, H, W)) >= edge_density).astype(np.uint8)
+
+
+def build_datagrams(bits: np.ndarray, msb_first: bool = True) -> np.ndarray:
+    """(F, H, W) bits -> (F, H, 162) datagrams, 2-byte little-endian line number first."""
+    frames = bits.shape[0]
+    out = np.empty((frames, H, viewer.PAYLOAD_LEN), dtype=np.uint8)
+    line = np.arange(H, dtype="<u2")
+    out[:, :, :viewer.LINE_HEADER_LEN] = line.view(np.uint8).reshape(H, 2)
+    out[:, :, viewer.LINE_HEADER_LEN:] = np.packbits(bits, axis=2, bitorder="big" if msb_first else "little")
+    return out
+
+
+def build_v2_datagrams(bits: np.ndarray, lines_per_packet: int = V2_LINES_PER_PACKET,
+                       msb_first: bool = True) -> np.ndarray:
+    """(F, H, W) bits -> (F, H / K, 6 + K * 160) protocol v2 datagrams; the frame counter is left at 0."""
+    if H % lines_per_packet:
+        raise ValueError(f"lines per packet must divide the image height {H}, got {lines_per_packet}")
+    frames, packets = bits.shape[0], H // lines_per_packet
+    out = np.zeros((frames, packets, V2_HEADER_LEN + lines_per_packet * viewer.BYTES_PER_LINE), dtype=np.uint8)
+    out[:, :, 0] = PROTOCOL_V2
+    out[:, :, 1] = lines_per_packet
+    first = np.arange(0, H, lines_per_packet, dtype="<u2")
+    out[:, :, 4:6] = first.view(np.uint8).reshape(packets, 2)
+    packed = np.packbits(bits, axis=2, bitorder="big" if msb_first else "little")
+    out[:, :, V2_HEADER_LEN:] = packed.reshape(frames, packets, -1)
+    return out
+
+
+def line_schedule(rng: np.random.Generator, loss: float, duplicate: float,
+                  reorder: float, reorder_distance: int, count: int = H) -> np.ndarray:
+    """Order in which one frame's `count` datagrams are sent, with loss/duplication/reordering applied."""
+    order = np.arange(count)
+    if reorder > 0:
+        # Move the selected datagrams back by up to reorder_distance positions
+        keys = order.astype(np.float64)
+        moved = rng.random(count) < reorder
+        keys[moved] += rng.integers(1, reorder_distance + 1, size=int(moved.sum())) + 0.5
+        order = order[np.argsort(keys, kind="stable")]
+    if duplicate > 0:
+        order = np.repeat(order, np.where(rng.random(order.size) < duplicate, 2, 1))
+    if loss > 0:
+        order = order[rng.random(order.size) >= loss]
+    return order
+
+
+class SelfTestReceiver:
+    """The viewer's receive path (FrameReceiver + BoardStream), headless, on a loopback port.
+
+    With `metrics` the stream also updates a ViewerMetrics set, as with the viewer's --metrics-port.
+    """
+
+    def __init__(self, metrics: bool = False):
+        viewer.LISTEN_IP = "127.0.0.1"
+        viewer.LISTEN_PORT = 0
+        viewer.DEBUG_PRINT_FIRST_N = 0
+        self.sock = viewer.init_socket()
+        self.port = self.sock.getsockname()[1]
+        self.lines = 0
+        self._lock = threading.Lock()
+        self.metrics = ViewerMetrics(MetricsRegistry()) if metrics else None
+        self.stream = viewer.BoardStream(self.sock, self._on_frame, packed=True, metrics=self.metrics)
+        self.receiver = viewer.FrameReceiver([self.stream])
+        self.receiver.start()
+
+    def _on_frame(self, frame) -> None:
+        with self._lock:
+            self.lines += viewer.IMAGE_HEIGHT - frame.missing
+
+    def snapshot(self) -> tuple[int, int]:
+        with self._lock:
+            return self.stream.assembler.frames_emitted, self.lines
+
+    def close(self) -> None:
+        self.receiver.stop()
+        self.receiver.join()
+        self.sock.close()
+
+
+def run(sock: socket.socket, dst: tuple[str, int], datagrams: np.ndarray, rate: float,
+        duration: float, args: argparse.Namespace, probe: SelfTestReceiver | None, counter: int = 0) -> int:
+    """Send frames at `rate` lines/s for `duration` s; return the next v2 frame counter."""
+    rng = np.random.default_rng(args.seed)
+    burst = max(1, args.burst)
+    rows = [[memoryview(line) for line in frame] for frame in datagrams]
+    packets = datagrams.shape[1]
+    per = H // packets  # lines per datagram
+    sendto = sock.sendto
+
+    before = probe.snapshot() if probe else (0, 0)
+    if probe and probe.metrics:
+        before_packets = (probe.metrics.packets.value, probe.metrics.invalid.value)
+    sent_frames = sent_lines = sent_packets = unique_lines = 0
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    while time.perf_counter() < deadline:
+        frame = rows[sent_frames % len(rows)]
+        if args.protocol == 2:
+            datagrams[sent_frames % len(rows), :, 2] = counter & 0xFF  # frame counter, LE
+            datagrams[sent_frames % len(rows), :, 3] = (counter >> 8) & 0xFF
+            counter = (counter + 1) & 0xFFFF
+        order = line_schedule(rng, args.loss, args.duplicate, args.reorder, args.reorder_distance, packets)
+        for start in range(0, order.size, burst):
+            for i in order[start:start + burst].tolist():
+                sendto(frame[i], dst)
+            sent_packets += min(burst, order.size - start)
+            sent_lines += min(burst, order.size - start) * per
+            if rate > 0:
+                # Pace the bursts so the average line rate matches `rate`
+                delay = t0 + sent_lines / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        unique_lines += np.unique(order).size * per
+        sent_frames += 1
+    elapsed = time.perf_counter() - t0
+
+    print(f"sent   rate={rate or float('inf'):>10,.0f}/s target  {sent_lines / elapsed:12,.0f} lines/s  "
+          f"{sent_frames / elapsed:7.2f} frames/s  ({sent_frames} frames, "
+          f"{sent_frames * H - unique_lines} lines dropped on purpose)")
+    if probe:
+        time.sleep(2 * viewer.FRAME_TIMEOUT)  # let the last frame time out
+        frames, lines = probe.snapshot()
+        frames, lines = frames - before[0], lines - before[1]
+        lost = unique_lines - lines
+        print(f"viewer                     {lines / elapsed:12,.0f} lines/s  {frames / elapsed:7.2f} frames/s  "
+              f"lines lost={max(lost, 0)} ({max(lost, 0) / max(unique_lines, 1):.3%})")
+        if probe.metrics:
+            packets = probe.metrics.packets.value - before_packets[0]
+            invalid = probe.metrics.invalid.value - before_packets[1]
+            ok = invalid == 0 and packets <= sent_packets
+            print(f"metrics    packets={packets} of {sent_packets} sent  invalid={invalid}  "
+                  + ("Test ****P A S S E D****" if ok else "Test ****F A I L E D****"))
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--png", metavar="FILE", help="image to send (thresholded at 128)")
+    source.add_argument("--golden", metavar="FILE", help="sobel_golden.txt-style hex dump to tile over the frame")
+    parser.add_argument("--golden-size", default="200x200", help="WIDTHxHEIGHT of --golden (default: %(default)s)")
+    parser.add_argument("--random-frames", type=int, default=4, help="distinct random frames to cycle through")
+    parser.add_argument("--edge-density", type=float, default=0.05, help="fraction of edge pixels in random frames")
+    parser.add_argument("--lsb-first", action="store_true", help="pack pixels LSB first within each byte")
+    parser.add_argument("--protocol", type=int, choices=(1, 2), default=1,
+                        help="1: one line per datagram; 2: --lines-per-packet lines per datagram with a frame counter")
+    parser.add_argument("--lines-per-packet", type=int, default=V2_LINES_PER_PACKET,
+                        help="lines per datagram with --protocol 2 (default: %(default)s)")
+
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=viewer.LISTEN_PORT)
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument("--rate", type=float, nargs="+", default=[H * 30],
+                      help="target line rate(s) in lines/s, 0 = as fast as possible (default: 30 fps)")
+    rate.add_argument("--fps", type=float, nargs="+", help="target frame rate(s) instead of --rate")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--burst", type=int, default=32, help="datagrams sent back to back between pacing sleeps")
+
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of dropping a datagram")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="probability of sending a datagram twice")
+    parser.add_argument("--reorder", type=float, default=0.0, help="probability of delaying a datagram")
+    parser.add_argument("--reorder-distance", type=int, default=3,
+                        help="max positions a delayed datagram moves back")
+    parser.add_argument("--seed", type=int, default=0)
+
+    parser.add_argument("--self-test", action="store_true",
+                        help="run the viewer's receive path in-process on loopback and report what it achieved")
+    parser.add_argument("--metrics", action="store_true",
+                        help="with --self-test: enable the viewer's metrics and check the packet counters")
+    args = parser.parse_args()
+
+    if args.png:
+        bits = frames_from_png(args.png)
+    elif args.golden:
+        width, height = (int(v) for v in args.golden_size.lower().split("x"))
+        bits = frames_from_golden(args.golden, width, height)
+    else:
+        bits = random_frames(args.random_frames, args.edge_density, args.seed)
+    if args.protocol == 2:
+        datagrams = build_v2_datagrams(bits, args.lines_per_packet, msb_first=not args.lsb_first)
+    else:
+        datagrams = build_datagrams(bits, msb_first=not args.lsb_first)
+    rates = [fps * H for fps in args.fps] if args.fps else args.rate
+
+    probe = SelfTestReceiver(args.metrics) if args.self_test else None
+    dst = ("127.0.0.1", probe.port) if probe else (args.host, args.port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, viewer.SOCKET_RCVBUF)
+    print(f"Sending {datagrams.shape[0]} distinct frame(s) of {datagrams.shape[1]} x {datagrams.shape[2]}-byte "
+          f"datagrams to {dst[0]}:{dst[1]}")
+    try:
+        counter = 0
+        for r in rates:
+            counter = run(sock, dst, datagrams, r, args.duration, args, probe, counter)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        if probe:
+            probe.close()
+
+
+if __name__ == "__main__":
+    main()
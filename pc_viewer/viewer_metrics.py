@@ -0,0 +1,178 @@
+"""Prometheus-style metrics for the viewer's receive path, served over local HTTP.
+
+    python udp_binary_viewer.py --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+
+Counters tell network loss apart from viewer CPU saturation:
+  - kernel drops (SO_RXQ_OVFL) rising   -> the viewer does not drain the socket fast enough
+  - missing lines rising, kernel drops flat -> lines are lost before they reach this host
+The batch-time histogram shows how close the receive thread is to its budget.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    def __init__(self, labels: dict):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.value += amount
+
+    def set_total(self, value: int | float) -> None:
+        """For counters maintained elsewhere (e.g. by the kernel)."""
+        self.value = value
+
+    def samples(self, name: str):
+        yield name + "_total", self.labels, self.value
+
+
+class Histogram:
+    """Fixed-bucket histogram, updated from whole arrays of observations."""
+
+    def __init__(self, labels: dict, buckets):
+        self.labels = labels
+        self.bounds = np.asarray(buckets, dtype=np.float64)
+        self.counts = np.zeros(self.bounds.size + 1, dtype=np.int64)  # last bin is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[np.searchsorted(self.bounds, value)] += 1
+            self.sum += value
+
+    def observe_many(self, values: np.ndarray) -> None:
+        if values.size == 0:
+            return
+        bins = np.bincount(np.searchsorted(self.bounds, values), minlength=self.counts.size)
+        with self._lock:
+            self.counts += bins
+            self.sum += float(values.sum())
+
+    def samples(self, name: str):
+        with self._lock:
+            cumulative = np.cumsum(self.counts)
+            total = self.sum
+        for le, count in zip([*(f"{b:g}" for b in self.bounds), "+Inf"], cumulative.tolist()):
+            yield name + "_bucket", {**self.labels, "le": le}, count
+        yield name + "_sum", self.labels, total
+        yield name + "_count", self.labels, int(cumulative[-1])
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: dict[str, tuple[str, str, list]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, kind: str, name: str, help_text: str, metric):
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, []))
+            family[2].append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: dict | None = None) -> Counter:
+        return self._add("counter", name, help_text, Counter(labels or {}))
+
+    def histogram(self, name: str, help_text: str, buckets, labels: dict | None = None) -> Histogram:
+        return self._add("histogram", name, help_text, Histogram(labels or {}, buckets))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = list(self._families.items())
+        for name, (kind, help_text, metrics) in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                for sample, labels, value in metric.samples(name):
+                    lines.append(f"{sample}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Bucket bounds in seconds / lines
+GAP_BUCKETS = (1e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2, 0.1, 1.0)
+BATCH_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 5e-2)
+MISSING_BUCKETS = (0, 1, 2, 5, 10, 50, 100, 360, 719)
+
+
+class ViewerMetrics:
+    """The viewer's metric set for one stream; all updates are per batch or per frame."""
+
+    def __init__(self, registry: MetricsRegistry, labels: dict | None = None):
+        r, l = registry, labels or {}
+        self.packets = r.counter("fpga_viewer_packets", "UDP datagrams received", l)
+        self.bytes = r.counter("fpga_viewer_bytes", "UDP payload bytes received", l)
+        self.invalid = r.counter("fpga_viewer_invalid_packets",
+                                 "Datagrams dropped for a short length or an invalid line header", l)
+        self.kernel_drops = r.counter("fpga_viewer_kernel_drops",
+                                      "Datagrams dropped by the kernel because the socket buffer was full "
+                                      "(SO_RXQ_OVFL, Linux only)", l)
+        self.frames = r.counter("fpga_viewer_frames", "Frames emitted by the assembler", l)
+        self.frames_incomplete = r.counter("fpga_viewer_frames_incomplete", "Frames emitted with missing lines", l)
+        self.missing_lines = r.counter("fpga_viewer_missing_lines", "Lines missing from emitted frames", l)
+        self.late_lines = r.counter("fpga_viewer_late_lines", "Lines that arrived after their frame was emitted", l)
+        self.frame_missing = r.histogram("fpga_viewer_frame_missing_lines", "Missing lines per emitted frame",
+                                         MISSING_BUCKETS, l)
+        self.packet_gap = r.histogram("fpga_viewer_packet_gap_seconds",
+                                      "Gap between consecutive datagrams (kernel timestamps where available)",
+                                      GAP_BUCKETS, l)
+        self.batch_seconds = r.histogram("fpga_viewer_batch_seconds",
+                                         "Time to decode and assemble one receive batch", BATCH_BUCKETS, l)
+        self._last_stamp = None
+
+    def observe_batch(self, count: int, lengths: np.ndarray, stamps: np.ndarray | None,
+                      accepted: int, seconds: float, kernel_drops: int | None) -> None:
+        """One receive batch of `count` datagrams, `accepted` of them decoded (a v2 datagram holds several lines)."""
+        self.packets.inc(count)
+        self.bytes.inc(int(lengths[:count].sum()))
+        self.invalid.inc(count - accepted)
+        self.batch_seconds.observe(seconds)
+        if kernel_drops is not None:
+            self.kernel_drops.set_total(kernel_drops)
+        if stamps is not None and count:
+            stamps = stamps[:count]
+            if self._last_stamp is not None:
+                self.packet_gap.observe(float(stamps[0]) - self._last_stamp)
+            self.packet_gap.observe_many(np.diff(stamps))
+            self._last_stamp = float(stamps[-1])
+
+    def observe_frame(self, missing: int, late_lines: int) -> None:
+        self.frames.inc()
+        if missing:
+            self.frames_incomplete.inc()
+            self.missing_lines.inc(missing)
+        self.late_lines.set_total(late_lines)
+        self.frame_missing.observe(missing)
+
+
+def serve_metrics(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve registry.render() at http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
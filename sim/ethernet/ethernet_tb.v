@@ -15,8 +15,11 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 去掉ethernet.v中并不存在的fifo_read_usage端口；定义DUMP_VCD时导出波形，供link_model.py比对
+// [2026/10/18] Revision 0.03 - 激励改为在时钟下降沿更新，被测模块在下一个上升沿采样，避免与被测模块在同一上升沿采样时产生竞争，Verilator等仿真器下的结果与Vivado一致
 // Additional Comments:
-// 
+// 1. 以DUMP_VCD宏编译时生成ethernet_tb.vcd，可用python link_model.py --preset ethernet_tb --vcd ethernet_tb.vcd
+//    将FIFO写入时刻、以太网帧发送时刻及FIFO峰值占用与模型比对
 //////////////////////////////////////////////////////////////////////////////////
 
 
@@ -71,10 +74,16 @@ module ethernet_tb(
         .phy_config_done        (phy_config_done),
         .phy_read_data          (phy_read_data),
         .mdc                    (mdc),
-        .mdio                   (mdio),
-        .fifo_read_usage        (fifo_read_usage)
+        .mdio                   (mdio)
     );
 
+    `ifdef DUMP_VCD
+    initial begin
+        $dumpfile("ethernet_tb.vcd");
+        $dumpvars(0, ethernet_tb);
+    end
+    `endif
+
     //* Step 2: 时钟生成
     initial begin
         clk_100mhz = 1'b0;
@@ -105,18 +114,18 @@ module ethernet_tb(
         vsync <= 1'b0;
         sobel <= 1'b0;
         // @ (posedge phy_config_done);        // 等待PHY配置完成（只需要在初次运行时配置PHY即可，配置较慢，因此在后续的TESTBENCH中可以省略）
-        repeat (100) @(posedge clk_100mhz);  // 等待100个时钟周期，保证FIFO初始化完毕
+        repeat (100) @(negedge clk_100mhz);  // 等待100个时钟周期，保证FIFO初始化完毕
 
         repeat (2) begin                    // 发送2帧数据，每帧3行，每行1280像素，每行需发送162Bytes
             //* 第一行
-            repeat (280) @(posedge clk_100mhz) begin
+            repeat (280) @(negedge clk_100mhz) begin
                 sobel <= 1'b1;      // 反复发送280个像素的1'b1作为起始标志
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
                 vsync <= 1'b1;
             end
 
-            repeat (1000) @(posedge clk_100mhz) begin
+            repeat (1000) @(negedge clk_100mhz) begin
                 sobel <= ~sobel;    // 反复发送1000个像素的010101
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
@@ -124,17 +133,17 @@ module ethernet_tb(
             end
 
             hsync <= 1'b0;          // 第一行像素发送完毕
-            repeat (10) @(posedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
+            repeat (10) @(negedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
             
             //* 第二行
-            repeat (280) @(posedge clk_100mhz) begin
+            repeat (280) @(negedge clk_100mhz) begin
                 sobel <= 1'b0;      // 反复发送280个像素的1'b0作为起始标志
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
                 vsync <= 1'b1;
             end
 
-            repeat (1000) @(posedge clk_100mhz) begin
+            repeat (1000) @(negedge clk_100mhz) begin
                 sobel <= ~sobel;    // 反复发送1000个像素的101010
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
@@ -142,17 +151,17 @@ module ethernet_tb(
             end
 
             hsync <= 1'b0;          // 第二行像素发送完毕
-            repeat (10) @(posedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
+            repeat (10) @(negedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
         
             //* 第三行
-            repeat (280) @(posedge clk_100mhz) begin
+            repeat (280) @(negedge clk_100mhz) begin
                 sobel <= 1'b0;      // 反复发送280个像素的1'b0作为起始标志
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
                 vsync <= 1'b1;
             end
 
-            repeat (1000) @(posedge clk_100mhz) begin
+            repeat (1000) @(negedge clk_100mhz) begin
                 sobel <= ~sobel;    // 反复发送1000个像素的101010
                 valid <= 1'b1;
                 hsync <= 1'b1;      // 当前行同步信号有效
@@ -162,10 +171,10 @@ module ethernet_tb(
             hsync <= 1'b0;          // 第三行像素发送完毕
             vsync <= 1'b0;          // 该帧像素发送完毕
             valid <= 1'b0;          // 清除数据有效标志
-            repeat (10) @(posedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
+            repeat (10) @(negedge clk_100mhz);        // 等待10个时钟周期（至少需要等待3个时钟周期）
         end
 
-        repeat (50) @(posedge clk_100mhz);  // 等待50个时钟周期，便于观察结果
+        repeat (50) @(negedge clk_100mhz);  // 等待50个时钟周期，便于观察结果
         $finish;                            // 结束仿真
     end
 
@@ -0,0 +1,86 @@
+# Dependencies
+import argparse
+import os
+
+import numpy as np
+
+# Hyperparameter
+PROTOCOL_V2 = 2
+V2_HEADER_LEN = 6        # [version][K][frame counter LE][first line LE]
+LINES_PER_PACKET = 9     # K used by ethernet.v for 1280x720 (1446-byte datagrams)
+
+# image_eth_formatter_tb.v: two frames of three 16-pixel lines
+TB_WIDTH = 16
+TB_LINES_PER_PACKET = 3
+
+
+def tb_stimulus():
+    """The sobel bits driven by image_eth_formatter_tb.v, shape (frames, lines, width)."""
+    line0 = [1] * 8 + [0, 1] * 4    # 8 x 1, then toggling starting from ~1
+    line1 = [1] * 16
+    line2 = [0] * 16
+    frame = np.array([line0, line1, line2], dtype=np.uint8)
+    return np.stack([frame, frame])
+
+
+def format_stream(frames, version=1, lines_per_packet=LINES_PER_PACKET):
+    """
+    Byte stream written into the FIFO by image_eth_formatter.v.
+
+    v1 writes [line number LE][pixels] for every line. v2 writes the 6-byte
+    header only before every lines_per_packet-th line of a frame, the frame
+    counter counting frames since reset.
+
+    Args:
+        frames (np.ndarray): (frames, height, width) bits, 1 = no edge.
+        version (int): PROTOCOL_VERSION of the formatter.
+        lines_per_packet (int): LINES_PER_PACKET of the formatter (v2 only).
+    """
+    n_frames, height, width = frames.shape
+    pixels = np.packbits(frames, axis=2)            # MSB first, as shifted in by the formatter
+    out = []
+    for frame_count in range(n_frames):
+        for line in range(height):
+            if version == PROTOCOL_V2:
+                if line % lines_per_packet == 0:
+                    out += [PROTOCOL_V2, lines_per_packet,
+                            frame_count & 0xFF, (frame_count >> 8) & 0xFF,
+                            line & 0xFF, (line >> 8) & 0xFF]
+            else:
+                out += [line & 0xFF, (line >> 8) & 0xFF]
+            out += pixels[frame_count, line].tolist()
+    return np.array(out, dtype=np.uint8)
+
+
+def split_datagrams(stream, data_length):
+    """Cut the FIFO byte stream into UDP payloads of data_length bytes, as udp_send.v does."""
+    usable = stream.size // data_length * data_length
+    return stream[:usable].reshape(-1, data_length)
+
+
+def write_golden(stream, output_file):
+    with open(output_file, 'w') as f:
+        for byte in stream.tolist():
+            f.write(f"{byte:02X}\n")
+    print(f"Successfully write {stream.size} bytes to {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden FIFO byte streams for image_eth_formatter_tb.v (protocol v1 and v2).")
+    parser.add_argument("--out-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="where to write image_eth_formatter_v1_golden.txt / _v2_golden.txt")
+    args = parser.parse_args()
+
+    frames = tb_stimulus()
+    v1 = format_stream(frames, version=1)
+    v2 = format_stream(frames, version=PROTOCOL_V2, lines_per_packet=TB_LINES_PER_PACKET)
+    write_golden(v1, os.path.join(args.out_dir, "image_eth_formatter_v1_golden.txt"))
+    write_golden(v2, os.path.join(args.out_dir, "image_eth_formatter_v2_golden.txt"))
+
+    # Datagram view, as udp_send.v would cut the stream with the matching DATA_LENGTH
+    print("v1 datagrams:\n", split_datagrams(v1, TB_WIDTH // 8 + 2))
+    print("v2 datagrams:\n", split_datagrams(v2, V2_HEADER_LEN + TB_LINES_PER_PACKET * TB_WIDTH // 8))
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,16 @@
 // Revision:
 // [2025/7/29] Revision 0.01 - File Created
 // [2025/7/30] Revision 0.02 - 修改了testbench逻辑使之与修改后的主模块契合
+// [2026/10/17] Revision 0.03 - 同时例化协议v1、v2（每3行一帧）两个模块，按image_eth_formatter_golden.py生成的理论输出自动比对
+// [2026/10/18] Revision 0.04 - v1、v2分两轮激励，v1仍按原有的3拍行间隔验证，v2按7拍
 // Additional Comments:
 // 1. 认为行场同步信号、数据有效信号均在发送最后一个像素时有效，而非发送完最后一个像素后才有效
 // 2. 该testbench模拟了两帧数据，每帧3行，每行16像素，即每行发送16/8 + 2 = 4 Bytes
-// 3. 每行像素数据发送完毕后，至少等待3拍时钟周期，才能开始下一行的输入
+// 3. 每行像素数据发送完毕后，至少等待3拍时钟周期（协议v2为7拍），才能开始下一行的输入
+//    因此激励分两轮发送：第一轮行间隔3拍，仅v1模块解除复位；第二轮行间隔7拍，仅v2模块解除复位
 // 4. 注意testbench中时钟信号、异步控制信号应当采用阻塞赋值，同步数据信号采用非阻塞赋值
+// 5. 理论输出（写入FIFO的字节流）由image_eth_formatter_golden.py生成：
+//    image_eth_formatter_v1_golden.txt，image_eth_formatter_v2_golden.txt
 //////////////////////////////////////////////////////////////////////////////////
 
 
@@ -30,7 +35,8 @@ module image_eth_formatter_tb(
 
     //* Step 1: Module Instantiation
     reg clk_pixel;
-    reg rst_n;
+    reg rst_n;                  // v1模块复位
+    reg rst_n_v2;               // v2模块复位
     reg valid;
     reg hsync;
     reg vsync;
@@ -39,6 +45,9 @@ module image_eth_formatter_tb(
     wire fifo_aclr;
     wire [7:0] write_data;
     wire write_req;
+    wire fifo_aclr_v2;
+    wire [7:0] write_data_v2;
+    wire write_req_v2;
 
     image_eth_formatter image_eth_formatter_inst (
         // inputs
@@ -54,6 +63,59 @@ module image_eth_formatter_tb(
         .write_req      (write_req)
     );
 
+    image_eth_formatter #(
+        .PROTOCOL_VERSION   (2),
+        .LINES_PER_PACKET   (3)             // 每帧3行打包为一个以太网帧
+    ) image_eth_formatter_v2_inst (
+        // inputs
+        .clk_pixel      (clk_pixel),
+        .rst_n          (rst_n_v2),
+        .valid          (valid),
+        .hsync          (hsync),
+        .vsync          (vsync),
+        .sobel          (sobel),
+        // outputs
+        .fifo_aclr      (fifo_aclr_v2),
+        .write_data     (write_data_v2),
+        .write_req      (write_req_v2)
+    );
+
+    //* Step 1.1: Golden Output
+    localparam GOLDEN_BYTES = 24;           // 两种协议下两帧数据均为24字节
+    localparam v1_golden_file = "image_eth_formatter_v1_golden.txt";
+    localparam v2_golden_file = "image_eth_formatter_v2_golden.txt";
+
+    reg [7:0] v1_golden [0:GOLDEN_BYTES-1];
+    reg [7:0] v2_golden [0:GOLDEN_BYTES-1];
+    integer v1_index = 0;
+    integer v2_index = 0;
+    integer error_count = 0;
+
+    initial begin
+        $readmemh(v1_golden_file, v1_golden);
+        $readmemh(v2_golden_file, v2_golden);
+    end
+
+    // 每次写入FIFO时与理论输出比对
+    always @(posedge clk_pixel) begin
+        if (write_req) begin
+            if (v1_index >= GOLDEN_BYTES || write_data !== v1_golden[v1_index]) begin
+                $display("@%0t: v1 error at byte %0d | Expected = %h | Real = %h",
+                         $realtime, v1_index, v1_golden[v1_index], write_data);
+                error_count = error_count + 1;
+            end
+            v1_index = v1_index + 1;
+        end
+        if (write_req_v2) begin
+            if (v2_index >= GOLDEN_BYTES || write_data_v2 !== v2_golden[v2_index]) begin
+                $display("@%0t: v2 error at byte %0d | Expected = %h | Real = %h",
+                         $realtime, v2_index, v2_golden[v2_index], write_data_v2);
+                error_count = error_count + 1;
+            end
+            v2_index = v2_index + 1;
+        end
+    end
+
     //* Step 2: Clock Generation
     // 使用阻塞赋值
     initial begin
@@ -62,15 +124,62 @@ module image_eth_formatter_tb(
     end
 
     //* Step 3: Asynchronous Reset
-    // 使用阻塞赋值
+    // 使用阻塞赋值；第一轮仅v1解除复位，第二轮仅v2解除复位（见Step 4）
     initial begin
         rst_n = 1'b0;      // 复位
+        rst_n_v2 = 1'b0;
         repeat (10) @(posedge clk_pixel); // 等待10个时钟周期
         rst_n = 1'b1;      // 解除复位
     end
 
     //* Step 4: Data Simulation
     // 使用非阻塞赋值
+    task send_frames(input integer gap);    // gap: 每行像素输入完毕后等待的时钟周期数
+        begin
+            repeat (2) begin            // 发送两帧数据，每帧3行，每行16像素，即每行发送16/8 + 2 = 4 Bytes
+                repeat (8) @(posedge clk_pixel) begin // 模拟第一行像素
+                    sobel <= 1'b1;      // 反复发送1
+                    valid <= 1'b1;
+                    hsync <= 1'b1;      // 当前行同步信号有效
+                    vsync <= 1'b1;
+                end
+
+                repeat (8) @(posedge clk_pixel) begin   // 模拟第一行像素
+                    sobel <= ~sobel;    // 反复发送010101
+                    valid <= 1'b1;
+                    hsync <= 1'b1;      // 当前行同步信号有效
+                    vsync <= 1'b1;
+                end
+
+                hsync <= 1'b0;          // 第一行像素发送完毕
+                                        //* 这里这些同步信号均在发送最后一个像素时有效，而非发送完最后一个像素后才有效，testbench的验证是基于此完成的
+                repeat (gap) @(posedge clk_pixel);      //! Alert: 在每一行像素输入完毕后，至少要等待3个时钟周期（协议v2为7个），才能开始下一行的输入
+
+                repeat (16) @(posedge clk_pixel) begin  // 模拟第二行像素
+                    sobel <= 1'b1;      // 反复发送1
+                    valid <= 1'b1;
+                    hsync <= 1'b1;      // 当前行同步信号有效
+                    vsync <= 1'b1;
+                end
+
+                hsync <= 1'b0;          // 第二行像素发送完毕
+                repeat (gap) @(posedge clk_pixel);
+
+                repeat (16) @(posedge clk_pixel) begin  // 模拟第三行像素
+                    sobel <= 1'b0;      // 反复发送0
+                    valid <= 1'b1;
+                    hsync <= 1'b1;      // 当前行同步信号有效
+                    vsync <= 1'b1;
+                end
+
+                hsync <= 1'b0;          // 第三行像素发送完毕
+                vsync <= 1'b0;          // 该帧像素发送完毕
+                valid <= 1'b0;
+                repeat (gap) @(posedge clk_pixel);
+            end
+        end
+    endtask
+
     initial begin
         valid <= 1'b0;
         hsync <= 1'b0;
@@ -79,50 +188,22 @@ module image_eth_formatter_tb(
         @ (posedge rst_n);          // 等待复位解除
         repeat (10) @(posedge clk_pixel); // 等待10个时钟周期
 
-        repeat (2) begin            // 发送两帧数据，每帧3行，每行16像素，即每行发送16/8 + 2 = 4 Bytes
-            repeat (8) @(posedge clk_pixel) begin // 模拟第一行像素
-                sobel <= 1'b1;      // 反复发送1
-                valid <= 1'b1;
-                hsync <= 1'b1;      // 当前行同步信号有效
-                vsync <= 1'b1;
-            end
-
-            repeat (8) @(posedge clk_pixel) begin   // 模拟第一行像素
-                sobel <= ~sobel;    // 反复发送010101
-                valid <= 1'b1;
-                hsync <= 1'b1;      // 当前行同步信号有效
-                vsync <= 1'b1;
-            end
-
-            hsync <= 1'b0;          // 第一行像素发送完毕
-                                    //* 这里这些同步信号均在发送最后一个像素时有效，而非发送完最后一个像素后才有效，testbench的验证是基于此完成的
-            repeat (3) @(posedge clk_pixel);        //! Alert: 在每一行像素输入完毕后，至少要等待3个时钟周期，才能开始下一行的输入
-
-            repeat (16) @(posedge clk_pixel) begin  // 模拟第二行像素
-                sobel <= 1'b1;      // 反复发送1
-                valid <= 1'b1;
-                hsync <= 1'b1;      // 当前行同步信号有效
-                vsync <= 1'b1;
-            end
-
-            hsync <= 1'b0;          // 第二行像素发送完毕
-            repeat (3) @(posedge clk_pixel);
-
-            repeat (16) @(posedge clk_pixel) begin  // 模拟第三行像素
-                sobel <= 1'b0;      // 反复发送0
-                valid <= 1'b1;
-                hsync <= 1'b1;      // 当前行同步信号有效
-                vsync <= 1'b1;
-            end
+        send_frames(3);             // 第一轮：协议v1，行间隔3拍
+        repeat (10) @(posedge clk_pixel);
 
-            hsync <= 1'b0;          // 第三行像素发送完毕
-            vsync <= 1'b0;          // 该帧像素发送完毕
-            valid <= 1'b0;
-            repeat (3) @(posedge clk_pixel);
-        end
+        rst_n = 1'b0;               // 第二轮：复位v1，解除v2复位
+        rst_n_v2 = 1'b1;
+        repeat (10) @(posedge clk_pixel);
+        send_frames(7);             // 协议v2，行间隔7拍
 
         repeat (10) @(posedge clk_pixel);
 
+        if (error_count == 0 && v1_index == GOLDEN_BYTES && v2_index == GOLDEN_BYTES)
+            $display("Test ****P A S S E D****: All outputs match the golden output!!! Cheers!!! GOOD JOB!");
+        else
+            $display("Test ****F A I L E D****: %0d errors found, %0d / %0d v1 bytes, %0d / %0d v2 bytes written.",
+                     error_count, v1_index, GOLDEN_BYTES, v2_index, GOLDEN_BYTES);
+
         $finish;
     end
 
@@ -0,0 +1,295 @@
+"""
+Reference encoder of the Ethernet transmit path: whole images to on-wire frames.
+
+The sobel bits of one or more frames are packed into the FIFO byte stream
+exactly as image_eth_formatter.v does (image_eth_formatter_golden.format_stream),
+cut into DATA_LENGTH-byte datagrams and wrapped the way udp_send.v sends them:
+
+    preamble 55 x 7, SFD D5
+    DMAC, SMAC, 0x0800
+    IPv4 header (IHL 5, TOS 0, ID 0, no fragment, TTL 0x40, UDP, checksum of ip_checksum.v)
+    UDP header (length DATA_LENGTH + 8, checksum 0)
+    DATA_LENGTH payload bytes [+ the extra byte, see below]
+    FCS (CRC32 of DMAC .. the last data byte, crc32_d8.v, least significant byte first)
+
+Everything is built in bulk: all datagrams of an image share one (N, bytes)
+array, the IP checksums of all headers are summed in one vectorized fold,
+and only the CRC32 is computed per frame (zlib, in C).
+
+udp_send.v stays in SEND_USER_DATA for DATA_LENGTH + 1 cycles, so one byte
+follows every payload on the wire and is covered by the FCS; receivers drop
+it as an Ethernet trailer since the IP length excludes it. `extra` selects
+what that byte is:
+
+    none    no extra byte (an RFC-clean frame, as a NIC would send it)
+    fill    the FIFO had run empty, dout shows `fill` (0 with Use_Dout_Reset)
+    slip    the next datagram's first byte was already in the FIFO: it is sent
+            here and popped, so every datagram starts one byte later
+
+Outputs are a GMII byte dump (one hex byte per line, preamble and FCS
+included, a blank line after each frame), the 0x.. list of
+udp_send_tb_golden.txt (DMAC .. payload) or a pcap file (linktype Ethernet,
+nanosecond timestamps, no preamble, FCS optional).
+
+    python udp_frame_encoder.py --check
+    python udp_frame_encoder.py --image ../image_process/test.jpg --width 1280 --height 720 \
+        --protocol 2 --pcap frame.pcap
+"""
+# Dependencies
+import argparse
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from image_eth_formatter_golden import LINES_PER_PACKET, PROTOCOL_V2, V2_HEADER_LEN, format_stream
+
+# Hyperparameter
+# ethernet.v defaults
+DES_MAC = bytes.fromhex("ffffffffffff")
+SRC_MAC = bytes.fromhex("000a3501fec0")
+DES_IP = bytes([192, 168, 0, 3])
+SRC_IP = bytes([192, 168, 0, 2])
+DES_UDP_PORT = 6102
+SRC_UDP_PORT = 5000
+
+# udp_send.v constants
+PREAMBLE = bytes([0x55] * 7 + [0xD5])
+ETH_TYPE_IPV4 = 0x0800
+IP_TTL = 0x40
+IP_PROTOCOL_UDP = 0x11
+HEADER_LEN = 14 + 20 + 8        # MAC + IP + UDP, the DMAC .. UDP checksum bytes
+IFG = 12                        # minimum inter-frame gap, only for the pcap timestamps
+BYTE_NS = 8                     # one byte per clk_125m cycle
+EXTRA_MODES = ("none", "fill", "slip")
+
+# udp_send_tb.v
+TB_DES_MAC = bytes.fromhex("c85b76dd0b38")
+TB_PAYLOAD = b"Hello, welcome to FPGA!"
+
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAP_LINKTYPE_ETHERNET = 1
+PCAP_SNAPLEN = 65535
+
+
+def data_length(width, version=1, lines_per_packet=LINES_PER_PACKET):
+    """DATA_LENGTH of ethernet.v for an image width and protocol version."""
+    if version == PROTOCOL_V2:
+        return V2_HEADER_LEN + lines_per_packet * width // 8
+    return width // 8 + 2
+
+
+def ip_checksums(total_lengths, src_ip=SRC_IP, des_ip=DES_IP):
+    """
+    Header checksums of ip_checksum.v for every datagram at once.
+
+    The ten 16-bit words of each header (checksum word 0) are summed in
+    32 bits, the carry folded back twice and the result inverted.
+
+    Args:
+        total_lengths (np.ndarray): IP total length of each datagram.
+    Returns:
+        np.ndarray: uint16 checksum of each datagram.
+    """
+    total_lengths = np.asarray(total_lengths, dtype=np.uint32)
+    fixed = (0x4500 + 0x0000 + 0x0000 + (IP_TTL << 8 | IP_PROTOCOL_UDP)
+             + int.from_bytes(src_ip[:2], "big") + int.from_bytes(src_ip[2:], "big")
+             + int.from_bytes(des_ip[:2], "big") + int.from_bytes(des_ip[2:], "big"))
+    total = total_lengths + np.uint32(fixed)
+    total = (total & 0xFFFF) + (total >> 16)
+    total = (total & 0xFFFF) + (total >> 16)
+    return (~total & 0xFFFF).astype(np.uint16)
+
+
+def headers(lengths, des_mac=DES_MAC, src_mac=SRC_MAC, des_ip=DES_IP, src_ip=SRC_IP,
+            des_port=DES_UDP_PORT, src_port=SRC_UDP_PORT):
+    """
+    MAC + IP + UDP headers of datagrams with the given payload lengths, shape (N, HEADER_LEN).
+    """
+    lengths = np.asarray(lengths, dtype=np.uint32)
+    template = np.frombuffer(
+        des_mac + src_mac + ETH_TYPE_IPV4.to_bytes(2, "big")
+        + bytes([0x45, 0x00, 0, 0, 0, 0, 0, 0, IP_TTL, IP_PROTOCOL_UDP, 0, 0]) + src_ip + des_ip
+        + src_port.to_bytes(2, "big") + des_port.to_bytes(2, "big") + bytes(4), dtype=np.uint8)
+    out = np.tile(template, (lengths.size, 1))
+    total = lengths + 28
+    checksum = ip_checksums(total, src_ip, des_ip)
+    udp = lengths + 8
+    for offset, field in ((16, total), (24, checksum), (38, udp)):
+        out[:, offset] = field >> 8
+        out[:, offset + 1] = field & 0xFF
+    return out
+
+
+def cut_datagrams(stream, length, extra="fill", fill=0):
+    """
+    Cut the FIFO byte stream into udp_send.v payloads and the extra byte sent after each.
+
+    Returns:
+        (payloads, extra_bytes): (N, length) uint8 and (N,) uint8, extra_bytes None for extra="none".
+    """
+    stream = np.asarray(stream, dtype=np.uint8)
+    if extra == "slip":
+        step = length + 1
+        usable = stream.size // step * step
+        block = stream[:usable].reshape(-1, step)
+        return block[:, :length], block[:, length]
+    usable = stream.size // length * length
+    payloads = stream[:usable].reshape(-1, length)
+    if extra == "none":
+        return payloads, None
+    return payloads, np.full(payloads.shape[0], fill, dtype=np.uint8)
+
+
+def encode(payloads, extra_bytes=None, **addresses):
+    """
+    Frames from DMAC to the FCS for every datagram, shape (N, frame bytes).
+
+    Args:
+        payloads (np.ndarray): (N, L) uint8 UDP payloads.
+        extra_bytes (np.ndarray): (N,) byte sent after each payload, or None.
+        **addresses: des_mac, src_mac, des_ip, src_ip, des_port, src_port of headers().
+    """
+    payloads = np.asarray(payloads, dtype=np.uint8)
+    n, length = payloads.shape
+    parts = [headers(np.full(n, length), **addresses), payloads]
+    if extra_bytes is not None:
+        parts.append(np.asarray(extra_bytes, dtype=np.uint8).reshape(n, 1))
+    body = np.concatenate(parts, axis=1)
+    crc = np.fromiter((zlib.crc32(row) for row in body), dtype=np.uint32, count=n)
+    fcs = crc.astype("<u4").view(np.uint8).reshape(n, 4)
+    return np.concatenate([body, fcs], axis=1)
+
+
+def encode_image(frames, version=1, lines_per_packet=LINES_PER_PACKET, extra="fill", fill=0, **addresses):
+    """
+    On-wire frames (without preamble) of the whole traffic of `frames`.
+
+    Args:
+        frames (np.ndarray): (frames, height, width) sobel bits, 1 = no edge.
+        version, lines_per_packet: PROTOCOL_VERSION and LINES_PER_PACKET of ethernet.v.
+        extra (str): one of EXTRA_MODES.
+    """
+    length = data_length(frames.shape[2], version, lines_per_packet)
+    stream = format_stream(frames, version, lines_per_packet)
+    payloads, extra_bytes = cut_datagrams(stream, length, extra, fill)
+    return encode(payloads, extra_bytes, **addresses)
+
+
+def write_gmii(frames, output_file):
+    """GMII byte dump: preamble .. FCS, one hex byte per line, a blank line after each frame."""
+    n = frames.shape[0]
+    wire = np.concatenate([np.tile(np.frombuffer(PREAMBLE, dtype=np.uint8), (n, 1)), frames], axis=1)
+    digits = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+    text = np.empty(wire.shape + (3,), dtype=np.uint8)
+    text[..., 0] = digits[wire >> 4]
+    text[..., 1] = digits[wire & 0xF]
+    text[..., 2] = ord("\n")
+    text = np.concatenate([text.reshape(n, -1), np.full((n, 1), ord("\n"), dtype=np.uint8)], axis=1)
+    with open(output_file, 'wb') as f:
+      f.write(text.tobytes())
+    print(f"Successfully write {n} frames to {output_file}")
+
+
+def format_byte_list(data):
+    """The udp_send_tb_golden.txt layout: "0x.., " 16 bytes per line."""
+    items = [f"0x{b:02x}, " for b in bytes(data)]
+    return "\n".join("".join(items[i:i + 16]) for i in range(0, len(items), 16)) + "\n"
+
+
+def write_pcap(frames, output_file, fcs=False, interval_ns=None, start_ns=0):
+    """
+    Frames as a nanosecond pcap (linktype Ethernet), without preamble and by default without FCS.
+
+    Timestamps are back to back at 1 Gb/s (preamble + frame + IFG) unless
+    interval_ns gives the spacing of the frames.
+    """
+    n, frame_len = frames.shape
+    data = frames if fcs else frames[:, :-4]
+    if interval_ns is None:
+        interval_ns = (len(PREAMBLE) + frame_len + IFG) * BYTE_NS
+    stamps = start_ns + np.arange(n, dtype=np.uint64) * np.uint64(round(interval_ns))
+    record = np.dtype([("sec", "<u4"), ("nsec", "<u4"), ("incl", "<u4"), ("orig", "<u4")])
+    heads = np.empty(n, dtype=record)
+    heads["sec"] = stamps // 1_000_000_000
+    heads["nsec"] = stamps % 1_000_000_000
+    heads["incl"] = heads["orig"] = data.shape[1]
+    body = np.concatenate([heads.view(np.uint8).reshape(n, 16), data], axis=1)
+    global_header = np.array([PCAP_MAGIC_NS, 2 | 4 << 16, 0, 0, PCAP_SNAPLEN, PCAP_LINKTYPE_ETHERNET], dtype="<u4")
+    with open(output_file, 'wb') as f:
+      f.write(global_header.tobytes())
+      f.write(body.tobytes())
+    print(f"Successfully write {n} frames to {output_file}")
+
+
+def check_tb_golden(golden_file):
+    """Encode the first udp_send_tb.v packet and compare it with udp_send_tb_golden.txt."""
+    payload = np.frombuffer(TB_PAYLOAD, dtype=np.uint8).reshape(1, -1)
+    frame = encode(payload, des_mac=TB_DES_MAC)[0]
+    with open(golden_file, 'r') as f:
+      golden = bytes(int(token, 16) for token in f.read().replace(",", " ").split())
+    got = frame[:len(golden)].tobytes()
+    mismatches = [i for i in range(len(golden)) if i >= len(got) or got[i] != golden[i]]
+    print(format_byte_list(got), end="")
+    print(f"FCS: {frame[-4:].tobytes().hex(' ')}")
+    print(f"{golden_file}: {len(golden)} bytes, mismatches={len(mismatches)}"
+          + (f", first at byte {mismatches[0]}" if mismatches else ""))
+    return not mismatches
+
+
+def load_frames(args):
+    """Sobel bits (frames, height, width) from --image (through the golden pipeline) or --sobel-in."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "image_process"))
+    from golden_io import read_hex
+    from golden_pipeline import image_blocks, pipeline
+
+    if args.image:
+        blocks = pipeline(image_blocks(args.image, (args.width, args.height)), args.width, args.threshold)
+        bits = np.concatenate([block.reshape(-1) for block in blocks])
+    else:
+        bits = read_hex(args.sobel_in)
+    return bits.reshape(-1, args.height, args.width)
+
+
+def main():
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Encode whole images into the Ethernet frames udp_send.v puts on the wire.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--check", action="store_true", help="reproduce udp_send_tb_golden.txt")
+    source.add_argument("--image", nargs="+", help="image file(s), run through the golden gray -> median -> Sobel pipeline")
+    source.add_argument("--sobel-in", help="sobel bits as a hex file (one bit per line), e.g. sobel_golden.txt")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--threshold", type=int, default=128)
+    parser.add_argument("--protocol", type=int, choices=(1, 2), default=1)
+    parser.add_argument("--lines-per-packet", type=int, default=LINES_PER_PACKET)
+    parser.add_argument("--extra", choices=EXTRA_MODES, default="fill", help="the byte udp_send.v sends after each payload")
+    parser.add_argument("--fill", type=lambda s: int(s, 0), default=0, help="extra byte value for --extra fill")
+    parser.add_argument("--des-mac", type=bytes.fromhex, default=DES_MAC, help="hex, e.g. c85b76dd0b38")
+    parser.add_argument("--gmii-out", help="write the GMII byte dump (one hex byte per line) here")
+    parser.add_argument("--pcap", help="write a pcap file here")
+    parser.add_argument("--pcap-fcs", action="store_true", help="keep the FCS in the pcap records")
+    parser.add_argument("--interval-ns", type=float, help="pcap frame spacing (default: back to back at 1 Gb/s)")
+    args = parser.parse_args()
+
+    if args.check:
+        ok = check_tb_golden(os.path.join(sim_dir, "udp_send_tb_golden.txt"))
+        print("Test ****P A S S E D****" if ok else "Test ****F A I L E D****")
+        raise SystemExit(0 if ok else 1)
+
+    bits = load_frames(args)
+    start = time.perf_counter()
+    frames = encode_image(bits, args.protocol, args.lines_per_packet, args.extra, args.fill, des_mac=args.des_mac)
+    elapsed = time.perf_counter() - start
+    print(f"{bits.shape[0]} frames of {args.width}x{args.height}: {frames.shape[0]} datagrams of "
+          f"{frames.shape[1]} bytes (DMAC .. FCS) in {elapsed * 1e3:.2f} ms")
+    if args.gmii_out:
+        write_gmii(frames, args.gmii_out)
+    if args.pcap:
+        write_pcap(frames, args.pcap, args.pcap_fcs, args.interval_ns)
+
+
+if __name__ == "__main__":
+    main()
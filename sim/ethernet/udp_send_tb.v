@@ -15,6 +15,8 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 去掉udp_send.v中并不存在的fifo_write_usage端口；定义DUMP_OUTPUT时将GMII发送字节写入udp_send_tb_output.txt，供run_testbenches.py与golden比对
+// [2026/10/18] Revision 0.03 - FIFO写请求改为由fifo_write_ctrl打一拍产生、写入数据改为非阻塞赋值，写入的字节序列不再依赖FIFO复位忙等待的拍数及仿真器调度顺序，首帧用户数据与golden一致
 // Additional Comments:
 // 发送23字节数据报“Hello, welcome to FPGA!”以进行验证
 // Golden output 由小兵以太网测试仪生成
@@ -47,7 +49,6 @@ module udp_send_tb(
     wire [7:0] gmii_txd;           // GMII发送数据
     wire       gmii_tx_en;         // GMII发送使能信号
     wire       tx_done;            // 发送完成信号
-    wire [11:0]fifo_write_usage;   // FIFO写入使用率
 
     assign des_mac = 48'hC8_5B_76_DD_0B_38;     // 目的MAC地址
     assign src_mac = 48'h00_0a_35_01_fe_c0;
@@ -76,8 +77,7 @@ module udp_send_tb(
         .gmii_tx_clk       (gmii_tx_clk),
         .gmii_txd          (gmii_txd),
         .gmii_tx_en        (gmii_tx_en),
-        .tx_done           (tx_done),
-        .fifo_write_usage  (fifo_write_usage)
+        .tx_done           (tx_done)
     );
 
     //* Step 2: 时钟生成
@@ -91,11 +91,26 @@ module udp_send_tb(
         forever #5 fifo_write_clk <= !fifo_write_clk; // 100 MHz clock for FIFO
     end
 
+    `ifdef DUMP_OUTPUT
+    // 每个字节一行（含前导码与CRC），每帧结束后空一行
+    integer dump_file;
+    reg     gmii_tx_en_d;
+    initial dump_file = $fopen("udp_send_tb_output.txt", "w");
+
+    always @(posedge gmii_tx_clk) begin
+        gmii_tx_en_d <= gmii_tx_en;
+        if (gmii_tx_en)
+            $fwrite(dump_file, "%h\n", gmii_txd);
+        else if (gmii_tx_en_d)
+            $fwrite(dump_file, "\n");
+    end
+    `endif
+
     //* Step 3: 激励生成
     reg [4:0] fifo_write_cnt; // FIFO写入计数器
     reg fifo_write_ctrl;      // FIFO写入控制信号
-                              // 该FIFO似乎会在fifo_write_request信号有效后的12拍才开始写入数据，
-                              // 因此要相应使得写入的数据延后12拍
+                              // 写请求由该信号打一拍产生，写入数据同样以非阻塞赋值更新，
+                              // 因此FIFO写入的字节序列与FIFO复位后的忙等待时长、仿真器的调度顺序均无关
 
     always @(posedge fifo_write_clk or posedge fifo_write_aclr) begin
         if (fifo_write_aclr) begin
@@ -103,7 +118,7 @@ module udp_send_tb(
             fifo_write_cnt <= 5'd0; // Reset the counter
         end 
         else begin
-            fifo_write_request <= 1'b1; // 请求写入FIFO
+            fifo_write_request <= fifo_write_ctrl; // 写入控制信号有效后请求写入FIFO
 
             if (fifo_write_ctrl)
                 if (fifo_write_cnt >= 5'd22)
@@ -112,30 +127,30 @@ module udp_send_tb(
                     fifo_write_cnt <= fifo_write_cnt + 1'b1;
 
                 case (fifo_write_cnt)
-                    5'd0: fifo_write_data = "H";  // 'H'
-                    5'd1: fifo_write_data = "e";  // 'e'
-                    5'd2: fifo_write_data = "l";  // 'l'
-                    5'd3: fifo_write_data = "l";  // 'l'
-                    5'd4: fifo_write_data = "o";  // 'o'
-                    5'd5: fifo_write_data = ",";  // ','
-                    5'd6: fifo_write_data = " ";  // ' '
-                    5'd7: fifo_write_data = "w";  // 'w'
-                    5'd8: fifo_write_data = "e";  // 'e'
-                    5'd9: fifo_write_data = "l";  // 'l'
-                    5'd10: fifo_write_data = "c"; // 'c'
-                    5'd11: fifo_write_data = "o"; // 'o'
-                    5'd12: fifo_write_data = "m"; // 'm'
-                    5'd13: fifo_write_data = "e"; // 'e'
-                    5'd14: fifo_write_data = " "; // ' '
-                    5'd15: fifo_write_data = "t"; // 't'
-                    5'd16: fifo_write_data = "o"; // 'o'
-                    5'd17: fifo_write_data = " "; // ' '
-                    5'd18: fifo_write_data = "F"; // 'F'
-                    5'd19: fifo_write_data = "P"; // 'P'
-                    5'd20: fifo_write_data = "G"; // 'G'
-                    5'd21: fifo_write_data = "A"; // 'A'
-                    5'd22: fifo_write_data = "!"; // '!'
-                    default: fifo_write_data = 8'h00; // Default case
+                    5'd0: fifo_write_data <= "H";  // 'H'
+                    5'd1: fifo_write_data <= "e";  // 'e'
+                    5'd2: fifo_write_data <= "l";  // 'l'
+                    5'd3: fifo_write_data <= "l";  // 'l'
+                    5'd4: fifo_write_data <= "o";  // 'o'
+                    5'd5: fifo_write_data <= ",";  // ','
+                    5'd6: fifo_write_data <= " ";  // ' '
+                    5'd7: fifo_write_data <= "w";  // 'w'
+                    5'd8: fifo_write_data <= "e";  // 'e'
+                    5'd9: fifo_write_data <= "l";  // 'l'
+                    5'd10: fifo_write_data <= "c"; // 'c'
+                    5'd11: fifo_write_data <= "o"; // 'o'
+                    5'd12: fifo_write_data <= "m"; // 'm'
+                    5'd13: fifo_write_data <= "e"; // 'e'
+                    5'd14: fifo_write_data <= " "; // ' '
+                    5'd15: fifo_write_data <= "t"; // 't'
+                    5'd16: fifo_write_data <= "o"; // 'o'
+                    5'd17: fifo_write_data <= " "; // ' '
+                    5'd18: fifo_write_data <= "F"; // 'F'
+                    5'd19: fifo_write_data <= "P"; // 'P'
+                    5'd20: fifo_write_data <= "G"; // 'G'
+                    5'd21: fifo_write_data <= "A"; // 'A'
+                    5'd22: fifo_write_data <= "!"; // '!'
+                    default: fifo_write_data <= 8'h00; // Default case
                 endcase
         end
     end
@@ -144,12 +159,12 @@ module udp_send_tb(
     initial begin
         reset_n <= 1'b0;
         fifo_write_aclr <= 1'b1;
+        fifo_write_ctrl <= 1'b0;
         #1000;
         reset_n <= 1'b1;
         fifo_write_aclr <= 1'b0;
-        repeat (12) @(posedge fifo_write_clk);  // FIFO写入延时，根据仿真，
-                                                // 该FIFO似乎会在fifo_write_request信号有效后的12拍才开始写入数据，
-                                                // 因此要相应使得写入的数据延后12拍
+        repeat (12) @(posedge fifo_write_clk);  // 等待FIFO复位结束（wr_rst_busy无效）后再开始写入，
+                                                // 根据仿真，该FIFO在复位释放后约12拍才能写入数据
         fifo_write_ctrl <= 1'b1;                // 开始FIFO写入控制信号
         
         repeat (10000) @(posedge clk_125m); // Wait for some time
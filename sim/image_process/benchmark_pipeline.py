@@ -0,0 +1,245 @@
+"""
+Reproducible latency benchmark of the software image_process pipeline.
+
+Times gray -> median -> Sobel on one frame with three implementations:
+
+    loop        the per-pixel deque models the testbench scripts were written with
+                (what time_counter_image_process_software_replicate_fpga.py measures)
+    vectorized  golden_model, bit-exact with the RTL
+    opencv      process_image_software() of time_counter_image_process_software_popular_computation.py
+                (cvtColor / medianBlur / Sobel, not bit-exact)
+
+at several resolutions up to 1280x720. The input frame is prepared once per
+resolution and only the processing is timed: warm-up runs first, then
+`repeats` timed runs with the garbage collector off (like timeit), reported
+as p50 / p95 / p99. The results can be written as JSON and compared with an
+earlier JSON (the baseline) to flag regressions, and the same numbers give
+the software vs FPGA latency table of latency_compared_to_software.md, the
+FPGA side being W * H + PIPELINE_LATENCY cycles of the image_process clock.
+
+    python benchmark_pipeline.py --json bench.json
+    python benchmark_pipeline.py --baseline bench.json --models vectorized opencv
+"""
+# Dependencies
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from golden_model import THRESHOLD, median_filter, reference_median_filter, reference_sobel_filter, rgb2gray, sobel_filter
+
+try:
+    import cv2
+    from time_counter_image_process_software_popular_computation import process_image_software
+except ImportError:     # opencv-python is only needed for the "opencv" model
+    cv2 = None
+
+# Hyperparameter
+SIZES = ((200, 200), (320, 240), (640, 480), (1280, 720))
+MODELS = ("loop", "vectorized", "opencv")
+WARMUP = 5
+REPEATS = 50
+LOOP_WARMUP = 1     # the loop model takes seconds per frame, so it gets fewer runs
+LOOP_REPEATS = 3
+PIPELINE_LATENCY = 8                # clk of image_process_top.v from the first pixel in to the first pixel out
+CLOCK_PERIODS_NS = (5.0, 10.0)      # the 5 ns constraint and the relaxed 10 ns of latency_compared_to_software.md
+TOLERANCE = 0.25    # a p50 more than 25 % above the baseline is a regression
+
+
+def loop_pipeline(rgb, threshold=THRESHOLD):
+    """gray -> median -> Sobel with the per-pixel reference models."""
+    width = rgb.shape[1]
+    gray = rgb2gray(rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    return reference_sobel_filter(reference_median_filter(gray, width), width, threshold)
+
+
+def vectorized_pipeline(rgb, threshold=THRESHOLD):
+    """gray -> median -> Sobel with the vectorized golden models."""
+    width = rgb.shape[1]
+    gray = rgb2gray(rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    return sobel_filter(median_filter(gray, width), width, threshold)
+
+
+def available_models():
+    """{name: f(frame)}; `frame` is RGB for the golden models and BGR for OpenCV."""
+    models = {"loop": loop_pipeline, "vectorized": vectorized_pipeline}
+    if cv2 is not None:
+        models["opencv"] = process_image_software
+    return models
+
+
+def load_frame(image_path, size):
+    """The test image resized like rgb2gray_tb.py, as an RGB uint8 array (not timed)."""
+    with Image.open(image_path) as img:
+      return np.asarray(img.convert('RGB').resize(size=size, resample=Image.Resampling.LANCZOS))
+
+
+def time_runs(func, arg, warmup, repeats):
+    """Seconds of each of `repeats` calls of func(arg), after `warmup` untimed calls."""
+    for _ in range(warmup):
+        func(arg)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            func(arg)
+            samples.append((time.perf_counter_ns() - start) * 1e-9)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def summarize(samples):
+    """Latency statistics of one (model, size) in ms."""
+    ms = np.asarray(samples) * 1e3
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    return {"runs": len(ms), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "mean_ms": float(ms.mean()), "min_ms": float(ms.min()), "max_ms": float(ms.max())}
+
+
+def fpga_latency(width, height, period_ns, latency=PIPELINE_LATENCY):
+    """ms image_process_top.v needs for one frame: one pixel per clock plus the pipeline latency."""
+    return (width * height + latency) * period_ns * 1e-6
+
+
+def environment():
+    env = {"python": platform.python_version(), "numpy": np.__version__,
+           "platform": platform.platform(), "machine": platform.machine(), "processor": platform.processor()}
+    if cv2 is not None:
+        env["opencv"] = cv2.__version__
+    return env
+
+
+def run(image_path, sizes=SIZES, models=MODELS, warmup=WARMUP, repeats=REPEATS,
+        loop_warmup=LOOP_WARMUP, loop_repeats=LOOP_REPEATS, threshold=THRESHOLD):
+    """
+    Benchmark every model at every size.
+
+    Args:
+        image_path (str): the test image, resized to each size before timing.
+        sizes (list): (width, height) tuples.
+        models (list): names from MODELS; "opencv" is skipped when OpenCV is missing.
+        warmup, repeats (int): untimed / timed runs of the fast models.
+        loop_warmup, loop_repeats (int): the same for the per-pixel loop model.
+
+    Returns:
+        dict: {"environment", "config", "results": [{model, width, height, runs, p50_ms, ...}]}.
+    """
+    funcs = available_models()
+    for name in models:
+        if name not in funcs:
+            print(f"Skip {name}: OpenCV (cv2) is not installed")
+    results = []
+    for width, height in sizes:
+        rgb = load_frame(image_path, (width, height))
+        bgr = np.ascontiguousarray(rgb[..., ::-1])
+        for name in models:
+            if name not in funcs:
+                continue
+            func = funcs[name] if name == "opencv" else (lambda frame, f=funcs[name]: f(frame, threshold))
+            n_warmup, n_repeats = (loop_warmup, loop_repeats) if name == "loop" else (warmup, repeats)
+            stats = summarize(time_runs(func, bgr if name == "opencv" else rgb, n_warmup, n_repeats))
+            results.append({"model": name, "width": width, "height": height, "warmup": n_warmup, **stats})
+            print(f"{name:<11}{width:>5}x{height:<5} p50={stats['p50_ms']:10.3f} ms  "
+                  f"p95={stats['p95_ms']:10.3f} ms  p99={stats['p99_ms']:10.3f} ms  ({stats['runs']} runs)")
+    config = {"image": os.path.basename(image_path), "threshold": threshold,
+              "warmup": warmup, "repeats": repeats, "loop_warmup": loop_warmup, "loop_repeats": loop_repeats}
+    return {"environment": environment(), "config": config, "results": results}
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    Regressions of `report` against `baseline`: (model, size) pairs present in
+    both whose p50 grew by more than `tolerance` (relative).
+    """
+    before = {(r["model"], r["width"], r["height"]): r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        old = before.get((r["model"], r["width"], r["height"]))
+        if old is None:
+            continue
+        ratio = r["p50_ms"] / old["p50_ms"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        print(f"{r['model']:<11}{r['width']:>5}x{r['height']:<5} p50 {old['p50_ms']:10.3f} -> {r['p50_ms']:10.3f} ms  "
+              f"x{ratio:.2f}  {flag}")
+        if flag != "ok":
+            regressions.append(r)
+    return regressions
+
+
+def latency_table(report, periods_ns=CLOCK_PERIODS_NS):
+    """Markdown table of the software p50 of every model vs the FPGA frame latency, as in latency_compared_to_software.md."""
+    sizes = sorted({(r["width"], r["height"]) for r in report["results"]}, key=lambda s: s[0] * s[1])
+    software = {(r["model"], r["width"], r["height"]): r["p50_ms"] for r in report["results"]}
+    models = [m for m in MODELS if any(key[0] == m for key in software)]
+    head = ["Size"] + [f"{m} p50 (ms)" for m in models] + [f"FPGA @ {p:g} ns (ms)" for p in periods_ns]
+    head += [f"{m} -> FPGA @ {p:g} ns: reduction (speed-up)" for p in periods_ns for m in models]
+    lines = ["| " + " | ".join(head) + " |", "|" + "---|" * len(head)]
+    for width, height in sizes:
+        fpga = [fpga_latency(width, height, p) for p in periods_ns]
+        row = [f"{width}x{height}"]
+        row += [f"{software[(m, width, height)]:.4f}" if (m, width, height) in software else "-" for m in models]
+        row += [f"{t:.4f}" for t in fpga]
+        for t in fpga:
+            for m in models:
+                sw = software.get((m, width, height))
+                row.append(f"{(1 - t / sw) * 100:.2f} % (x{sw / t:.1f})" if sw else "-")    # negative: the FPGA is slower
+        lines.append("| " + " | ".join(row) + " |")
+    return "\n".join(lines)
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Benchmark the software gray -> median -> Sobel pipeline against the FPGA.")
+    parser.add_argument("--image", default=os.path.join(sim_dir, "test.jpg"))
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=list(SIZES), help="e.g. 200x200 1280x720")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--loop-warmup", type=int, default=LOOP_WARMUP)
+    parser.add_argument("--loop-repeats", type=int, default=LOOP_REPEATS)
+    parser.add_argument("--threshold", type=int, default=THRESHOLD)
+    parser.add_argument("--json", metavar="FILE", help="write the results (usable later as --baseline)")
+    parser.add_argument("--baseline", metavar="FILE", help="earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="relative p50 increase flagged as a regression")
+    parser.add_argument("--markdown", metavar="FILE", help="also write the software vs FPGA latency table here")
+    args = parser.parse_args()
+
+    report = run(args.image, args.sizes, args.models, args.warmup, args.repeats,
+                 args.loop_warmup, args.loop_repeats, args.threshold)
+    table = latency_table(report)
+    print()
+    print(table)
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+          f.write(table + "\n")
+        print(f"Successfully write latency table to {args.markdown}")
+    if args.json:
+        with open(args.json, 'w') as f:
+          json.dump(report, f, indent=1)
+        print(f"Successfully write results to {args.json}")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+          baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(report, baseline, args.tolerance)
+        print("Test ****P A S S E D****" if not regressions else "Test ****F A I L E D****")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Batch golden generation over an image corpus and a parameter grid.
+
+For every image in a directory and every resolution, one job (run in a
+process pool) writes the rgb2gray_tb.v stimulus and, for every METHOD of
+rgb2gray.v and every Sobel threshold, the gray / median / Sobel goldens:
+
+    OUT/<image>/<W>x<H>/r_input.txt, g_input.txt, b_input.txt
+    OUT/<image>/<W>x<H>/<METHOD>/gray_golden.txt, median_golden.txt, sobel_golden_t<THRESHOLD>.txt
+
+OUT/manifest.json records every output with its sha256 and the key of its
+inputs (image content, size, method, threshold and stage_cache.model_hash
+of the golden model). A rerun only writes outputs whose key changed or
+whose file is missing, so editing one image or adding a threshold does not
+regenerate the corpus.
+
+With --cache DIR the stage outputs themselves (resized RGB, gray, median,
+Sobel magnitude) are also kept in a size-bounded stage_cache.StageCache,
+so an output that must be written again (a new threshold, a deleted file,
+--force) reuses every upstream stage that is unchanged.
+
+    python golden_batch.py IMAGES_DIR --out goldens --sizes 200x200 1280x720 \
+        --methods WEIGHT AVERAGE --thresholds 64 128 192
+"""
+# Dependencies
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from golden_io import format_hex
+from golden_model import THRESHOLD, WIDTH, HEIGHT
+from stage_cache import MAX_BYTES, CachedPipeline, StageCache, model_hash, parse_bytes, sha256_file
+
+# Hyperparameter
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+METHODS = ("WEIGHT", "AVERAGE")
+MANIFEST = "manifest.json"
+
+
+def output_key(image_sha, size, method=None, threshold=None, model=""):
+    """Key of everything an output depends on; the output is up to date while its key is unchanged."""
+    return hashlib.sha256(json.dumps([image_sha, list(size), method, threshold, model]).encode()).hexdigest()
+
+
+def plan_outputs(image, image_sha, size, methods, thresholds, model):
+    """{relative path: key} of every file the job for (image, size) writes."""
+    stem = os.path.splitext(os.path.basename(image))[0]
+    base = f"{stem}/{size[0]}x{size[1]}"
+    outputs = {f"{base}/{c}_input.txt": output_key(image_sha, size, model=model) for c in "rgb"}
+    for method in methods:
+        key = output_key(image_sha, size, method, model=model)
+        outputs[f"{base}/{method}/gray_golden.txt"] = key
+        outputs[f"{base}/{method}/median_golden.txt"] = key
+        for threshold in thresholds:
+            outputs[f"{base}/{method}/sobel_golden_t{threshold}.txt"] = output_key(image_sha, size, method, threshold, model)
+    return outputs
+
+
+def generate(image, size, methods, thresholds, out_dir, outputs, image_sha=None, cache_dir=None, cache_bytes=MAX_BYTES):
+    """
+    One job: resize `image` like rgb2gray_tb.py and write its stimulus and goldens.
+
+    Only the files in `outputs` (the stale ones) are written, and a stage is
+    only computed (or loaded from the stage cache in `cache_dir`) when a
+    stale file needs it. The median output and the Sobel magnitude are
+    computed once per method and thresholded for every threshold.
+    Returns ({relative path: (sha256, bytes)}, cache stats or None).
+    """
+    cache = StageCache(cache_dir, cache_bytes) if cache_dir else None
+    pipe = CachedPipeline(cache, image, size, image_sha)
+    stem = os.path.splitext(os.path.basename(image))[0]
+    base = f"{stem}/{size[0]}x{size[1]}"
+
+    results = {}
+    def write(rel, pixels):
+        if rel not in outputs:
+            return
+        data = format_hex(pixels())
+        path = os.path.join(out_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+          f.write(data)
+        results[rel] = (hashlib.sha256(data).hexdigest(), len(data))
+
+    for channel, c in enumerate("rgb"):
+        write(f"{base}/{c}_input.txt", lambda: pipe.rgb()[..., channel])
+    for method in methods:
+        write(f"{base}/{method}/gray_golden.txt", lambda: pipe.gray(method))
+        write(f"{base}/{method}/median_golden.txt", lambda: pipe.median(method))
+        for threshold in thresholds:
+            write(f"{base}/{method}/sobel_golden_t{threshold}.txt", lambda: pipe.sobel(method, threshold))
+    return results, cache.stats() if cache is not None else None
+
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+      return json.load(f).get("outputs", {})
+
+
+def save_manifest(out_dir, entries):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", 'w') as f:
+      json.dump({"outputs": dict(sorted(entries.items()))}, f, indent=1)
+    os.replace(path + ".tmp", path)     # never leave a half-written manifest behind
+
+
+def up_to_date(out_dir, rel, key, entry):
+    path = os.path.join(out_dir, rel)
+    return (entry is not None and entry["key"] == key
+            and os.path.exists(path) and os.path.getsize(path) == entry["bytes"])
+
+
+def run(image_dir, out_dir, sizes, methods=METHODS, thresholds=(THRESHOLD,), workers=None, force=False,
+        cache_dir=None, cache_bytes=MAX_BYTES):
+    """
+    Generate every missing or stale output, in parallel, and update the manifest.
+
+    Args:
+        image_dir (str): folder of images (IMAGE_EXTENSIONS, not recursive).
+        out_dir (str): output root, also holds manifest.json.
+        sizes (list): (width, height) tuples.
+        workers (int): process pool size, default os.cpu_count().
+        force (bool): regenerate everything.
+        cache_dir (str): stage cache shared by the workers, None for no cache.
+        cache_bytes (int): size limit of the stage cache.
+    """
+    images = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                    if name.lower().endswith(IMAGE_EXTENSIONS))
+    stems = [os.path.splitext(os.path.basename(image))[0] for image in images]
+    if len(set(stems)) != len(stems):
+        raise ValueError("image names must be unique without their extension")
+    model = model_hash()
+    manifest = load_manifest(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    jobs, skipped = [], 0
+    for image in images:
+        image_sha = sha256_file(image)
+        for size in sizes:
+            outputs = plan_outputs(image, image_sha, size, methods, thresholds, model)
+            if not force:
+                outputs = {rel: key for rel, key in outputs.items() if not up_to_date(out_dir, rel, key, manifest.get(rel))}
+            if not outputs:
+                skipped += 1
+                continue
+            jobs.append((image, image_sha, size, outputs))
+    print(f"{len(images)} images x {len(sizes)} sizes: {len(jobs)} jobs to run, {skipped} up to date")
+
+    start = time.perf_counter()
+    failed = 0
+    hits = misses = evictions = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+      futures = {pool.submit(generate, image, size, methods, thresholds, out_dir, outputs, image_sha, cache_dir,
+                             cache_bytes): (image, image_sha, size, outputs)
+                 for image, image_sha, size, outputs in jobs}
+      try:
+        for future in as_completed(futures):
+            image, image_sha, size, outputs = futures[future]
+            try:
+                results, stats = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Error: {image} at {size[0]}x{size[1]}: {e}")
+                continue
+            if stats is not None:
+                hits, misses, evictions = hits + stats["hits"], misses + stats["misses"], evictions + stats["evictions"]
+            for rel, (digest, nbytes) in results.items():
+                manifest[rel] = {"key": outputs[rel], "sha256": digest, "bytes": nbytes,
+                                 "image": os.path.basename(image), "image_sha256": image_sha}
+      finally:
+        save_manifest(out_dir, manifest)
+    print(f"{len(jobs) - failed} jobs done in {time.perf_counter() - start:.2f} s, {failed} failed, "
+          f"manifest: {os.path.join(out_dir, MANIFEST)}")
+    if cache_dir:
+        cache = StageCache(cache_dir, cache_bytes)
+        print(f"stage cache {cache_dir}: {hits} hits, {misses} misses, {evictions} evicted, "
+              f"{len(cache)} entries, {cache.size / (1 << 20):.1f}/{cache_bytes / (1 << 20):.0f} MiB")
+    return failed == 0
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate testbench goldens for an image directory over a parameter grid.")
+    parser.add_argument("images", help="directory of input images")
+    parser.add_argument("--out", default="goldens", help="output directory (holds manifest.json)")
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[(WIDTH, HEIGHT)], help="e.g. 200x200 1280x720")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[THRESHOLD])
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="regenerate even if the manifest says up to date")
+    parser.add_argument("--cache", metavar="DIR", help="keep stage outputs in this stage cache directory")
+    parser.add_argument("--cache-size", type=parse_bytes, default=MAX_BYTES, help="stage cache size limit, e.g. 2G")
+    args = parser.parse_args()
+    ok = run(args.images, args.out, args.sizes, args.methods, args.thresholds, args.workers, args.force,
+             args.cache, args.cache_size)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
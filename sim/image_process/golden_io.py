@@ -0,0 +1,153 @@
+"""
+Stimulus / golden file I/O for the image_process testbenches.
+
+Hex text files are what the Verilog testbenches read with $readmemh: one
+value per line, two upper-case hex digits ("0A\\n"). They are written and
+parsed here with lookup tables over whole arrays instead of one f-string or
+int(..., 16) per pixel. For the Python side, `.npy` (keeps the shape) and
+`.raw` / `.bin` (bare uint8 bytes) files hold the same data and are opened
+memory-mapped, so a 1280x720 frame costs no parse at all.
+
+    python golden_io.py gray_golden.txt gray_golden.npy     # convert, by extension
+    python golden_io.py --bench                             # time a full-resolution stimulus set
+"""
+# Dependencies
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# Hyperparameter
+HEX_EXTENSIONS = (".txt", ".hex", ".mem")
+RAW_EXTENSIONS = (".raw", ".bin")
+
+# "00\n" ... "FF\n" as rows of bytes: format_hex is a single fancy index
+_HEX_LINES = np.frombuffer("".join(f"{v:02X}\n" for v in range(256)).encode(), dtype=np.uint8).reshape(256, 3)
+
+# ASCII -> nibble value, -1 for anything that is not a hex digit
+_NIBBLE = np.full(256, -1, dtype=np.int16)
+for _digit in "0123456789abcdef":
+    _NIBBLE[ord(_digit)] = _NIBBLE[ord(_digit.upper())] = int(_digit, 16)
+
+
+def format_hex(pixels):
+    """$readmemh text for a uint8 array (flattened row by row), as bytes."""
+    return _HEX_LINES[np.asarray(pixels, dtype=np.uint8).ravel()].tobytes()
+
+
+def parse_hex(data):
+    """
+    uint8 array from $readmemh-style text (bytes).
+
+    Files written by the testbench scripts ("XX\\n" per line) and their CRLF
+    form from Windows checkouts ("XX\\r\\n") are decoded with one table lookup;
+    anything else (one-digit values, blank lines) falls back to splitting on
+    whitespace.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    for ending in (b"\n", b"\r\n"):
+        stride = 2 + len(ending)
+        if buf.size % stride:
+            continue
+        lines = buf.reshape(-1, stride)
+        if not all((lines[:, 2 + i] == c).all() for i, c in enumerate(ending)):
+            continue
+        hi, lo = _NIBBLE[lines[:, 0]], _NIBBLE[lines[:, 1]]
+        if (hi >= 0).all() and (lo >= 0).all():
+            return (hi * 16 + lo).astype(np.uint8)
+    return np.array([int(token, 16) for token in data.split()], dtype=np.uint8)
+
+
+def write_hex(path, pixels):
+    """Write pixels to a $readmemh-compatible hex file."""
+    with open(path, 'wb') as f:
+      f.write(format_hex(pixels))
+
+
+def read_hex(path):
+    """A testbench hex file, one value per line, as a uint8 array."""
+    with open(path, 'rb') as f:
+      return parse_hex(f.read())
+
+
+def load(path, shape=None, mmap=True):
+    """
+    Load stimulus / golden data by extension: hex text, `.npy` or raw bytes.
+
+    Args:
+        path (str): the file.
+        shape (tuple): reshape the result (hex and raw files are flat).
+        mmap (bool): open `.npy` / raw files memory-mapped (read-only) instead of reading them.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        data = np.load(path, mmap_mode='r' if mmap else None)
+    elif ext in RAW_EXTENSIONS:
+        data = np.memmap(path, dtype=np.uint8, mode='r') if mmap else np.fromfile(path, dtype=np.uint8)
+    elif ext in HEX_EXTENSIONS:
+        data = read_hex(path)
+    else:
+        raise ValueError(f"{path}: unknown extension {ext!r}, expected .npy, {RAW_EXTENSIONS} or {HEX_EXTENSIONS}")
+    return data.reshape(shape) if shape is not None else data
+
+
+def save(path, pixels):
+    """Save uint8 pixels by extension: hex text, `.npy` (keeps the shape) or raw bytes."""
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        np.save(path, pixels)
+    elif ext in RAW_EXTENSIONS:
+        pixels.tofile(path)
+    elif ext in HEX_EXTENSIONS:
+        write_hex(path, pixels)
+    else:
+        raise ValueError(f"{path}: unknown extension {ext!r}, expected .npy, {RAW_EXTENSIONS} or {HEX_EXTENSIONS}")
+
+
+def convert(src, dst, shape=None):
+    """Convert between hex, `.npy` and raw files; `shape` is applied when the source is flat."""
+    save(dst, load(src, shape=shape))
+    print(f"Successfully converted {src} to {dst}")
+
+
+def bench(width=1280, height=720, directory=None):
+    """Time writing and reading R, G, B, gray, median and Sobel files of one full frame in every format."""
+    rng = np.random.default_rng(0)
+    names = ("r_input", "g_input", "b_input", "gray_golden", "median_golden", "sobel_golden")
+    frames = [rng.integers(0, 256, (height, width), dtype=np.uint8) for _ in names]
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+      for ext in (".txt", ".npy", ".raw"):
+        paths = [os.path.join(tmp, name + ext) for name in names]
+        start = time.perf_counter()
+        for path, frame in zip(paths, frames):
+            save(path, frame)
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = [np.asarray(load(path)).ravel() for path in paths]
+        read = time.perf_counter() - start
+        assert all((a == f.ravel()).all() for a, f in zip(loaded, frames))
+        print(f"{ext:<5}{len(names)} x {width}x{height}  write={written * 1e3:.1f} ms  read={read * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert testbench stimulus / golden files between hex, .npy and raw.")
+    parser.add_argument("src", nargs="?", help="input file (.txt/.hex/.mem, .npy, .raw/.bin)")
+    parser.add_argument("dst", nargs="?", help="output file, format chosen by extension")
+    parser.add_argument("--shape", type=int, nargs="+", help="e.g. --shape 200 200 when converting a flat file to .npy")
+    parser.add_argument("--bench", action="store_true", help="time a full-resolution stimulus set instead")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.width, args.height)
+    elif args.src and args.dst:
+        convert(args.src, args.dst, tuple(args.shape) if args.shape else None)
+    else:
+        parser.error("give SRC and DST, or --bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Vectorized, bit-exact models of the image_process pipeline (rgb2gray.v,
+gray_through_median_filter.v, sobel.v).
+
+The 3x3 stages see the image as one flat pixel stream, exactly like the
+line-buffer + sliding-window model in the *_tb.py scripts (deque of 2*WIDTH
+pixels, zero initialised, 3x3 window shifted left every pixel):
+
+    window[r, c] at pixel n  =  x[n - (2 - r) * WIDTH - (2 - c)]     (0 if the index is negative)
+
+so the window wraps from the end of one row into the start of the next and
+the first two rows / columns see zeros. Here the stream is prefixed with
+2 * WIDTH + 2 zeros (or with `history`, the pixels that preceded it) and
+the nine taps are zero-copy columns of a sliding-window view of it, so the
+whole image is processed with a few dozen array operations instead of a
+Python loop per pixel. The median comes from a 19-step compare-exchange
+network over the nine taps (min/max only), the Sobel gradients from
+weighted sums of them.
+"""
+# Dependencies
+import argparse
+import collections
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from golden_io import read_hex
+
+# Hyperparameter
+WIDTH = 200
+HEIGHT = 200
+THRESHOLD = 128 # 128 is the threshold of the sobel filter
+
+# Sobel kernel, same orientation as sobel_tb.py
+SOBEL_KERNEL_X = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
+SOBEL_KERNEL_Y = np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]])
+
+# Compare-exchange pairs after which tap 4 holds the median of nine
+MEDIAN9_NETWORK = ((1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8),
+                   (0, 3), (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2))
+
+
+def carry_length(width):
+    """Pixels of history a 3x3 stage needs: two lines plus two pixels."""
+    return 2 * width + 2
+
+
+def rgb2gray(r, g, b, method="WEIGHT"):
+    """
+    rgb2gray.v: gray = (77*R + 150*G + 29*B) >> 8 ("WEIGHT") or ((R + G + B) * 85) >> 8 ("AVERAGE").
+
+    Args:
+        r, g, b (np.ndarray): uint8 channels of any (equal) shape.
+        method (str): METHOD parameter of rgb2gray.v.
+    """
+    r, g, b = (np.asarray(c, dtype=np.uint32) for c in (r, g, b))
+    if method == "WEIGHT":
+        gray_tmp = r * 77 + g * 150 + b * 29
+    elif method == "AVERAGE":
+        gray_tmp = (r + g + b) * 85
+    else:
+        raise ValueError(f"method must be 'WEIGHT' or 'AVERAGE', got {method!r}")
+    return (gray_tmp >> 8).astype(np.uint8)
+
+
+def window_taps(pixels, width, history=None):
+    """
+    The 3x3 window of every pixel of a flat stream, as nine length-N views in row-major window order.
+
+    Args:
+        pixels (np.ndarray): the stream (any shape, flattened row by row).
+        width (int): image width, i.e. the line-buffer length.
+        history (np.ndarray): the carry_length(width) pixels before `pixels`; zeros if None.
+    """
+    pixels = np.asarray(pixels).ravel()
+    carry = carry_length(width)
+    if history is None:
+        history = np.zeros(carry, dtype=pixels.dtype)
+    elif history.size != carry:
+        raise ValueError(f"history must hold {carry} pixels, got {history.size}")
+    padded = np.concatenate([history.astype(pixels.dtype, copy=False), pixels])
+    view = sliding_window_view(padded, carry + 1)
+    return [view[:, r * width + c] for r in range(3) for c in range(3)]
+
+
+def median_filter(pixels, width=WIDTH, history=None):
+    """gray_through_median_filter.v: the median of each 3x3 window (uint8, same length as the stream)."""
+    p = window_taps(pixels, width, history)
+    for a, b in MEDIAN9_NETWORK:
+        p[a], p[b] = np.minimum(p[a], p[b]), np.maximum(p[a], p[b])
+    return p[4].astype(np.uint8)
+
+
+def sobel_magnitude(pixels, width=WIDTH, history=None):
+    """|Gx| + |Gy| of each 3x3 window, as computed by sobel.v before thresholding."""
+    p = [tap.astype(np.int16) for tap in window_taps(pixels, width, history)]  # |G| <= 2040
+    g_x = (p[2] - p[0]) + 2 * (p[5] - p[3]) + (p[8] - p[6])    # SOBEL_KERNEL_X
+    g_y = (p[0] + 2 * p[1] + p[2]) - (p[6] + 2 * p[7] + p[8])  # SOBEL_KERNEL_Y
+    return np.abs(g_x) + np.abs(g_y)
+
+
+def sobel_filter(pixels, width=WIDTH, threshold=THRESHOLD, history=None):
+    """sobel.v: 0 (edge) where |Gx| + |Gy| > threshold, else 1."""
+    return (sobel_magnitude(pixels, width, history) <= threshold).astype(np.uint8)
+
+
+def reference_median_filter(pixels, width=WIDTH):
+    """The per-pixel deque model of gray_through_median_filter_tb.py, kept as the reference."""
+    line_buffer = collections.deque((0 for i in range(width*2)), maxlen=width*2)
+    window = np.zeros(shape=(3, 3), dtype=np.uint8)
+    out = []
+    for pixel in np.asarray(pixels).ravel().tolist():
+        window = np.roll(window, shift=-1, axis=1)
+        window[0, 2] = line_buffer[width*2-1]
+        window[1, 2] = line_buffer[width-1]
+        window[2, 2] = pixel
+        out.append(np.sort(window.flatten())[4])
+        line_buffer.appendleft(pixel)
+    return np.array(out, dtype=np.uint8)
+
+
+def reference_sobel_filter(pixels, width=WIDTH, threshold=THRESHOLD):
+    """The per-pixel deque model of sobel_tb.py, kept as the reference."""
+    line_buffer = collections.deque((0 for i in range(width*2)), maxlen=width*2)
+    window = np.zeros(shape=(3, 3), dtype=np.uint8)
+    out = []
+    for pixel in np.asarray(pixels).ravel().tolist():
+        window = np.roll(window, shift=-1, axis=1)
+        window[0, 2] = line_buffer[width*2-1]
+        window[1, 2] = line_buffer[width-1]
+        window[2, 2] = pixel
+        G_x = np.sum(np.multiply(window, SOBEL_KERNEL_X)).item()
+        G_y = np.sum(np.multiply(window, SOBEL_KERNEL_Y)).item()
+        out.append(0 if np.abs(G_x) + np.abs(G_y) > threshold else 1)
+        line_buffer.appendleft(pixel)
+    return np.array(out, dtype=np.uint8)
+
+
+def verify(directory, width=WIDTH, threshold=THRESHOLD, reference=True):
+    """
+    Check the vectorized models byte for byte against the checked-in goldens and time them.
+
+    gray_golden.txt -> median_filter -> median_golden.txt -> sobel_filter -> sobel_golden.txt;
+    with `reference`, also time the per-pixel models on the same input.
+
+    Args:
+        directory (str): folder holding gray_golden.txt, median_golden.txt and sobel_golden.txt.
+    """
+    gray = read_hex(os.path.join(directory, "gray_golden.txt"))
+    median_golden = read_hex(os.path.join(directory, "median_golden.txt"))
+    sobel_golden = read_hex(os.path.join(directory, "sobel_golden.txt"))
+
+    ok = True
+    for name, model, reference_model, stimulus, golden in (
+            ("median", lambda x: median_filter(x, width), lambda x: reference_median_filter(x, width),
+             gray, median_golden),
+            ("sobel", lambda x: sobel_filter(x, width, threshold), lambda x: reference_sobel_filter(x, width, threshold),
+             median_golden, sobel_golden)):
+        model(stimulus[:width])  # warm-up
+        start = time.perf_counter()
+        out = model(stimulus)
+        vectorized = time.perf_counter() - start
+        mismatches = int(np.count_nonzero(out != golden)) if out.size == golden.size else -1
+        ok &= mismatches == 0
+        line = f"{name:<7}{out.size} pixels  mismatches={mismatches}  vectorized={vectorized * 1e3:.2f} ms"
+        if reference:
+            start = time.perf_counter()
+            reference_model(stimulus)
+            looped = time.perf_counter() - start
+            line += f"  per-pixel={looped * 1e3:.0f} ms  speedup={looped / vectorized:.0f}x"
+        print(line)
+    print("Test ****P A S S E D****" if ok else "Test ****F A I L E D****")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the vectorized golden models against the checked-in goldens.")
+    parser.add_argument("--dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="folder with gray_golden.txt, median_golden.txt and sobel_golden.txt")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--threshold", type=int, default=THRESHOLD)
+    parser.add_argument("--no-reference", action="store_true", help="skip timing the per-pixel models")
+    args = parser.parse_args()
+    raise SystemExit(0 if verify(args.dir, args.width, args.threshold, not args.no_reference) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Streaming rgb2gray -> median -> Sobel golden pipeline.
+
+Every stage is a generator that takes row blocks and yields row blocks of
+the same shape, so the stages chain like the modules of image_process_top.v
+and no intermediate hex file is needed. A 3x3 stage keeps only the pixels
+the hardware keeps between two blocks: the two lines of shift_register_2taps.v
+plus the two pixels already in the window (golden_model.carry_length), so
+memory does not grow with the image height or the number of frames.
+
+Like the hardware, whose line buffer is never reset, consecutive frames
+form one continuous stream; only the very first lines see the zero
+initialised buffer. Output is byte for byte the same as running
+golden_model on the whole stream at once, whatever the block size.
+
+Hex files are optional sinks (`tap`) on any stage, e.g. to regenerate the
+testbench goldens:
+
+    python golden_pipeline.py --image test.jpg --rgb-out . --gray-out gray_golden.txt \
+        --median-out median_golden.txt --sobel-out sobel_golden.txt
+"""
+# Dependencies
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from golden_io import format_hex, parse_hex
+from golden_model import THRESHOLD, WIDTH, HEIGHT, carry_length, median_filter, rgb2gray, sobel_filter
+
+# Hyperparameter
+BLOCK_ROWS = 16     # rows per block handed from stage to stage
+
+
+def image_blocks(paths, size=(WIDTH, HEIGHT), block_rows=BLOCK_ROWS):
+    """
+    RGB row blocks of every frame of every image, resized like rgb2gray_tb.py.
+
+    Multi-frame files (GIF, TIFF, ...) yield each frame in turn; only one
+    frame is decoded at a time.
+
+    Args:
+        paths (list): image files, streamed in order.
+        size (tuple): (width, height) every frame is resized to (LANCZOS).
+        block_rows (int): rows per yielded block, shape (rows, width, 3).
+    """
+    for path in paths:
+        with Image.open(path) as img:
+          for frame in ImageSequence.Iterator(img):
+            rgb = np.asarray(frame.convert('RGB').resize(size=size, resample=Image.Resampling.LANCZOS))
+            for top in range(0, rgb.shape[0], block_rows):
+              yield rgb[top:top + block_rows]
+
+
+def hex_blocks(path, width=WIDTH, block_rows=BLOCK_ROWS):
+    """Row blocks (rows, width) of a testbench hex file, reading block_rows lines of it at a time."""
+    with open(path, 'rb') as f:
+      lines = (line for line in f if line.strip())
+      while True:
+        chunk = list(itertools.islice(lines, width * block_rows))
+        if not chunk:
+          return
+        if len(chunk) % width:
+          raise ValueError(f"{path}: {len(chunk) % width} trailing pixels do not fill a line of {width}")
+        yield parse_hex(b"".join(chunk)).reshape(-1, width)
+
+
+def rgb_hex_blocks(r_file, g_file, b_file, width=WIDTH, block_rows=BLOCK_ROWS):
+    """RGB row blocks from the r/g/b_input.txt stimulus files of rgb2gray_tb.v."""
+    channels = [hex_blocks(path, width, block_rows) for path in (r_file, g_file, b_file)]
+    for r, g, b in zip(*channels):
+        yield np.stack([r, g, b], axis=-1)
+
+
+def gray_stage(blocks, method="WEIGHT"):
+    """rgb2gray.v on every (rows, width, 3) block; stateless."""
+    for block in blocks:
+        yield rgb2gray(block[..., 0], block[..., 1], block[..., 2], method)
+
+
+def window_stage(blocks, width, model):
+    """
+    Run a 3x3 golden model block by block, carrying only its line-buffer history.
+
+    Args:
+        blocks: (rows, width) uint8 blocks of one continuous pixel stream.
+        width (int): image width, i.e. the line-buffer length.
+        model: f(pixels, history) -> flat output, e.g. golden_model.median_filter.
+    """
+    carry = carry_length(width)
+    history = np.zeros(carry, dtype=np.uint8)   # the zero initialised line buffer
+    for block in blocks:
+        pixels = np.asarray(block, dtype=np.uint8).ravel()
+        if pixels.size == 0:
+            continue
+        yield model(pixels, history).reshape(block.shape)
+        if pixels.size >= carry:
+            history = pixels[-carry:].copy()
+        else:
+            history = np.concatenate([history[pixels.size:], pixels])
+
+
+def median_stage(blocks, width=WIDTH):
+    """gray_through_median_filter.v on a stream of gray row blocks."""
+    return window_stage(blocks, width, lambda pixels, history: median_filter(pixels, width, history))
+
+
+def sobel_stage(blocks, width=WIDTH, threshold=THRESHOLD):
+    """sobel.v on a stream of median-filtered row blocks: 0 = edge, 1 = no edge."""
+    return window_stage(blocks, width, lambda pixels, history: sobel_filter(pixels, width, threshold, history))
+
+
+def tap(blocks, output_file):
+    """Pass blocks through unchanged while writing them to a testbench hex file (one value per line)."""
+    with open(output_file, 'wb') as f:
+      for block in blocks:
+        f.write(format_hex(block))
+        yield block
+    print(f"Successfully write results to {output_file}")
+
+
+def rgb_tap(blocks, r_file, g_file, b_file):
+    """tap() for RGB blocks: one stimulus file per channel, as rgb2gray_tb.py writes them."""
+    files = [open(path, 'wb') for path in (r_file, g_file, b_file)]
+    try:
+        for block in blocks:
+            for channel, f in enumerate(files):
+                f.write(format_hex(block[..., channel]))
+            yield block
+    finally:
+        for f in files:
+            f.close()
+    print(f"Successfully write stimulus to {r_file}, {g_file}, {b_file}")
+
+
+def pipeline(rgb_blocks, width=WIDTH, threshold=THRESHOLD, method="WEIGHT", outputs=None):
+    """
+    Chain gray -> median -> Sobel over a stream of RGB row blocks.
+
+    Args:
+        rgb_blocks: (rows, width, 3) uint8 blocks, e.g. from image_blocks().
+        outputs (dict): optional hex sinks, keys "rgb" (tuple of three paths),
+            "gray", "median" and "sobel".
+    """
+    outputs = outputs or {}
+    if outputs.get("rgb"):
+        rgb_blocks = rgb_tap(rgb_blocks, *outputs["rgb"])
+    blocks = gray_stage(rgb_blocks, method)
+    if outputs.get("gray"):
+        blocks = tap(blocks, outputs["gray"])
+    blocks = median_stage(blocks, width)
+    if outputs.get("median"):
+        blocks = tap(blocks, outputs["median"])
+    blocks = sobel_stage(blocks, width, threshold)
+    if outputs.get("sobel"):
+        blocks = tap(blocks, outputs["sobel"])
+    return blocks
+
+
+def main():
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Stream images through the rgb2gray -> median -> Sobel golden models.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--image", nargs="+", help="image file(s); multi-frame files are streamed frame by frame")
+    source.add_argument("--rgb-in", nargs=3, metavar=("R", "G", "B"),
+                        help="r/g/b hex stimulus files (default: r_input.txt g_input.txt b_input.txt next to this script)")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT, help="frame height images are resized to")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    parser.add_argument("--method", choices=("WEIGHT", "AVERAGE"), default="WEIGHT")
+    parser.add_argument("--threshold", type=int, default=THRESHOLD)
+    parser.add_argument("--rgb-out", metavar="DIR", help="write r_input.txt / g_input.txt / b_input.txt into DIR")
+    parser.add_argument("--gray-out", help="hex sink after rgb2gray")
+    parser.add_argument("--median-out", help="hex sink after the median filter")
+    parser.add_argument("--sobel-out", help="hex sink after the Sobel filter")
+    parser.add_argument("--check", metavar="FILE", help="compare the Sobel output with this hex file (e.g. sobel_golden.txt)")
+    args = parser.parse_args()
+
+    if args.image:
+        rgb_blocks = image_blocks(args.image, (args.width, args.height), args.block_rows)
+    else:
+        rgb_in = args.rgb_in or [os.path.join(sim_dir, f"{c}_input.txt") for c in "rgb"]
+        rgb_blocks = rgb_hex_blocks(*rgb_in, width=args.width, block_rows=args.block_rows)
+    outputs = {"gray": args.gray_out, "median": args.median_out, "sobel": args.sobel_out}
+    if args.rgb_out:
+        outputs["rgb"] = tuple(os.path.join(args.rgb_out, f"{c}_input.txt") for c in "rgb")
+
+    expected = hex_blocks(args.check, args.width, args.block_rows) if args.check else None
+    pending = np.empty(0, dtype=np.uint8)   # expected pixels not yet compared
+    rows = edges = mismatches = 0
+    start = time.perf_counter()
+    for block in pipeline(rgb_blocks, args.width, args.threshold, args.method, outputs):
+        rows += block.shape[0]
+        edges += int(block.size - np.count_nonzero(block))
+        if expected is not None:
+            while pending.size < block.size:
+                nxt = next(expected, None)
+                if nxt is None:
+                    break
+                pending = np.concatenate([pending, nxt.ravel()])
+            got = block.ravel()[:pending.size]
+            mismatches += int(np.count_nonzero(got != pending[:got.size])) + block.size - got.size
+            pending = pending[got.size:]
+    elapsed = time.perf_counter() - start
+
+    print(f"{rows} lines ({rows // args.height} frames of {args.width}x{args.height}), "
+          f"{edges} edge pixels, {elapsed * 1e3:.1f} ms")
+    if expected is not None:
+        mismatches += pending.size + sum(b.size for b in expected)    # golden longer than the output
+        print(f"{args.check}: mismatches={mismatches}")
+        print("Test ****P A S S E D****" if mismatches == 0 else "Test ****F A I L E D****")
+        raise SystemExit(0 if mismatches == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Multi-core tiled execution of the rgb2gray -> median -> Sobel golden pipeline.
+
+A frame is cut into horizontal strips that are processed in parallel and
+written into one preallocated output per stage. A 3x3 stage needs the
+carry_length(width) = 2 * WIDTH + 2 pixels before a strip (two rows plus
+two pixels, since the window wraps from one row into the next), so each
+strip recomputes a halo in front of it:
+
+    gray    from 2 carries before the strip   (stateless, feeds the median halo)
+    median  from 1 carry before the strip     (its output is the Sobel history)
+    sobel   the strip itself
+
+Pixels before the start of the frame are zeros, as in the zero initialised
+line buffer, so stitching the strips gives exactly golden_model's output on
+the whole frame; the benchmark checks this on every run.
+
+Two executors:
+
+    thread   a ThreadPoolExecutor; the NumPy operations release the GIL
+    process  a ProcessPoolExecutor over multiprocessing.shared_memory: the
+             frame and the three outputs live in shared blocks and workers
+             only receive block names and row ranges
+
+    python golden_tiled.py --size 1280x720 --workers 1 2 4 8 --executor thread process
+"""
+# Dependencies
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from benchmark_pipeline import load_frame, parse_size, summarize, time_runs, vectorized_pipeline
+from golden_model import THRESHOLD, carry_length, median_filter, rgb2gray, sobel_filter
+
+# Hyperparameter
+EXECUTORS = ("thread", "process")
+STRIPS_PER_WORKER = 1   # more strips balance uneven cores at the cost of more halo recomputation
+WARMUP = 3
+REPEATS = 20
+
+
+def split_rows(height, strips):
+    """(first row, end row) of `strips` strips of nearly equal height."""
+    strips = max(1, min(strips, height))
+    edges = np.linspace(0, height, strips + 1).round().astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def history_at(values, first, position, carry):
+    """
+    The `carry` stage outputs before `position`, zeros before the frame.
+
+    Args:
+        values (np.ndarray): flat outputs of a stage for pixels first, first + 1, ...
+    """
+    lo = position - carry
+    if lo >= first:
+        return values[lo - first:position - first]
+    return np.concatenate([np.zeros(first - lo, dtype=values.dtype), values[:position - first]])
+
+
+def process_strip(rgb, width, start, stop, threshold=THRESHOLD, method="WEIGHT"):
+    """
+    gray / median / Sobel outputs of pixels [start, stop) of a frame, recomputing the halo.
+
+    Args:
+        rgb (np.ndarray): the whole frame, (height, width, 3) uint8.
+        start, stop (int): flat pixel range of the strip.
+    Returns:
+        tuple: flat (gray, median, sobel) of the strip.
+    """
+    carry = carry_length(width)
+    flat = rgb.reshape(-1, 3)
+    gray_first = max(0, start - 2 * carry)
+    gray = rgb2gray(flat[gray_first:stop, 0], flat[gray_first:stop, 1], flat[gray_first:stop, 2], method)
+    median_first = max(0, start - carry)
+    median = median_filter(gray[median_first - gray_first:], width,
+                           history_at(gray, gray_first, median_first, carry))
+    sobel = sobel_filter(median[start - median_first:], width, threshold,
+                         history_at(median, median_first, start, carry))
+    return gray[start - gray_first:], median[start - median_first:], sobel
+
+
+def _run_strip(arrays, rows, threshold, method):
+    """Thread job: one strip from the frame into the three output arrays."""
+    rgb, gray, median, sobel = arrays
+    width = rgb.shape[1]
+    top, bottom = rows
+    outputs = process_strip(rgb, width, top * width, bottom * width, threshold, method)
+    for out, strip in zip((gray, median, sobel), outputs):
+        out[top:bottom] = strip.reshape(-1, width)
+
+
+def _run_shared_strip(names, shape, rows, threshold, method):
+    """Process job: attach the shared blocks by name, then run the strip like _run_strip."""
+    height, width = shape
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        rgb = np.ndarray((height, width, 3), dtype=np.uint8, buffer=blocks[0].buf)
+        outs = [np.ndarray((height, width), dtype=np.uint8, buffer=block.buf) for block in blocks[1:]]
+        _run_strip([rgb, *outs], rows, threshold, method)
+        del rgb, outs
+    finally:
+        for block in blocks:
+            block.close()
+
+
+class TiledPipeline:
+    """
+    Strip-parallel golden pipeline with a persistent worker pool.
+
+    Args:
+        workers (int): pool size.
+        executor (str): "thread" or "process".
+        strips (int): strips per frame, default workers * STRIPS_PER_WORKER.
+    """
+
+    def __init__(self, workers=None, executor="thread", strips=None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+        self.workers = workers or os.cpu_count()
+        self.executor = executor
+        self.strips = strips or self.workers * STRIPS_PER_WORKER
+        pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        self._pool = pool(max_workers=self.workers)
+        self._shared = None     # (shape, blocks) of the process executor, reused while the shape is unchanged
+
+    def run(self, rgb, threshold=THRESHOLD, method="WEIGHT"):
+        """(gray, median, sobel) of one (height, width, 3) uint8 frame, each (height, width)."""
+        rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        height, width = rgb.shape[:2]
+        rows = split_rows(height, self.strips)
+        if self.executor == "thread":
+            outs = [np.empty((height, width), dtype=np.uint8) for _ in range(3)]
+            jobs = [self._pool.submit(_run_strip, [rgb, *outs], r, threshold, method) for r in rows]
+            for job in jobs:
+                job.result()
+            return tuple(outs)
+
+        blocks = self._blocks((height, width))
+        shared_rgb = np.ndarray(rgb.shape, dtype=np.uint8, buffer=blocks[0].buf)
+        shared_rgb[...] = rgb
+        names = [block.name for block in blocks]
+        jobs = [self._pool.submit(_run_shared_strip, names, (height, width), r, threshold, method) for r in rows]
+        for job in jobs:
+            job.result()
+        del shared_rgb
+        return tuple(np.ndarray((height, width), dtype=np.uint8, buffer=block.buf).copy() for block in blocks[1:])
+
+    def _blocks(self, shape):
+        if self._shared is None or self._shared[0] != shape:
+            self._release()
+            pixels = shape[0] * shape[1]
+            self._shared = (shape, [shared_memory.SharedMemory(create=True, size=size)
+                                    for size in (3 * pixels, pixels, pixels, pixels)])
+        return self._shared[1]
+
+    def _release(self):
+        if self._shared is not None:
+            for block in self._shared[1]:
+                block.close()
+                block.unlink()
+            self._shared = None
+
+    def close(self):
+        self._pool.shutdown()
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(rgb, workers_list, executors=EXECUTORS, threshold=THRESHOLD, strips_per_worker=STRIPS_PER_WORKER,
+              warmup=WARMUP, repeats=REPEATS):
+    """
+    Time the tiled pipeline for every executor and worker count, checking it against golden_model.
+
+    Speed-up is relative to the measured p50 of the single-threaded vectorized_pipeline,
+    efficiency is speed-up / workers.
+
+    Returns:
+        (list, bool): result dicts (executor, workers, strips, p50_ms, ..., speedup, efficiency)
+        and whether every output was bit-identical.
+    """
+    reference = vectorized_pipeline(rgb, threshold)
+    gray = rgb2gray(rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    median = median_filter(gray, rgb.shape[1]).reshape(gray.shape)
+    stats = summarize(time_runs(lambda frame: vectorized_pipeline(frame, threshold), rgb, warmup, repeats))
+    base = stats["p50_ms"]
+    print(f"{'single':<8}{'-':>8}{'-':>8}  p50={stats['p50_ms']:9.3f} ms  p95={stats['p95_ms']:9.3f} ms")
+    results, identical = [], True
+    for executor in executors:
+        for workers in workers_list:
+            with TiledPipeline(workers, executor, workers * strips_per_worker) as tiled:
+                outputs = tiled.run(rgb, threshold)
+                same = all(np.array_equal(a, b) for a, b in zip(outputs, (gray, median, reference.reshape(gray.shape))))
+                identical &= same
+                stats = summarize(time_runs(lambda frame: tiled.run(frame, threshold), rgb, warmup, repeats))
+            speedup = base / stats["p50_ms"]
+            results.append({"executor": executor, "workers": workers, "strips": tiled.strips, **stats,
+                            "speedup": speedup, "efficiency": speedup / workers, "identical": same})
+            print(f"{executor:<8}{workers:>8}{tiled.strips:>8}  p50={stats['p50_ms']:9.3f} ms  "
+                  f"p95={stats['p95_ms']:9.3f} ms  speedup=x{speedup:.2f}  efficiency={speedup / workers:.0%}"
+                  f"  {'identical' if same else 'MISMATCH'}")
+    return results, identical
+
+
+def main():
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Benchmark the strip-parallel golden pipeline over worker counts.")
+    parser.add_argument("--image", default=os.path.join(sim_dir, "test.jpg"))
+    parser.add_argument("--size", type=parse_size, default=(1280, 720), help="e.g. 1280x720 or 3840x2160")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="worker counts to compare")
+    parser.add_argument("--executor", nargs="+", choices=EXECUTORS, default=list(EXECUTORS))
+    parser.add_argument("--strips-per-worker", type=int, default=STRIPS_PER_WORKER)
+    parser.add_argument("--threshold", type=int, default=THRESHOLD)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    rgb = load_frame(args.image, args.size)
+    print(f"{args.size[0]}x{args.size[1]}, {os.cpu_count()} CPUs; speed-up relative to the single-threaded pipeline")
+    _, identical = benchmark(rgb, args.workers, args.executor, args.threshold, args.strips_per_worker,
+                             args.warmup, args.repeats)
+    print("Test ****P A S S E D****" if identical else "Test ****F A I L E D****")
+    raise SystemExit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 # Dependencies
 import numpy as np
-import collections
 import os
 from PIL import Image
 import matplotlib.pyplot as plt
 
+from golden_io import read_hex, write_hex
+from golden_model import median_filter
+
 # Hyperparameter
 WIDTH = 200
 HEIGHT = 200
@@ -17,9 +19,10 @@ def median_filter_testbench_stimulus_generator(
     """
     Simulates the exact behavior of the Verilog median filter module.
 
-    This function reads grayscale pixel data, processes it using line buffers
-    and a sliding window to mimic the Verilog hardware, and generates a
-    golden output file for the testbench.
+    This function reads grayscale pixel data, processes it with the vectorized
+    line-buffer + sliding-window model of golden_model.py (bit-exact with the
+    per-pixel deque model it replaces), and generates a golden output file
+    for the testbench.
 
     Args:
         input_file (str): The input text file with hex pixel values, ABSOLUTE PATH maybe needed.
@@ -29,38 +32,17 @@ def median_filter_testbench_stimulus_generator(
     """
     print("--- Starting Python Simulation of Verilog Median Filter ---\n")
 
-    # 1. Initializing line buffer and sliding window
-    line_buffer = collections.deque((0 for i in range(WIDTH*2)), maxlen=WIDTH*2)
-    window = np.zeros(shape=(3, 3), dtype=np.uint8)
-    median_output_pixels = []   # The final output
-
-    print(f"Successfully initialized line buffer: {len(line_buffer)} length.\n Sliding window: \n{window}")
-
-    with open(input_file, 'r') as f:
-      for index, pixel in enumerate(f):
-        # 2. Sliding window
-        window = np.roll(window, shift=-1, axis=1)
-        window[0, 2] = line_buffer[WIDTH*2-1]
-        window[1, 2] = line_buffer[WIDTH-1]
-        window[2, 2] = int(pixel.strip(), 16)
-
-        # 3. Compare
-        flatten_window = window.flatten()
-        sorted_pixels = np.sort(flatten_window)
-        median_pixel = sorted_pixels[4]   # The median value
-
-        # 4. Memorize
-        median_output_pixels.append(median_pixel)
+    # 1. Read the gray scale pixels
+    gray_pixels = read_hex(input_file)
 
-        # 5. Shift register
-        line_buffer.appendleft(int(pixel.strip(), 16))
-        # NOTE: 这一步操作必须在Sliding Window之后
+    # 2. Line buffer, sliding window and compare, for the whole stream at once
+    median_output_pixels = median_filter(gray_pixels, WIDTH)
 
-      print(f"Successfully simulated the behaviour of Verilog.")
+    print(f"Successfully simulated the behaviour of Verilog.")
 
-    # 6. Visualize
+    # 3. Visualize
     print("Visualizing the results.")
-    results = np.array(median_output_pixels).reshape(WIDTH, HEIGHT)
+    results = median_output_pixels.reshape(HEIGHT, WIDTH)
 
     plt.figure(figsize=(7, 7))
     plt.imshow(results, cmap='gray')
@@ -72,15 +54,15 @@ def median_filter_testbench_stimulus_generator(
     # To print the image in hexadecimal format
     print(f"The gray scale image after median filter is: \n{results}")
 
-    # 7. Write the results to 'median_golden.txt'
-    with open(output_file, 'w') as f:
-      for pixel in median_output_pixels:
-        f.write(f"{pixel:02X}\n")
-      print(f"Successfully write results to {output_file}\n")
+    # 4. Write the results to 'median_golden.txt'
+    write_hex(output_file, median_output_pixels)
+    print(f"Successfully write results to {output_file}\n")
 
     print("--- Python Simulation Finished ---")
 
-median_filter_testbench_stimulus_generator(input_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/gray_golden.txt",
-                                           output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/median_golden.txt",
-                                           WIDTH=WIDTH,
-                                           HEIGHT=HEIGHT)
+if __name__ == "__main__":
+    SIM_DIR = os.path.dirname(os.path.abspath(__file__))  # the files live next to this script
+    median_filter_testbench_stimulus_generator(input_file=os.path.join(SIM_DIR, "gray_golden.txt"),
+                                               output_file=os.path.join(SIM_DIR, "median_golden.txt"),
+                                               WIDTH=WIDTH,
+                                               HEIGHT=HEIGHT)
@@ -15,6 +15,8 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 定义DUMP_OUTPUT时将实际输出逐像素写入gray_through_median_filter_tb_output.txt，供run_testbenches.py与golden比对
+// [2026/10/18] Revision 0.03 - 激励改为在时钟上升沿后1ns更新（<= #1）并移到输出比对之后，避免与被测模块在同一上升沿采样时产生竞争，Verilator等仿真器下的结果与Vivado一致
 // Additional Comments: 输入灰度模块输出的200*200灰度图像数据，并经过中值滤波后输出
 // 理论输入输出同样由外部Python脚本生成
 //////////////////////////////////////////////////////////////////////////////////
@@ -50,6 +52,11 @@ module gray_through_median_filter_tb #(
 
     event read_files_done;
 
+    `ifdef DUMP_OUTPUT
+    integer dump_file;                  // 实际输出导出文件，顺序与golden一致（第1个有效输出对应索引0）
+    initial dump_file = $fopen("gray_through_median_filter_tb_output.txt", "w");
+    `endif
+
     /*--------------------------------
     -------------模块实例化------------
     --------------------------------*/
@@ -103,19 +110,18 @@ module gray_through_median_filter_tb #(
         repeat (10) @(posedge clk); // 等待10个时钟周期
         $display("Simulation Starts.");
 
-        rst_p <= 1'b0;              // 释放复位信号
+        rst_p <= #1 1'b0;           // 释放复位信号
 
         @(posedge clk);
-        gray_valid <= 1'b1;
-        gray_hsync <= 1'b1;
-        gray_vsync <= 1'b1;       
+        gray_valid <= #1 1'b1;
+        gray_hsync <= #1 1'b1;
+        gray_vsync <= #1 1'b1;       
 
         for (i=0; i<=((WIDTH*HEIGHT-1)+5); i=i+1) begin
-            if (i <= (WIDTH*HEIGHT-1)) begin
-                gray <= gray_stimulus_input[i];
-            end
-
             if (median_valid) begin
+                `ifdef DUMP_OUTPUT
+                if (i >= 5) $fwrite(dump_file, "%h\n", median_out);
+                `endif
                 if (median_out !== median_golden_output[i-5]) begin     
                 // 注意在中值滤波模块中输出与输入间隔5个时钟延迟，因此当median_out第一次有效时已经是5次循环以后了
                 // 因此需要将i-5作为索引，而不是i-1
@@ -129,6 +135,10 @@ module gray_through_median_filter_tb #(
                 end
             end
 
+            if (i <= (WIDTH*HEIGHT-1)) begin
+                gray <= #1 gray_stimulus_input[i];
+            end
+
             repeat (1) @(posedge clk);
         end
 
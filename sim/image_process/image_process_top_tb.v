@@ -15,6 +15,9 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 定义DUMP_VCD时导出顶层波形，供sim/ethernet/link_model.py核对流水线延时
+// [2026/10/17] Revision 0.03 - 定义DUMP_OUTPUT时将实际输出逐像素写入image_process_top_tb_output.txt，供run_testbenches.py与golden比对
+// [2026/10/18] Revision 0.04 - 激励改为在时钟上升沿后1ns更新（<= #1）并移到输出比对之后，避免与被测模块在同一上升沿采样时产生竞争，Verilator等仿真器下的结果与Vivado一致；阈值改为通过threshold端口输入（模块已无THRESHOLD参数）
 // Additional Comments: 输入RGB888图像数据，经过灰度化处理、中值滤波处理、边缘检测处理后输出二值图像数据
 // 理论输入输出同样由外部Python脚本生成
 //////////////////////////////////////////////////////////////////////////////////
@@ -56,16 +59,21 @@ module image_process_top_tb #(
 
     event read_files_done;
 
+    `ifdef DUMP_OUTPUT
+    integer dump_file;                  // 实际输出导出文件，顺序与golden一致（第1个有效输出对应索引0）
+    initial dump_file = $fopen("image_process_top_tb_output.txt", "w");
+    `endif
+
     /*--------------------------------
     -------------模块实例化------------
     --------------------------------*/
     image_process_top #(
         .DATA_WIDTH     (DATA_WIDTH),
-        .THRESHOLD      (THRESHOLD),
         .METHOD         (METHOD)
     ) image_process_top_inst (
         .clk            (clk),
         .rst_p          (rst_p),
+        .threshold      (THRESHOLD),
         .rgb_valid      (rgb_valid),
         .rgb_hsync      (rgb_hsync),
         .rgb_vsync      (rgb_vsync),
@@ -100,6 +108,13 @@ module image_process_top_tb #(
         -> read_files_done;
     end
 
+    `ifdef DUMP_VCD
+    initial begin
+        $dumpfile("image_process_top_tb.vcd");
+        $dumpvars(1, image_process_top_tb);     // 仅导出顶层信号（rgb_hsync、sobel_hsync等）
+    end
+    `endif
+
     /*--------------------------------
     --------------正式测试-------------
     --------------------------------*/
@@ -122,21 +137,18 @@ module image_process_top_tb #(
         repeat (10) @(posedge clk);     // 等待10个时钟周期
         $display("Simulation Starts.");
 
-        rst_p <= 1'b0;                  // 释放复位信号
+        rst_p <= #1 1'b0;               // 释放复位信号
 
         @(posedge clk);
-        rgb_valid <= 1'b1;
-        rgb_hsync <= 1'b1;
-        rgb_vsync <= 1'b1;
+        rgb_valid <= #1 1'b1;
+        rgb_hsync <= #1 1'b1;
+        rgb_vsync <= #1 1'b1;
 
         for (i=0; i<=((WIDTH*HEIGHT-1)+9); i=i+1) begin // 总的流水线延时为8个时钟周期，额外多出来的一个时钟周期其实是Python脚本本身早了一个时钟周期
-            if (i <= (WIDTH*HEIGHT-1)) begin
-                r <= r_stimulus_input[i];
-                g <= g_stimulus_input[i];
-                b <= b_stimulus_input[i];
-            end
-
             if (sobel_valid) begin
+                `ifdef DUMP_OUTPUT
+                if (i >= 9) $fwrite(dump_file, "%h\n", sobel);
+                `endif
                 if (sobel !== sobel_golden_output[i-9][0]) begin
                     $display("@%0t: Error at index %0d | Input (R=%h, G=%h, B=%h) | Expected Output %h | Real Output %h", 
                              $realtime, i-9, r_stimulus_input[i-9], g_stimulus_input[i-9], b_stimulus_input[i-9], sobel_golden_output[i-9][0], sobel);
@@ -148,6 +160,12 @@ module image_process_top_tb #(
                 end
             end
 
+            if (i <= (WIDTH*HEIGHT-1)) begin
+                r <= #1 r_stimulus_input[i];
+                g <= #1 g_stimulus_input[i];
+                b <= #1 b_stimulus_input[i];
+            end
+
             repeat (1) @(posedge clk);
         end
 
@@ -4,6 +4,8 @@ import numpy as np
 from PIL import Image
 import matplotlib.pyplot as plt
 
+from golden_io import write_hex
+
 # Hyperparameter
 WIDTH = 200
 HEIGHT = 200
@@ -68,10 +70,7 @@ def gray_filter_testbench_stimulus_generator(
     # 6. Output R, G, B channels to .txt files in hexadecimal format
     # The testbench expects one hex value per line, without "0x" or "h"
     def write_channel_to_file(channel_data, filename):
-        with open(filename, 'w') as f:
-            for pixel_value in channel_data:
-                # Format as two-digit hexadecimal (e.g., 0A, FF)
-                f.write(f"{pixel_value:02X}\n") # :02X ensures uppercase hex, at least 2 digits, zero-padded
+        write_hex(filename, channel_data) # two-digit upper-case hex (e.g., 0A, FF), formatted for the whole channel at once
         print(f"Successfully wrote data to {filename}")
 
     write_channel_to_file(r_channel, r_output_file)
@@ -120,9 +119,11 @@ def gray_filter_testbench_stimulus_generator(
     print(f"All files generated successfully for an image of size {output_size[0]}x{output_size[1]}.\n")
     print("--- Python Simulation Finished ---")
 
-gray_filter_testbench_stimulus_generator(image_path="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/test.jpg",
-                                         gray_output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/gray_golden.txt",
-                                         r_output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/r_input.txt",
-                                         g_output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/g_input.txt",
-                                         b_output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/b_input.txt",
-                                         output_size=(WIDTH, HEIGHT))
+if __name__ == "__main__":
+    SIM_DIR = os.path.dirname(os.path.abspath(__file__))  # the files live next to this script
+    gray_filter_testbench_stimulus_generator(image_path=os.path.join(SIM_DIR, "test.jpg"),
+                                             gray_output_file=os.path.join(SIM_DIR, "gray_golden.txt"),
+                                             r_output_file=os.path.join(SIM_DIR, "r_input.txt"),
+                                             g_output_file=os.path.join(SIM_DIR, "g_input.txt"),
+                                             b_output_file=os.path.join(SIM_DIR, "b_input.txt"),
+                                             output_size=(WIDTH, HEIGHT))
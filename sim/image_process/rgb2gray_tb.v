@@ -15,6 +15,8 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 定义DUMP_OUTPUT时将实际输出逐像素写入rgb2gray_tb_output.txt，供run_testbenches.py与golden比对
+// [2026/10/18] Revision 0.03 - 激励改为在时钟上升沿后1ns更新（<= #1），避免与被测模块在同一上升沿采样时产生竞争，Verilator等仿真器下的结果与Vivado一致
 // Additional Comments: 输入尺寸为WIDTH*HEIGHT的RGB888图像数据，输出尺寸为200*200的灰度图像数据，
 // 该输入与理论输出由外部Python脚本生成
 //////////////////////////////////////////////////////////////////////////////////
@@ -55,6 +57,11 @@ module rgb2gray_tb #(
 
     event read_files_done;
 
+    `ifdef DUMP_OUTPUT
+    integer dump_file;                  // 实际输出导出文件，顺序与golden一致（第1个有效输出对应索引0）
+    initial dump_file = $fopen("rgb2gray_tb_output.txt", "w");
+    `endif
+
     /*--------------------------------
     -------------模块实例化------------
     --------------------------------*/
@@ -124,22 +131,25 @@ module rgb2gray_tb #(
         repeat (10) @(posedge clk); // 等待10个时钟周期
         $display("Simulation Starts.");
 
-        rst_p <= 1'b0;              // 释放复位信号
+        rst_p <= #1 1'b0;           // 释放复位信号
 
         @(posedge clk);             // Wait a cycle after reset deassertion before asserting valid signals
-        rgb_valid <= 1'b1;          // 输入数据有效
-        rgb_hsync <= 1'b1;          // 行同步信号有效
-        rgb_vsync <= 1'b1;          // 场同步信号有效
+        rgb_valid <= #1 1'b1;       // 输入数据有效
+        rgb_hsync <= #1 1'b1;       // 行同步信号有效
+        rgb_vsync <= #1 1'b1;       // 场同步信号有效
 
         for (i=0; i<=((WIDTH*HEIGHT-1)+1); i=i+1) begin
             if (i <= (WIDTH*HEIGHT-1)) begin
-                r <= r_stimulus_input[i];   // 读取红色通道数据
-                g <= g_stimulus_input[i];   // 读取绿色通道数据
-                b <= b_stimulus_input[i];   // 读取蓝色通道数据
+                r <= #1 r_stimulus_input[i];   // 读取红色通道数据
+                g <= #1 g_stimulus_input[i];   // 读取绿色通道数据
+                b <= #1 b_stimulus_input[i];   // 读取蓝色通道数据
             end
 
             @(posedge clk);             // 等待1个时钟周期后灰度模块数据开始串行输出
             if (gray_valid) begin       // 确保输出信号有效
+                `ifdef DUMP_OUTPUT
+                if (i >= 1) $fwrite(dump_file, "%h\n", gray);
+                `endif
                 if (gray !== gray_golden_output[i-1]) begin
                     $display("@%0t: Error at index %0d | Input (R=%h, G=%h, B=%h) | Expected Output %h | Real Output %h", 
                              $realtime, i-1, r_stimulus_input[i-1], g_stimulus_input[i-1], b_stimulus_input[i-1], gray_golden_output[i-1], gray);
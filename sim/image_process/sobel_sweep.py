@@ -0,0 +1,190 @@
+"""
+Sobel threshold sweep from a single gradient computation.
+
+sobel.v marks a pixel as edge (0) when |Gx| + |Gy| > threshold, so the
+magnitude map is computed once (golden_model.sobel_magnitude) and every
+threshold 0..255 is derived from it:
+
+    histogram    counts of each magnitude 0..2040 (np.bincount)
+    edge count   pixels above t = total - cumulative histogram at t, for all t at once
+    goldens      magnitude <= t for any subset of thresholds, byte for byte what
+                 sobel_tb.py / golden_batch.py write for that threshold
+
+sobel_thres_adjust.v changes the threshold at runtime in saturating steps of
+THRESH_STEP from THRESH_INIT (S3 up, S2 down), so not every value can be
+set on the board; the sweep marks the reachable ones with the number of key
+presses they take, and the suggested threshold for a target edge density is
+given both exactly and as the nearest reachable setting.
+
+    python sobel_sweep.py --density 0.08 --csv sweep.csv
+    python sobel_sweep.py --image test.jpg --width 1280 --height 720 --golden 118 128 138
+    python sobel_sweep.py --golden reachable --out-dir goldens
+"""
+# Dependencies
+import argparse
+import collections
+import csv
+import os
+import time
+
+import numpy as np
+
+from golden_io import read_hex, write_hex
+from golden_model import THRESHOLD, WIDTH, HEIGHT, sobel_magnitude
+
+# Hyperparameter
+THRESH_INIT = 128   # sobel_thres_adjust.v parameters
+THRESH_STEP = 10
+MAX_MAGNITUDE = 4 * 255 * 2     # |Gx| + |Gy| <= 2040
+THRESHOLDS = np.arange(256)     # the 8-bit threshold of sobel.v
+
+
+def key_presses(init=THRESH_INIT, step=THRESH_STEP):
+    """
+    Fewest S3 / S2 presses from reset to every threshold, -1 where unreachable.
+
+    Breadth-first search over the 256 values with the saturating update of
+    sobel_thres_adjust.v (up: min(t + step, 255), down: max(t - step, 0)).
+    """
+    presses = np.full(256, -1, dtype=np.int32)
+    presses[init] = 0
+    queue = collections.deque([init])
+    while queue:
+        t = queue.popleft()
+        for nxt in (255 if t > 255 - step else t + step, 0 if t < step else t - step):
+            if presses[nxt] < 0:
+                presses[nxt] = presses[t] + 1
+                queue.append(nxt)
+    return presses
+
+
+def sweep(magnitude):
+    """
+    Histogram and per-threshold edge statistics of a magnitude map.
+
+    Returns:
+        dict: "histogram" (MAX_MAGNITUDE + 1 counts), "edges" and "density" (one per threshold 0..255).
+    """
+    histogram = np.bincount(np.asarray(magnitude).ravel(), minlength=MAX_MAGNITUDE + 1)
+    total = int(histogram.sum())
+    edges = total - np.cumsum(histogram)[THRESHOLDS]
+    return {"histogram": histogram, "edges": edges, "density": edges / max(total, 1)}
+
+
+def binarize(magnitude, thresholds):
+    """sobel.v outputs for several thresholds at once, shape (len(thresholds),) + magnitude.shape; 0 = edge."""
+    thresholds = np.asarray(thresholds).reshape((-1,) + (1,) * np.ndim(magnitude))
+    return (magnitude[None] <= thresholds).astype(np.uint8)
+
+
+def suggest(density, target, presses=None):
+    """
+    Threshold whose edge density is closest to `target` (the highest such threshold on ties),
+    and the closest one among those with presses >= 0.
+    """
+    error = np.abs(density - target)
+    best = int(THRESHOLDS[::-1][np.argmin(error[::-1])])
+    if presses is None:
+        return best, None
+    reachable = np.flatnonzero(presses >= 0)
+    return best, int(reachable[::-1][np.argmin(error[reachable][::-1])])
+
+
+def write_goldens(magnitude, thresholds, out_dir):
+    """
+    sobel_golden_t<T>.txt for every threshold, as golden_batch.py names them.
+
+    One threshold at a time: binarize() over all 256 at 1280x720 would hold ~470 MB.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for threshold in thresholds:
+        path = os.path.join(out_dir, f"sobel_golden_t{threshold}.txt")
+        write_hex(path, magnitude <= threshold)
+    print(f"Successfully write {len(thresholds)} goldens to {out_dir}")
+
+
+def write_csv(path, result, presses):
+    with open(path, 'w', newline='') as f:
+      writer = csv.writer(f)
+      writer.writerow(["threshold", "edges", "density", "presses"])
+      for t in THRESHOLDS.tolist():
+        writer.writerow([t, int(result["edges"][t]), f"{result['density'][t]:.6f}", int(presses[t])])
+    print(f"Successfully write sweep to {path}")
+
+
+def load_magnitude(args):
+    """Magnitude map from the median-filtered hex file, or from --image through the (cached) golden chain."""
+    if args.image:
+        from stage_cache import CachedPipeline, StageCache
+        cache = StageCache(args.cache) if args.cache else None
+        magnitude = CachedPipeline(cache, args.image, (args.width, args.height)).magnitude(args.method)
+        if cache is not None:
+            print(cache.summary())
+        return magnitude.ravel()
+    return sobel_magnitude(read_hex(args.median_in), args.width)
+
+
+def parse_thresholds(values, presses):
+    """--golden values: numbers, "all" or "reachable"."""
+    if values == ["all"]:
+        return THRESHOLDS.tolist()
+    if values == ["reachable"]:
+        return np.flatnonzero(presses >= 0).tolist()
+    thresholds = [int(v) for v in values]
+    if not all(0 <= t <= 255 for t in thresholds):
+        raise SystemExit("thresholds must be 0..255")
+    return thresholds
+
+
+def main():
+    sim_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Sweep the Sobel threshold over 0..255 from one magnitude computation.")
+    parser.add_argument("--median-in", default=os.path.join(sim_dir, "median_golden.txt"),
+                        help="median-filtered hex file (the sobel_tb.v stimulus)")
+    parser.add_argument("--image", help="compute the magnitude from an image instead (resized like rgb2gray_tb.py)")
+    parser.add_argument("--cache", metavar="DIR", help="with --image: stage cache directory (see stage_cache.py)")
+    parser.add_argument("--method", choices=("WEIGHT", "AVERAGE"), default="WEIGHT")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--thresh-init", type=int, default=THRESH_INIT)
+    parser.add_argument("--thresh-step", type=int, default=THRESH_STEP)
+    parser.add_argument("--density", type=float, help="target edge density (0..1) to suggest a threshold for")
+    parser.add_argument("--golden", nargs="+", metavar="T", help='write sobel_golden_t<T>.txt; T, "all" or "reachable"')
+    parser.add_argument("--out-dir", default=".", help="where --golden files go")
+    parser.add_argument("--csv", help="write threshold, edges, density, presses for 0..255")
+    parser.add_argument("--histogram", help="write the magnitude histogram (magnitude, count) as CSV")
+    parser.add_argument("--check", metavar="FILE", help=f"compare threshold {THRESHOLD} with this golden (e.g. sobel_golden.txt)")
+    args = parser.parse_args()
+
+    magnitude = load_magnitude(args)
+    start = time.perf_counter()
+    result = sweep(magnitude)
+    elapsed = time.perf_counter() - start
+    presses = key_presses(args.thresh_init, args.thresh_step)
+    density = result["density"]
+    print(f"{magnitude.size} pixels, magnitude max={int(magnitude.max())}, 256 thresholds swept in {elapsed * 1e3:.2f} ms")
+    for t in sorted({0, 64, args.thresh_init, 192, 255}):
+        print(f"  t={t:<4}edges={int(result['edges'][t]):>9}  density={density[t]:.4f}  presses={presses[t]}")
+
+    if args.density is not None:
+        best, reachable = suggest(density, args.density, presses)
+        print(f"target density {args.density:.4f}: threshold {best} (density {density[best]:.4f}), "
+              f"nearest on the board {reachable} (density {density[reachable]:.4f}, "
+              f"{presses[reachable]} S2/S3 presses from {args.thresh_init})")
+    if args.csv:
+        write_csv(args.csv, result, presses)
+    if args.histogram:
+        with open(args.histogram, 'w', newline='') as f:
+          csv.writer(f).writerows([["magnitude", "count"], *enumerate(result["histogram"].tolist())])
+        print(f"Successfully write histogram to {args.histogram}")
+    if args.golden:
+        write_goldens(magnitude, parse_thresholds(args.golden, presses), args.out_dir)
+    if args.check:
+        mismatches = int(np.count_nonzero(binarize(magnitude, [THRESHOLD])[0] != read_hex(args.check)))
+        print(f"{args.check}: mismatches={mismatches}")
+        print("Test ****P A S S E D****" if mismatches == 0 else "Test ****F A I L E D****")
+        raise SystemExit(0 if mismatches == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
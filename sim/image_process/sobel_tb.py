@@ -1,10 +1,12 @@
 # Dependencies
 import numpy as np
-import collections
 import os
 from PIL import Image
 import matplotlib.pyplot as plt
 
+from golden_io import read_hex, write_hex
+from golden_model import sobel_filter
+
 # Hyperparameter
 WIDTH = 200
 HEIGHT = 200
@@ -18,9 +20,10 @@ def sobel_testbench_stimulus_generator(
     """
     Simulates the exact behavior of the Verilog sobel module.
 
-    This function reads grayscale pixel data, processes it using line buffers
-    and a sliding window to mimic the Verilog hardware, and generates a
-    golden output file for the testbench.
+    This function reads grayscale pixel data, processes it with the vectorized
+    line-buffer + sliding-window model of golden_model.py (bit-exact with the
+    per-pixel deque model it replaces), and generates a golden output file
+    for the testbench.
 
     Args:
         input_file (str): The input text file with hex pixel values, ABSOLUTE PATH maybe needed.
@@ -30,42 +33,17 @@ def sobel_testbench_stimulus_generator(
     """
     print("--- Starting Python Simulation of Verilog Sobel Filter ---\n")
 
-    # 1. Initializing line buffer, sliding window and sobel kernel
-    line_buffer = collections.deque((0 for i in range(WIDTH*2)), maxlen=WIDTH*2)
-    window = np.zeros(shape=(3, 3), dtype=np.uint8)
-    # Sobel kernel
-    sobel_kernel_x = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
-    sobel_kernel_y = np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]])
-    # The final output
-    sobel_output_pixels = []   
-
-    print(f"Successfully initialized.\nLine buffer: {len(line_buffer)} length.\nSliding window: \n{window}\nSobel kernel: \n{sobel_kernel_x}\n{sobel_kernel_y}")
-
-    with open(input_file, 'r') as f:
-      for index, pixel in enumerate(f):
-        # 2. Sliding window
-        window = np.roll(window, shift=-1, axis=1)
-        window[0, 2] = line_buffer[WIDTH*2-1]
-        window[1, 2] = line_buffer[WIDTH-1]
-        window[2, 2] = int(pixel.strip(), 16)
-
-        # 3. Convolution
-        G_x = np.sum(np.multiply(window, sobel_kernel_x)).item()
-        G_y = np.sum(np.multiply(window, sobel_kernel_y)).item()
-        G = np.abs(G_x) + np.abs(G_y)
-
-        # 4. Memorize
-        sobel_output_pixels.append(0 if G > THRESHOLD else 1)
+    # 1. Read the median filtered pixels
+    median_pixels = read_hex(input_file)
 
-        # 5. Shift register
-        line_buffer.appendleft(int(pixel.strip(), 16))
-        # NOTE: 这一步操作必须在Sliding Window之后
+    # 2. Line buffer, sliding window, convolution and threshold, for the whole stream at once
+    sobel_output_pixels = sobel_filter(median_pixels, WIDTH, THRESHOLD)
 
-      print(f"Successfully simulated the behaviour of Verilog.")
+    print(f"Successfully simulated the behaviour of Verilog.")
 
-    # 6. Visualize
+    # 3. Visualize
     print("Visualizing the results.")
-    results = np.array(sobel_output_pixels).reshape(WIDTH, HEIGHT)
+    results = sobel_output_pixels.reshape(HEIGHT, WIDTH)
 
     plt.figure(figsize=(7, 7))
     plt.imshow(results, cmap='gray', vmin=0, vmax=1)
@@ -77,15 +55,15 @@ def sobel_testbench_stimulus_generator(
     # To print the image in hexadecimal format
     print(f"The gray scale image after sobel filter is: \n{results}")
 
-    # 7. Write the results to 'median_golden.txt'
-    with open(output_file, 'w') as f:
-      for pixel in sobel_output_pixels:
-        f.write(f"{pixel:02X}\n")
-      print(f"Successfully write results to {output_file}\n")
+    # 4. Write the results to 'median_golden.txt'
+    write_hex(output_file, sobel_output_pixels)
+    print(f"Successfully write results to {output_file}\n")
 
     print("--- Python Simulation Finished ---")
 
-sobel_testbench_stimulus_generator(input_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/median_golden.txt",
-                                   output_file="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/sobel_golden.txt",
-                                   WIDTH=WIDTH,
-                                   HEIGHT=HEIGHT)
\ No newline at end of file
+if __name__ == "__main__":
+    SIM_DIR = os.path.dirname(os.path.abspath(__file__))  # the files live next to this script
+    sobel_testbench_stimulus_generator(input_file=os.path.join(SIM_DIR, "median_golden.txt"),
+                                       output_file=os.path.join(SIM_DIR, "sobel_golden.txt"),
+                                       WIDTH=WIDTH,
+                                       HEIGHT=HEIGHT)
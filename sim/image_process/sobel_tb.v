@@ -15,6 +15,8 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// [2026/10/17] Revision 0.02 - 定义DUMP_OUTPUT时将实际输出逐像素写入sobel_tb_output.txt，供run_testbenches.py与golden比对
+// [2026/10/18] Revision 0.03 - 激励改为在时钟上升沿后1ns更新（<= #1）并移到输出比对之后，避免与被测模块在同一上升沿采样时产生竞争，Verilator等仿真器下的结果与Vivado一致；阈值改为通过threshold端口输入（模块已无THRESHOLD参数）
 // Additional Comments: 输入中值滤波后的200*200灰度图像数据，并经过sobel滤波后输出单值图像数据
 // 理论输入输出同样由外部Python脚本生成
 //////////////////////////////////////////////////////////////////////////////////
@@ -51,15 +53,20 @@ module sobel_tb #(
 
     event read_files_done;
 
+    `ifdef DUMP_OUTPUT
+    integer dump_file;                  // 实际输出导出文件，顺序与golden一致（第1个有效输出对应索引0）
+    initial dump_file = $fopen("sobel_tb_output.txt", "w");
+    `endif
+
     /*--------------------------------
     -------------模块实例化------------
     --------------------------------*/
     sobel #(
-        .DATA_WIDTH     (DATA_WIDTH),
-        .THRESHOLD      (THRESHOLD)
+        .DATA_WIDTH     (DATA_WIDTH)
     ) sobel_inst (
         .clk            (clk),
         .reset_p        (reset_p),
+        .threshold      (THRESHOLD),
         .median         (median),
         .median_valid   (median_valid),
         .median_hsync   (median_hsync),
@@ -105,19 +112,18 @@ module sobel_tb #(
         repeat (10) @(posedge clk);     // 等待10个时钟周期
         $display("Simulation Starts.");
 
-        reset_p <= 1'b0;                // 释放复位信号
+        reset_p <= #1 1'b0;             // 释放复位信号
 
         @(posedge clk);
-        median_valid <= 1'b1;
-        median_hsync <= 1'b1;
-        median_vsync <= 1'b1;
+        median_valid <= #1 1'b1;
+        median_hsync <= #1 1'b1;
+        median_vsync <= #1 1'b1;
 
         for (i=0; i<=((WIDTH*HEIGHT-1)+4); i=i+1) begin
-            if (i <= (WIDTH*HEIGHT-1)) begin
-                median <= median_stimulus_input[i];
-            end
-
             if (sobel_valid) begin
+                `ifdef DUMP_OUTPUT
+                if (i >= 4) $fwrite(dump_file, "%h\n", sobel);
+                `endif
                 if (sobel !== sobel_golden_output[i-4][0]) begin
                     $display("@%0t: Error at index %0d | Input Median = %h | Expected Output = %h | Real Output = %h",
                              $realtime, i-4, median_stimulus_input[i-4], sobel_golden_output[i-4], sobel);
@@ -129,6 +135,10 @@ module sobel_tb #(
                 end
             end
 
+            if (i <= (WIDTH*HEIGHT-1)) begin
+                median <= #1 median_stimulus_input[i];
+            end
+
             repeat (1) @(posedge clk);
         end
 
@@ -0,0 +1,277 @@
+"""
+Content-addressed on-disk cache of the golden pipeline stages.
+
+Every stage output is stored under the hash of everything it depends on,
+chained through the stages:
+
+    rgb        image content (sha256), size, resample filter
+    gray       rgb key, METHOD
+    median     gray key
+    magnitude  median key                  |Gx| + |Gy| of sobel.v, int16
+    sobel      magnitude <= THRESHOLD      (not stored: one comparison)
+
+plus model_hash() (the golden model source and the hex format, shared with
+golden_batch.py's manifest), so editing a model invalidates its outputs. Changing a downstream parameter (e.g. the Sobel THRESHOLD)
+therefore reuses every upstream result, and sweeping thresholds only
+costs one comparison per threshold once the magnitude is cached.
+
+Entries are .npy files under DIR/<key[:2]>/. The total size is kept
+below `max_bytes` by evicting the least recently used entries (the file
+modification time is the access time, refreshed on every hit), so several
+processes can share one cache directory. Hits, misses and evictions are
+counted per stage.
+
+    python stage_cache.py DIR                 # size and entries per stage
+    python stage_cache.py DIR --limit 2G      # evict down to 2 GiB
+    python stage_cache.py DIR --clear
+"""
+# Dependencies
+import argparse
+import collections
+import hashlib
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from golden_io import format_hex
+from golden_model import THRESHOLD, median_filter, rgb2gray, sobel_magnitude
+
+# Hyperparameter
+MAX_BYTES = 1 << 30     # default size limit, 1 GiB
+STAGES = ("rgb", "gray", "median", "magnitude")
+MODEL_FILES = ("golden_model.py",)     # changing these invalidates every entry and batch output (so does the hex format)
+RESAMPLE = "LANCZOS"    # resize filter of rgb2gray_tb.py
+
+
+def sha256_file(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+      for block in iter(lambda: f.read(chunk), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def model_hash():
+    """
+    Hash of what decides the golden outputs, part of every cache and golden_batch.py
+    manifest key: the golden model sources and the text golden_io.format_hex writes
+    for every value. Scripts and help texts are left out, so editing them keeps the outputs.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for name in MODEL_FILES:
+        with open(os.path.join(here, name), 'rb') as f:
+          h.update(f.read())
+    h.update(format_hex(np.arange(256)))
+    return h.hexdigest()
+
+
+def stage_key(stage, parent, **params):
+    """Key of a stage output: the stage name, the key of its input and its own parameters."""
+    return hashlib.sha256(json.dumps([stage, parent, params], sort_keys=True).encode()).hexdigest()
+
+
+def parse_bytes(text):
+    """'512M', '2G', '1500000' -> bytes (binary multiples)."""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class StageCache:
+    """
+    Size-bounded LRU cache of stage outputs in a directory.
+
+    Args:
+        directory (str): cache root, created if missing.
+        max_bytes (int): size limit; the least recently used entries are evicted beyond it.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self.evictions = 0
+        self._entries = collections.OrderedDict()   # key -> (stage, bytes), least recently used first
+        self._bytes = 0
+        self._load()
+
+    def _load(self):
+        found = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".npy"):
+                    stat = entry.stat()
+                    key, _, stage = entry.name[:-4].partition(".")
+                    found.append((stat.st_mtime, key, stage, stat.st_size))
+        for _, key, stage, size in sorted(found):
+            self._entries[key] = (stage, size)
+            self._bytes += size
+
+    def _path(self, key, stage):
+        return os.path.join(self.directory, key[:2], f"{key}.{stage}.npy")
+
+    @property
+    def size(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, stage, key):
+        """The cached array, or None; also finds entries written by other processes since this one started."""
+        path = self._path(key, stage)
+        try:
+            array = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):     # never written, evicted by another process, or damaged
+            self._forget(key)
+            self.misses[stage] += 1
+            return None
+        if key not in self._entries:
+            self._entries[key] = (stage, os.path.getsize(path))
+            self._bytes += self._entries[key][1]
+        self._entries.move_to_end(key)
+        self.hits[stage] += 1
+        return array
+
+    def put(self, stage, key, array):
+        path = self._path(key, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+          np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(tmp, path)   # readers never see a half-written entry
+        self._forget(key)
+        self._entries[key] = (stage, os.path.getsize(path))
+        self._bytes += self._entries[key][1]
+        self.evict(self.max_bytes)
+
+    def get_or_compute(self, stage, key, compute):
+        array = self.get(stage, key)
+        if array is None:
+            array = compute()
+            self.put(stage, key, array)
+        return array
+
+    def evict(self, max_bytes):
+        """Remove least recently used entries until the cache holds at most max_bytes."""
+        while self._bytes > max_bytes and self._entries:
+            key, (stage, _) = next(iter(self._entries.items()))
+            try:
+                os.remove(self._path(key, stage))
+            except FileNotFoundError:
+                pass
+            self._forget(key)
+            self.evictions += 1
+
+    def clear(self):
+        self.evict(0)
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self):
+        """Counters of this instance plus the current size, as a dict."""
+        per_stage = {s: {"hits": self.hits[s], "misses": self.misses[s]} for s in sorted(set(self.hits) | set(self.misses))}
+        return {"hits": sum(self.hits.values()), "misses": sum(self.misses.values()), "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "stages": per_stage}
+
+    def summary(self):
+        s = self.stats()
+        stages = " ".join(f"{k}={v['hits']}/{v['hits'] + v['misses']}" for k, v in s["stages"].items())
+        return (f"cache: {s['hits']} hits, {s['misses']} misses ({stages}), {s['evictions']} evicted, "
+                f"{s['entries']} entries, {s['bytes'] / (1 << 20):.1f}/{s['max_bytes'] / (1 << 20):.0f} MiB")
+
+
+class CachedPipeline:
+    """
+    The golden gray -> median -> Sobel chain of one image with every stage taken from the cache when possible.
+
+    Stage outputs are also kept in memory for the lifetime of the object, so
+    e.g. the median of several thresholds is loaded once.
+
+    Args:
+        cache (StageCache): where stage outputs are kept; None computes every stage.
+        image (str): image file; its content, not its name, is part of the keys.
+        size (tuple): (width, height) the image is resized to.
+    """
+
+    def __init__(self, cache, image, size, image_sha=None, model=None):
+        self.cache = cache
+        self.image = image
+        self.size = tuple(size)
+        self.model = model or model_hash()
+        self.rgb_key = stage_key("rgb", image_sha or sha256_file(image), size=list(self.size),
+                                 resample=RESAMPLE, model=self.model)
+        self._memo = {}
+
+    def _stage(self, stage, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute() if self.cache is None else self.cache.get_or_compute(stage, key, compute)
+        return self._memo[key]
+
+    def rgb(self):
+        def compute():
+            with Image.open(self.image) as img:
+              return np.asarray(img.convert('RGB').resize(size=self.size, resample=getattr(Image.Resampling, RESAMPLE)))
+        return self._stage("rgb", self.rgb_key, compute)
+
+    def gray_key(self, method):
+        return stage_key("gray", self.rgb_key, method=method)
+
+    def gray(self, method="WEIGHT"):
+        def compute():
+            rgb = self.rgb()
+            return rgb2gray(rgb[..., 0], rgb[..., 1], rgb[..., 2], method)
+        return self._stage("gray", self.gray_key(method), compute)
+
+    def median(self, method="WEIGHT"):
+        key = stage_key("median", self.gray_key(method))
+        return self._stage("median", key, lambda: median_filter(self.gray(method), self.size[0])
+                           .reshape(self.size[1], self.size[0]))
+
+    def magnitude(self, method="WEIGHT"):
+        key = stage_key("magnitude", stage_key("median", self.gray_key(method)))
+        return self._stage("magnitude", key, lambda: sobel_magnitude(self.median(method), self.size[0])
+                           .reshape(self.size[1], self.size[0]))
+
+    def sobel(self, method="WEIGHT", threshold=THRESHOLD):
+        """sobel.v output, 0 = edge, from the cached magnitude."""
+        return (self.magnitude(method) <= threshold).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or trim a golden stage cache directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--limit", type=parse_bytes, help="evict least recently used entries down to this size, e.g. 2G")
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+
+    cache = StageCache(args.directory, max_bytes=float("inf"))
+    if args.clear:
+        cache.clear()
+    elif args.limit is not None:
+        cache.evict(args.limit)
+    per_stage = collections.Counter()
+    sizes = collections.Counter()
+    for stage, size in cache._entries.values():
+        per_stage[stage] += 1
+        sizes[stage] += size
+    for stage in STAGES:
+        print(f"{stage:<10}{per_stage[stage]:>8} entries {sizes[stage] / (1 << 20):10.1f} MiB")
+    print(f"{'total':<10}{len(cache):>8} entries {cache.size / (1 << 20):10.1f} MiB, {cache.evictions} evicted")
+
+
+if __name__ == "__main__":
+    main()
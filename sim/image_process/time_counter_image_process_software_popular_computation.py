@@ -1,7 +1,6 @@
 import cv2
 import numpy as np
 import time
-import matplotlib.pyplot as plt
 import os
 
 def process_image_software(image_bgr):
@@ -37,7 +36,7 @@ def process_image_software(image_bgr):
     
     return gray_image, median_filtered_image, sobel_combined
 
-def measure_software_performance(image_path="test.jpg", resize_dim=(200, 200), num_runs=100):
+def measure_software_performance(image_path="test.jpg", resize_dim=(200, 200), num_runs=100, show=True):
     """
     加载图像，测量其软件处理延迟，并显示结果。
 
@@ -45,6 +44,7 @@ def measure_software_performance(image_path="test.jpg", resize_dim=(200, 200), n
         image_path (str): 输入测试图像的路径。
         resize_dim (tuple): 目标处理尺寸 (宽度, 高度)。
         num_runs (int): 为获得稳定结果而运行的次数。
+        show (bool): 是否绘制处理结果（不计入延迟时间）。分位数、多分辨率测试见benchmark_pipeline.py
     """
     print("--- 软件端图像处理性能测试 ---")
 
@@ -92,6 +92,10 @@ def measure_software_performance(image_path="test.jpg", resize_dim=(200, 200), n
     print("\n--- 性能测试结果 ---")
     print(f"平均单帧处理延迟: {avg_delay * 1000:.4f} 毫秒 (ms)")
     print(f"等效处理帧率 (FPS): {1 / avg_delay:.2f}")
+
+    if not show:
+        return avg_delay
+    import matplotlib.pyplot as plt # 仅绘图需要
     
     # =================================================================
     # 步骤 3: 处理并显示最终图像 (此部分不计入延迟时间)
@@ -130,6 +134,7 @@ def measure_software_performance(image_path="test.jpg", resize_dim=(200, 200), n
     plt.tight_layout()
     plt.suptitle("Software Image Processing Results", fontsize=16)
     plt.show()
+    return avg_delay
 
 
 # --- 主程序入口 ---
@@ -140,4 +145,4 @@ if __name__ == "__main__":
         dummy_array = np.random.randint(0, 256, (480, 640, 3), dtype=np.uint8)
         cv2.imwrite("test.jpg", dummy_array)
     
-    measure_software_performance(image_path="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/test.jpg", resize_dim=(200, 200), num_runs=100)
\ No newline at end of file
+    measure_software_performance(image_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.jpg"), resize_dim=(200, 200), num_runs=100)
\ No newline at end of file
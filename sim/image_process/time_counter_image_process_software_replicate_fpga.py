@@ -3,7 +3,6 @@ import numpy as np
 import collections
 import os
 from PIL import Image
-import matplotlib.pyplot as plt
 import time
 
 # Hyperparameter
@@ -14,7 +13,8 @@ THRESHOLD = 128
 def time_counter(WIDTH=WIDTH,
                  HEIGHT=HEIGHT,
                  THRESHOLD=THRESHOLD,
-                 image_path="test.jpg"):
+                 image_path="test.jpg",
+                 show=False):
   """
   To count the image processing time using PYTHON, not including file reading/writing and visualizing time.
 
@@ -23,6 +23,9 @@ def time_counter(WIDTH=WIDTH,
     HEIGHT (int): The height of the image.
     THRESHOLD (int): The threshold of the sobel filter.
     image_path (str): The path of the image to be processed, ABSOLUTE PATH maybe needed.
+    show (bool): Plot the results after the timed section (blocks until the window is closed).
+
+  For percentiles, several resolutions and a baseline comparison, use benchmark_pipeline.py.
   """
 
   img = Image.open(image_path)
@@ -114,6 +117,10 @@ def time_counter(WIDTH=WIDTH,
 
   # print(f"The total time consuming in Python Code for Image Process is: {time.perf_counter() - start_time} seconds.")
 
+  if not show:
+    return end_time_internal - start_time_internal
+
+  import matplotlib.pyplot as plt # only needed for plotting
   plt.figure(figsize=(7, 7))
 
   plt.subplot(2, 2, 1)
@@ -122,17 +129,17 @@ def time_counter(WIDTH=WIDTH,
   plt.title("Original Image")
 
   plt.subplot(2, 2, 2)
-  plt.imshow(np.array(golden_gray).reshape(WIDTH, HEIGHT), cmap='gray')
+  plt.imshow(np.array(golden_gray).reshape(HEIGHT, WIDTH), cmap='gray')
   plt.axis('off')
   plt.title("Image after gray filter")
 
   plt.subplot(2, 2, 3)
-  plt.imshow(np.array(median_output_pixels).reshape(WIDTH, HEIGHT), cmap='gray')
+  plt.imshow(np.array(median_output_pixels).reshape(HEIGHT, WIDTH), cmap='gray')
   plt.axis('off')
   plt.title("Image after median filter")
 
   plt.subplot(2, 2, 4)
-  plt.imshow(np.array(sobel_output_pixels).reshape(WIDTH, HEIGHT), cmap='gray')
+  plt.imshow(np.array(sobel_output_pixels).reshape(HEIGHT, WIDTH), cmap='gray')
   plt.axis('off')
   plt.title("Image after sobel filter")
 
@@ -141,12 +148,14 @@ def time_counter(WIDTH=WIDTH,
   return end_time_internal - start_time_internal
 
 CIRCLE = 1
-time_total = 0
-time_onecircle = 0
 
-for i in range(CIRCLE):
-  time_onecircle = time_counter(image_path="D:/Documents/Vivado/ImageProcess/ImageProcess.srcs/sim_1/new/test.jpg")
-  time_total = time_total + time_onecircle
+if __name__ == "__main__":
+  SIM_DIR = os.path.dirname(os.path.abspath(__file__))  # test.jpg lives next to this script
+  time_total = 0
+  time_onecircle = 0
 
-print(f"Total circle: {CIRCLE} | The average time consuming in Python Code for Image Process is: {time_total/100.0} seconds.")
+  for i in range(CIRCLE):
+    time_onecircle = time_counter(image_path=os.path.join(SIM_DIR, "test.jpg"), show=(i == CIRCLE - 1))
+    time_total = time_total + time_onecircle
 
+  print(f"Total circle: {CIRCLE} | The average time consuming in Python Code for Image Process is: {time_total/CIRCLE} seconds.")
@@ -0,0 +1,79 @@
+`timescale 1ns / 1ps
+//////////////////////////////////////////////////////////////////////////////////
+// Company: UESTC
+// Engineer: Yen Xu
+// 
+// Create Date: 2026/10/17 10:31:52
+// Design Name: Behavioral model of the IDDR primitive
+// Module Name: IDDR
+// Project Name: Image Process
+// Target Devices: Xilinx Artix-7
+// Tool Versions: Vivado 2023.2 / Icarus Verilog
+// Description: Xilinx 7系列IDDR原语的行为级模型，仅用于开源仿真器（run_testbenches.py），
+// 安装了Vivado时也可改用其unisims库
+// 
+// Dependencies: None
+// 
+// Revision:
+// Revision 0.01 - File Created
+// Additional Comments:
+// 1. "OPPOSITE_EDGE"：Q1在上升沿更新为该沿采样的D，Q2在下降沿更新为该沿采样的D
+// 2. "SAME_EDGE"：Q1、Q2均在上升沿更新，Q1为本次上升沿采样的D，Q2为上一个下降沿采样的D
+// 3. "SAME_EDGE_PIPELINED"：Q1、Q2均在上升沿更新，分别为上一个上升沿、上一个下降沿采样的D（同一周期的一对数据）
+//////////////////////////////////////////////////////////////////////////////////
+
+
+module IDDR #(
+    parameter DDR_CLK_EDGE = "OPPOSITE_EDGE",   // "OPPOSITE_EDGE", "SAME_EDGE" or "SAME_EDGE_PIPELINED"
+    parameter INIT_Q1 = 1'b0,                   // Q1的初值
+    parameter INIT_Q2 = 1'b0,                   // Q2的初值
+    parameter SRTYPE = "SYNC"                   // "SYNC" or "ASYNC"
+    )(
+    output reg Q1,                              // 上升沿数据
+    output reg Q2,                              // 下降沿数据
+    input C,                                    // 时钟
+    input CE,                                   // 时钟使能
+    input D,                                    // DDR输入
+    input R,                                    // 复位
+    input S                                     // 置位
+    );
+
+    reg d_rise = INIT_Q1;                       // 上升沿采样
+    reg d_fall = INIT_Q2;                       // 下降沿采样
+
+    wire async_sr = (SRTYPE == "ASYNC") && (R || S);
+
+    initial begin
+        Q1 = INIT_Q1;
+        Q2 = INIT_Q2;
+    end
+
+    always @(posedge C or posedge async_sr)
+        if (R || S) begin
+            Q1 <= !R;
+            Q2 <= !R;
+            d_rise <= !R;
+        end
+        else if (CE) begin
+            d_rise <= D;
+            if (DDR_CLK_EDGE == "SAME_EDGE_PIPELINED") begin
+                Q1 <= d_rise;
+                Q2 <= d_fall;
+            end
+            else if (DDR_CLK_EDGE == "SAME_EDGE") begin
+                Q1 <= D;
+                Q2 <= d_fall;
+            end
+            else
+                Q1 <= D;
+        end
+
+    always @(negedge C or posedge async_sr)
+        if (async_sr)
+            d_fall <= !R;
+        else if (CE) begin
+            d_fall <= D;
+            if (DDR_CLK_EDGE == "OPPOSITE_EDGE")
+                Q2 <= D;
+        end
+endmodule
@@ -0,0 +1,65 @@
+`timescale 1ns / 1ps
+//////////////////////////////////////////////////////////////////////////////////
+// Company: UESTC
+// Engineer: Yen Xu
+// 
+// Create Date: 2026/10/17 10:20:05
+// Design Name: Behavioral model of the ODDR primitive
+// Module Name: ODDR
+// Project Name: Image Process
+// Target Devices: Xilinx Artix-7
+// Tool Versions: Vivado 2023.2 / Icarus Verilog
+// Description: Xilinx 7系列ODDR原语的行为级模型，仅用于开源仿真器（run_testbenches.py），
+// 安装了Vivado时也可改用其unisims库
+// 
+// Dependencies: None
+// 
+// Revision:
+// Revision 0.01 - File Created
+// Additional Comments:
+// 1. "SAME_EDGE"：D1、D2均在C的上升沿采样，Q在上升沿后输出D1，下降沿后输出D2
+// 2. "OPPOSITE_EDGE"：D1在上升沿采样，D2在下降沿采样
+// 3. SRTYPE为"SYNC"时R、S在C的上升沿生效，"ASYNC"时立即生效
+//////////////////////////////////////////////////////////////////////////////////
+
+
+module ODDR #(
+    parameter DDR_CLK_EDGE = "OPPOSITE_EDGE",   // "OPPOSITE_EDGE" or "SAME_EDGE"
+    parameter INIT = 1'b0,                      // Q的初值
+    parameter SRTYPE = "SYNC"                   // "SYNC" or "ASYNC"
+    )(
+    output Q,                                   // DDR输出
+    input C,                                    // 时钟
+    input CE,                                   // 时钟使能
+    input D1,                                   // 上升沿数据
+    input D2,                                   // 下降沿数据
+    input R,                                    // 复位
+    input S                                     // 置位
+    );
+
+    reg q_rise = INIT;                          // 上升沿后输出的数据
+    reg q_fall = INIT;                          // 下降沿后输出的数据
+    reg d2_rise = INIT;                         // SAME_EDGE：上升沿采样的D2
+    reg out = INIT;
+
+    wire async_sr = (SRTYPE == "ASYNC") && (R || S);
+
+    always @(posedge C or posedge async_sr)
+        if (R || S) begin
+            q_rise <= !R;
+            d2_rise <= !R;
+        end
+        else if (CE) begin
+            q_rise <= D1;
+            d2_rise <= D2;
+        end
+
+    always @(negedge C or posedge async_sr)
+        if (async_sr)
+            q_fall <= !R;
+        else if (CE)
+            q_fall <= (DDR_CLK_EDGE == "SAME_EDGE") ? d2_rise : D2;
+
+    always @(*) out = C ? q_rise : q_fall;
+    assign Q = out;
+endmodule
@@ -0,0 +1,143 @@
+`timescale 1ns / 1ps
+//////////////////////////////////////////////////////////////////////////////////
+// Company: UESTC
+// Engineer: Yen Xu
+// 
+// Create Date: 2026/10/17 10:45:18
+// Design Name: Behavioral model of the ethernet_dcfifo IP
+// Module Name: ethernet_dcfifo
+// Project Name: Image Process
+// Target Devices: Xilinx Artix-7
+// Tool Versions: Vivado 2023.2 / Icarus Verilog
+// Description: sources/ip/ethernet_dcfifo（FIFO Generator，独立时钟Block RAM，8 bit * 4096，
+// First Word Fall Through，异步复位）的行为级模型，仅用于开源仿真器（run_testbenches.py）
+// 
+// Dependencies: None
+// 
+// Revision:
+// Revision 0.01 - File Created
+// Additional Comments:
+// 1. 读写指针以格雷码经两级寄存器同步到对侧时钟域（C_SYNCHRONIZER_STAGE = 2），
+//    因此empty、full及data count的更新与IP一样有数拍的跨时钟域延迟
+// 2. FWFT：非空时dout即为队首数据，rd_en有效时弹出
+// 3. rst释放后wr_rst_busy、rd_rst_busy保持RST_BUSY_CYCLES拍，期间的读写被忽略
+//*4. 该模型只保证功能与IP一致，各标志位的精确时序以Vivado仿真为准
+//////////////////////////////////////////////////////////////////////////////////
+
+
+module ethernet_dcfifo #(
+    parameter DATA_WIDTH = 8,               // 数据位宽
+    parameter ADDR_WIDTH = 12,              // 深度 = 2^ADDR_WIDTH = 4096
+    parameter RST_BUSY_CYCLES = 8           // 复位释放后的忙等待拍数
+    )(
+    input rst,                              // 异步复位，高电平有效
+    input wr_clk,                           // 写时钟
+    input rd_clk,                           // 读时钟
+    input [DATA_WIDTH-1:0] din,             // 写入数据
+    input wr_en,                            // 写使能
+    input rd_en,                            // 读使能
+    output [DATA_WIDTH-1:0] dout,           // 读出数据（FWFT）
+    output full,                            // 满信号
+    output empty,                           // 空信号
+    output [ADDR_WIDTH-1:0] rd_data_count,  // 读侧数据计数
+    output [ADDR_WIDTH-1:0] wr_data_count,  // 写侧数据计数
+    output wr_rst_busy,                     // 写复位忙
+    output rd_rst_busy                      // 读复位忙
+    );
+
+    localparam DEPTH = 1 << ADDR_WIDTH;
+
+    function [ADDR_WIDTH:0] bin2gray(input [ADDR_WIDTH:0] bin);
+        bin2gray = bin ^ (bin >> 1);
+    endfunction
+
+    function [ADDR_WIDTH:0] gray2bin(input [ADDR_WIDTH:0] gray);
+        integer n;
+        begin
+            gray2bin[ADDR_WIDTH] = gray[ADDR_WIDTH];
+            for (n=ADDR_WIDTH-1; n>=0; n=n-1)
+                gray2bin[n] = gray2bin[n+1] ^ gray[n];
+        end
+    endfunction
+
+    reg [DATA_WIDTH-1:0] mem [0:DEPTH-1];
+
+    //* Step 1. 复位同步及忙信号
+    reg [1:0] wr_rst_sync, rd_rst_sync;
+    reg [7:0] wr_busy_cnt, rd_busy_cnt;
+
+    always @(posedge wr_clk or posedge rst)
+        if (rst) begin
+            wr_rst_sync <= 2'b11;
+            wr_busy_cnt <= RST_BUSY_CYCLES;
+        end
+        else begin
+            wr_rst_sync <= {wr_rst_sync[0], 1'b0};
+            if (!wr_rst_sync[1] && wr_busy_cnt != 0)
+                wr_busy_cnt <= wr_busy_cnt - 1'b1;
+        end
+
+    always @(posedge rd_clk or posedge rst)
+        if (rst) begin
+            rd_rst_sync <= 2'b11;
+            rd_busy_cnt <= RST_BUSY_CYCLES;
+        end
+        else begin
+            rd_rst_sync <= {rd_rst_sync[0], 1'b0};
+            if (!rd_rst_sync[1] && rd_busy_cnt != 0)
+                rd_busy_cnt <= rd_busy_cnt - 1'b1;
+        end
+
+    assign wr_rst_busy = rst || wr_rst_sync[1] || (wr_busy_cnt != 0);
+    assign rd_rst_busy = rst || rd_rst_sync[1] || (rd_busy_cnt != 0);
+
+    //* Step 2. 写侧
+    reg [ADDR_WIDTH:0] wr_ptr, wr_ptr_gray;         // 多一位用于区分空、满
+    reg [ADDR_WIDTH:0] rd_ptr_gray_w1, rd_ptr_gray_w2;
+    wire [ADDR_WIDTH:0] rd_ptr_w = gray2bin(rd_ptr_gray_w2);
+    wire [ADDR_WIDTH:0] wr_count = wr_ptr - rd_ptr_w;
+
+    assign full = wr_rst_busy || (wr_count == DEPTH);
+    assign wr_data_count = wr_count[ADDR_WIDTH-1:0];
+
+    always @(posedge wr_clk or posedge rst)
+        if (rst) begin
+            wr_ptr <= 0;
+            wr_ptr_gray <= 0;
+            rd_ptr_gray_w1 <= 0;
+            rd_ptr_gray_w2 <= 0;
+        end
+        else begin
+            {rd_ptr_gray_w2, rd_ptr_gray_w1} <= {rd_ptr_gray_w1, rd_ptr_gray};
+            if (wr_en && !full) begin
+                mem[wr_ptr[ADDR_WIDTH-1:0]] <= din;
+                wr_ptr <= wr_ptr + 1'b1;
+                wr_ptr_gray <= bin2gray(wr_ptr + 1'b1);
+            end
+        end
+
+    //* Step 3. 读侧
+    reg [ADDR_WIDTH:0] rd_ptr, rd_ptr_gray;
+    reg [ADDR_WIDTH:0] wr_ptr_gray_r1, wr_ptr_gray_r2;
+    wire [ADDR_WIDTH:0] wr_ptr_r = gray2bin(wr_ptr_gray_r2);
+    wire [ADDR_WIDTH:0] rd_count = wr_ptr_r - rd_ptr;
+
+    assign empty = rd_rst_busy || (rd_count == 0);
+    assign rd_data_count = rd_count[ADDR_WIDTH-1:0];
+    assign dout = empty ? {DATA_WIDTH{1'b0}} : mem[rd_ptr[ADDR_WIDTH-1:0]];    // Use_Dout_Reset，复位值为0
+
+    always @(posedge rd_clk or posedge rst)
+        if (rst) begin
+            rd_ptr <= 0;
+            rd_ptr_gray <= 0;
+            wr_ptr_gray_r1 <= 0;
+            wr_ptr_gray_r2 <= 0;
+        end
+        else begin
+            {wr_ptr_gray_r2, wr_ptr_gray_r1} <= {wr_ptr_gray_r1, wr_ptr_gray};
+            if (rd_en && !empty) begin
+                rd_ptr <= rd_ptr + 1'b1;
+                rd_ptr_gray <= bin2gray(rd_ptr + 1'b1);
+            end
+        end
+endmodule
@@ -0,0 +1,55 @@
+`timescale 1ns / 1ps
+//////////////////////////////////////////////////////////////////////////////////
+// Company: UESTC
+// Engineer: Yen Xu
+// 
+// Create Date: 2026/10/17 11:02:37
+// Design Name: Behavioral model of the rgmii2gmii_clk_pll IP
+// Module Name: rgmii2gmii_clk_pll
+// Project Name: Image Process
+// Target Devices: Xilinx Artix-7
+// Tool Versions: Vivado 2023.2 / Icarus Verilog
+// Description: sources/ip/rgmii2gmii_clk_pll（Clocking Wizard，125MHz输入，125MHz、90°相移输出）的行为级模型，
+// 仅用于开源仿真器（run_testbenches.py）
+// 
+// Dependencies: None
+// 
+// Revision:
+// Revision 0.01 - File Created
+// Additional Comments:
+// 1. clk_out为clk_in延时1/4周期（90°），locked在复位释放LOCK_CYCLES个输入时钟后拉高
+// 2. 复位期间及锁定之前clk_out保持低电平
+//////////////////////////////////////////////////////////////////////////////////
+
+
+module rgmii2gmii_clk_pll #(
+    parameter real PERIOD_NS = 8.0,         // 输入时钟周期（125MHz）
+    parameter LOCK_CYCLES = 16              // 锁定所需的输入时钟周期数
+    )(
+    input clk_in,                           // 输入时钟
+    input reset,                            // 复位，高电平有效
+    output reg clk_out,                     // 90°相移输出时钟
+    output reg locked                       // 锁定标志
+    );
+
+    integer lock_cnt;
+
+    initial begin
+        clk_out = 1'b0;
+        locked = 1'b0;
+        lock_cnt = 0;
+    end
+
+    always @(posedge clk_in or posedge reset)
+        if (reset) begin
+            lock_cnt <= 0;
+            locked <= 1'b0;
+        end
+        else if (lock_cnt < LOCK_CYCLES)
+            lock_cnt <= lock_cnt + 1;
+        else
+            locked <= 1'b1;
+
+    always @(clk_in)
+        clk_out <= #(PERIOD_NS / 4) (clk_in && locked);
+endmodule
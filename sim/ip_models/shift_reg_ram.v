@@ -0,0 +1,56 @@
+`timescale 1ns / 1ps
+//////////////////////////////////////////////////////////////////////////////////
+// Company: UESTC
+// Engineer: Yen Laurent
+// 
+// Create Date: 2026/10/17 10:12:40
+// Design Name: Behavioral model of the RAM-based Shift Register IP
+// Module Name: shift_reg_ram
+// Project Name: ImageProcess
+// Target Devices: Xilinx FPGA Artix-7
+// Tool Versions: Vivado 2023.2 / Icarus Verilog
+// Description: sources/ip/shift_reg_ram (Fixed_Length, Width 8, CE, RegLastBit) 的行为级模型，
+// 仅用于开源仿真器（run_testbenches.py），Vivado仿真仍使用IP核生成的仿真模型
+// 
+// Dependencies: None
+// 
+// Revision:
+// Revision 0.01 - File Created
+// Additional Comments:
+// 1. Q为Depth个有效（CE）时钟之前的D，初值为0（DefaultData = 0）
+//*2. IP核深度为640（两个IP级联缓存1280像素的一行）；以200*200图像仿真时，一行只有200像素，
+//*   需在编译时定义SHIFT_REG_RAM_DEPTH = WIDTH/2（run_testbenches.py会自动传入）
+//////////////////////////////////////////////////////////////////////////////////
+
+`ifndef SHIFT_REG_RAM_DEPTH
+    `define SHIFT_REG_RAM_DEPTH 640
+`endif
+
+module shift_reg_ram #(
+    parameter WIDTH = 8,                        // 数据位宽
+    parameter DEPTH = `SHIFT_REG_RAM_DEPTH      // 移位深度（包括最后一级输出寄存器）
+    )(
+    input [WIDTH-1:0] D,                        // 输入数据
+    input CLK,                                  // 时钟信号
+    input CE,                                   // 时钟使能信号
+    output reg [WIDTH-1:0] Q                    // 输出数据
+    );
+
+    // 以环形缓冲代替逐级移位：DEPTH-1级存储 + 1级输出寄存器
+    reg [WIDTH-1:0] mem [0:DEPTH-2];
+    integer ptr, k;
+
+    initial begin
+        Q = {WIDTH{1'b0}};
+        ptr = 0;
+        for (k=0; k<DEPTH-1; k=k+1)
+            mem[k] = {WIDTH{1'b0}};
+    end
+
+    always @(posedge CLK)
+        if (CE) begin
+            Q <= mem[ptr];                      // 最早写入的数据
+            mem[ptr] <= D;
+            ptr <= (ptr == DEPTH-2) ? 0 : ptr + 1;
+        end
+endmodule
@@ -6,7 +6,6 @@ reg vsync;
 reg href;
 reg [7:0] data;
 
-wire imagestate;
 wire datavalid;
 wire [15:0] datapixel;
 wire datahs;
@@ -21,7 +20,6 @@ DVP_Capture DVP_Capture(
   .Href(href),
   .Data(data),
 
-  .ImageState(imagestate),
   .DataValid(datavalid),
   .DataPixel(datapixel),
   .DataHs(datahs),
@@ -0,0 +1,421 @@
+"""
+Headless runner for the Verilog testbenches under sim/, with Icarus Verilog or Verilator.
+
+Every bench in BENCHES is compiled (iverilog, or verilator --binary --timing)
+and run (vvp, or the Verilator binary) in its own build directory
+(sim/build/<bench>/), several benches at a time. The sources of a bench are
+found by following module instantiations from the testbench through
+sources/rtl, sim/ip_models and the --models directories. sim/ip_models holds
+behavioral models standing in for the Vivado IP (ethernet_dcfifo,
+shift_reg_ram, rgmii2gmii_clk_pll) and the ODDR / IDDR primitives; a module
+found in a --models directory (e.g. Vivado export_simulation output and the
+unisims library) takes precedence over them.
+
+Compilation is cached under a sha256 of the simulator version, the defines
+and every source file; a bench whose compile key and stimulus / golden files
+are unchanged and that passed last time is not run again (--force reruns).
+
+A bench passes when the simulation reaches $finish, prints no "F A I L E D" /
+"Test failed", and, where the testbench dumps its outputs (DUMP_OUTPUT), those
+match the golden files: pixel by pixel for the image_process benches, byte
+by byte after the preamble for udp_send_tb (the golden has no FCS, so the
+FCS is not checked). The first mismatching pixel or byte is reported.
+
+    python run_testbenches.py                               # every bench, Icarus Verilog
+    python run_testbenches.py --simulator verilator -j 4
+    python run_testbenches.py sobel_tb udp_send_tb --force
+"""
+# Dependencies
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SIM_DIR, "image_process"))
+from golden_io import parse_hex, read_hex     # noqa: E402
+from golden_model import WIDTH                # noqa: E402
+
+# Hyperparameter
+ROOT_DIR = os.path.dirname(SIM_DIR)
+RTL_DIR = os.path.join(ROOT_DIR, "sources", "rtl")
+MODEL_DIR = os.path.join(SIM_DIR, "ip_models")
+BUILD_DIR = os.path.join(SIM_DIR, "build")
+TIMEOUT = 600               # s of wall time per simulation
+FAIL_RE = re.compile(r"F A I L E D|Test failed")
+IMAGE_DEFINES = {"DUMP_OUTPUT": None, "SHIFT_REG_RAM_DEPTH": WIDTH // 2}    # two shift_reg_ram per line
+ETH_HEADER_FIELDS = ((14, "Ethernet header"), (34, "IP header"), (42, "UDP header"))
+VERILATOR_FLAGS = ("--binary", "--timing", "-Wno-fatal", "-Wno-lint", "-Wno-style")
+
+
+@dataclass(frozen=True)
+class Bench:
+    """One testbench: the file, its top module and what it reads and is checked against."""
+    name: str
+    tb: str                             # relative to sim/
+    inputs: tuple = ()                  # files copied next to the simulation ($readmemh)
+    defines: dict = field(default_factory=dict)
+    goldens: tuple = ()                 # (dumped output, golden relative to sim/, "pixels" | "gmii")
+    stop_ns: int = None                 # for testbenches without $finish
+
+
+def _image(name, inputs, golden):
+    return Bench(name, f"image_process/{name}.v", tuple(f"image_process/{f}" for f in inputs), IMAGE_DEFINES,
+                 ((f"{name}_output.txt", f"image_process/{golden}", "pixels"),))
+
+
+BENCHES = (
+    _image("rgb2gray_tb", ("r_input.txt", "g_input.txt", "b_input.txt", "gray_golden.txt"), "gray_golden.txt"),
+    _image("gray_through_median_filter_tb", ("gray_golden.txt", "median_golden.txt"), "median_golden.txt"),
+    _image("sobel_tb", ("median_golden.txt", "sobel_golden.txt"), "sobel_golden.txt"),
+    _image("image_process_top_tb", ("r_input.txt", "g_input.txt", "b_input.txt", "sobel_golden.txt"), "sobel_golden.txt"),
+    Bench("udp_send_tb", "ethernet/udp_send_tb.v", defines={"DUMP_OUTPUT": None},
+          goldens=(("udp_send_tb_output.txt", "ethernet/udp_send_tb_golden.txt", "gmii"),)),
+    Bench("image_eth_formatter_tb", "ethernet/image_eth_formatter_tb.v",
+          inputs=("ethernet/image_eth_formatter_v1_golden.txt", "ethernet/image_eth_formatter_v2_golden.txt")),
+    Bench("ethernet_tb", "ethernet/ethernet_tb.v"),
+    Bench("ip_checksum_tb", "ethernet/ip_checksum_tb.v"),
+    Bench("gmii2rgmii_tb", "ethernet/gmii2rgmii_tb.v"),
+    Bench("rgmii2gmii_tb", "ethernet/rgmii2gmii_tb.v"),
+    Bench("mdio_transmit_tb", "ethernet/mdio_transmit_tb.v"),
+    Bench("phy_reg_config_tb", "ethernet/phy_reg_config_tb.v"),
+    Bench("dvp_tb", "ov5640/dvp_tb.v", stop_ns=400_000),    # 15 frames of 16x12, no $finish
+)
+
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_MODULE_RE = re.compile(r"^\s*module\s+(\w+)", re.M)
+_INSTANCE_RE = re.compile(r"\b([A-Za-z_]\w*)\s*(?:#|[A-Za-z_]\w*\s*\()")     # "module #(" or "module inst ("
+
+
+def _code(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+      return _COMMENT_RE.sub(" ", f.read())
+
+
+def module_index(model_dirs=()):
+    """{module name: file} of every module under sources/rtl, sim/ip_models and the model directories (last wins)."""
+    index = {}
+    groups = [glob.glob(os.path.join(RTL_DIR, "**", "*.v"), recursive=True), glob.glob(os.path.join(MODEL_DIR, "*.v"))]
+    groups += [glob.glob(os.path.join(directory, "**", "*.v"), recursive=True) for directory in model_dirs]
+    for paths in groups:
+        for path in sorted(paths):
+            for name in _MODULE_RE.findall(_code(path)):
+                index[name] = path
+    return index
+
+
+def bench_sources(tb_path, index):
+    """The testbench plus every file defining a module it (transitively) instantiates."""
+    sources, pending = [tb_path], [tb_path]
+    while pending:
+        identifiers = set(_INSTANCE_RE.findall(_code(pending.pop())))
+        for name in sorted(identifiers & index.keys()):
+            if index[name] not in sources:
+                sources.append(index[name])
+                pending.append(index[name])
+    return sources
+
+
+def top_module(tb_path):
+    return _MODULE_RE.search(_code(tb_path)).group(1)
+
+
+def sha256_files(paths, h=None):
+    h = h or hashlib.sha256()
+    for path in paths:
+        h.update(os.path.relpath(path, ROOT_DIR).replace(os.sep, "/").encode() + b"\0")
+        with open(path, 'rb') as f:
+          h.update(f.read())
+    return h
+
+
+# ---------------------------------------------------------------- simulators
+
+@dataclass(frozen=True)
+class Simulator:
+    """How to compile and run a bench: Icarus Verilog (iverilog + vvp) or Verilator (--binary)."""
+    kind: str                           # "iverilog" | "verilator"
+    compiler: str                       # path of iverilog / verilator
+    runtime: str = None                 # path of vvp (Icarus only)
+
+    def version(self):
+        result = subprocess.run([self.compiler, "-V" if self.kind == "iverilog" else "--version"],
+                                capture_output=True, text=True)
+        out = result.stdout or result.stderr
+        return out.splitlines()[0] if out else self.compiler
+
+    def compile_cmd(self, top, sources, defines, work, image):
+        macros = [f"-D{k}" if v is None else f"-D{k}={v}" for k, v in sorted(defines.items())]
+        if self.kind == "iverilog":
+            return [self.compiler, "-g2012", "-o", image, "-s", top, *macros, *sources]
+        trace = ["--trace"] if "DUMP_VCD" in defines else []     # $dumpvars is a no-op without it
+        return [self.compiler, *VERILATOR_FLAGS, *trace, "--top-module", top, "--Mdir", os.path.join(work, "obj_dir"),
+                "-o", os.path.basename(image), *macros, *sources]
+
+    def image(self, work, name):
+        if self.kind == "iverilog":
+            return os.path.join(work, name + ".vvp")
+        return os.path.join(work, "obj_dir", name)
+
+    def run_cmd(self, image):
+        return [self.runtime, "-n", image] if self.kind == "iverilog" else [image]
+
+
+def find_simulator(kind, iverilog="iverilog", vvp="vvp", verilator="verilator"):
+    """A Simulator with resolved tool paths, or None if a tool is missing."""
+    if kind == "iverilog":
+        iverilog, vvp = shutil.which(iverilog), shutil.which(vvp)
+        return Simulator(kind, iverilog, vvp) if iverilog and vvp else None
+    verilator = shutil.which(verilator)
+    return Simulator(kind, verilator) if verilator else None
+
+
+# ---------------------------------------------------------------- golden diffs
+
+def diff_pixels(output, golden, width=WIDTH):
+    """None if the dumped pixels equal the golden ones, else a description of the first mismatch."""
+    got, want = read_hex(output), read_hex(golden)
+    n = min(got.size, want.size)
+    bad = np.flatnonzero(got[:n] != want[:n])
+    if bad.size:
+        i = int(bad[0])
+        return (f"{bad.size} of {n} pixels differ, first at pixel {i} (row {i // width}, col {i % width}): "
+                f"expected {want[i]:02X}, got {got[i]:02X}")
+    if got.size != want.size:
+        return f"{got.size} output pixels for {want.size} golden pixels"
+    return None
+
+
+def read_gmii_frames(path):
+    """The frames of a udp_send_tb dump (hex byte per line, blank line after each frame), preamble included."""
+    with open(path, 'rb') as f:
+      blocks = re.split(rb"\n\s*\n", f.read())
+    return [parse_hex(b"\n".join(block.split()) + b"\n") for block in blocks if block.strip()]
+
+
+def read_byte_golden(path):
+    """Bytes of a "0xc8, 0x5b, ..." golden file (udp_send_tb_golden.txt) as uint8."""
+    with open(path, 'rb') as f:
+      digits = re.findall(rb"0x([0-9a-fA-F]{2})", f.read())
+    return np.frombuffer(bytes.fromhex(b"".join(digits).decode()), dtype=np.uint8)
+
+
+def _field(offset):
+    for end, name in ETH_HEADER_FIELDS:
+        if offset < end:
+            return name
+    return "user data"
+
+
+def diff_gmii(output, golden):
+    """Compare the first frame sent on GMII with the golden frame (destination MAC .. user data)."""
+    frames = read_gmii_frames(output)
+    if not frames:
+        return "no frame was sent (gmii_tx_en never rose)"
+    frame = frames[0]
+    sfd = np.flatnonzero(frame[:8] == 0xD5)
+    if sfd.size == 0 or not (frame[:sfd[0]] == 0x55).all():
+        return f"frame does not start with preamble + SFD: {frame[:8].tobytes().hex(' ')}"
+    body = frame[sfd[0] + 1:]
+    want = read_byte_golden(golden)
+    n = min(body.size, want.size)
+    bad = np.flatnonzero(body[:n] != want[:n])
+    if bad.size:
+        i = int(bad[0])
+        return (f"{bad.size} of {want.size} bytes differ, first at byte {i} ({_field(i)}): "
+                f"expected {want[i]:02x}, got {body[i]:02x}")
+    if body.size < want.size:
+        return f"frame has {body.size} bytes after the SFD, golden {want.size}"
+    return None
+
+
+DIFFS = {"pixels": diff_pixels, "gmii": diff_gmii}
+
+
+# ---------------------------------------------------------------- running
+
+def run_bench(bench, index, build_dir, sim, version, force=False, extra_defines=None):
+    """Compile (if needed), run and check one bench. Returns a result dict."""
+    start = time.perf_counter()
+    tb_path = os.path.join(SIM_DIR, bench.tb)
+    work = os.path.join(build_dir, bench.name)
+    os.makedirs(work, exist_ok=True)
+    defines = {**bench.defines, **(extra_defines or {})}
+    sources = bench_sources(tb_path, index)
+
+    h = hashlib.sha256(json.dumps([version, sorted(defines.items()), bench.stop_ns]).encode())
+    compile_key = sha256_files(sources, h).hexdigest()
+    data_files = [os.path.join(SIM_DIR, p) for p in bench.inputs] + [os.path.join(SIM_DIR, g[1]) for g in bench.goldens]
+    run_key = sha256_files(data_files, hashlib.sha256(compile_key.encode())).hexdigest()
+
+    cache_file = os.path.join(work, "cache.json")
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r') as f:
+          cache = json.load(f)
+    image = sim.image(work, bench.name)
+    if not force and cache.get("run_key") == run_key and cache.get("status") == "PASS":
+        return {**cache, "cached": True, "wall": time.perf_counter() - start}
+
+    result = {"name": bench.name, "compile_key": compile_key, "run_key": run_key, "cached": False,
+              "compile_s": 0.0, "run_s": 0.0, "detail": ""}
+    if force or cache.get("compile_key") != compile_key or not os.path.exists(image):
+        top = top_module(tb_path)
+        if bench.stop_ns is not None:
+            # Wrap the testbench in a top module that ends the simulation
+            stop = os.path.join(work, "sim_stop.v")
+            with open(stop, 'w') as f:
+              f.write(f"`timescale 1ns / 1ps\nmodule sim_stop;\n    {top} {top}();\n"
+                      f"    initial #{bench.stop_ns} $finish;\nendmodule\n")
+            top, sources = "sim_stop", [stop] + sources
+        t = time.perf_counter()
+        proc = subprocess.run(sim.compile_cmd(top, sources, defines, work, image), capture_output=True, text=True)
+        result["compile_s"] = time.perf_counter() - t
+        with open(os.path.join(work, "compile.log"), 'w') as f:
+          f.write(proc.stdout + proc.stderr)
+        if proc.returncode != 0:
+            lines = (proc.stderr + proc.stdout).splitlines()
+            first = next((line for line in lines if "%Error" in line), next((line for line in lines if line.strip()), ""))
+            return _finish(result, cache_file, "ERROR", f"compile failed: {first}", start)
+        result["compiled"] = True
+
+    for p in bench.inputs:
+        shutil.copyfile(os.path.join(SIM_DIR, p), os.path.join(work, os.path.basename(p)))
+    for output, _, _ in bench.goldens:
+        if os.path.exists(os.path.join(work, output)):
+            os.remove(os.path.join(work, output))
+    t = time.perf_counter()
+    try:
+        proc = subprocess.run(sim.run_cmd(image), cwd=work, capture_output=True, text=True, timeout=TIMEOUT)
+    except subprocess.TimeoutExpired:
+        result["run_s"] = time.perf_counter() - t
+        return _finish(result, cache_file, "TIMEOUT", f"no $finish within {TIMEOUT} s", start)
+    result["run_s"] = time.perf_counter() - t
+    log = proc.stdout + proc.stderr
+    with open(os.path.join(work, "run.log"), 'w') as f:
+      f.write(log)
+
+    if proc.returncode != 0:
+        return _finish(result, cache_file, "FAIL", f"simulation exited with {proc.returncode}", start)
+    if "$finish" not in log:
+        return _finish(result, cache_file, "FAIL", "simulation ended without $finish", start)
+    failed = FAIL_RE.search(log)
+    if failed:
+        line = log[log.rfind("\n", 0, failed.start()) + 1:].split("\n", 1)[0].strip()
+        return _finish(result, cache_file, "FAIL", line, start)
+    for output, golden, kind in bench.goldens:
+        path = os.path.join(work, output)
+        if not os.path.exists(path):
+            return _finish(result, cache_file, "FAIL", f"{output} was not written", start)
+        mismatch = DIFFS[kind](path, os.path.join(SIM_DIR, golden))
+        if mismatch:
+            return _finish(result, cache_file, "FAIL", f"{os.path.basename(golden)}: {mismatch}", start)
+    checked = ", ".join(os.path.basename(g[1]) for g in bench.goldens)
+    return _finish(result, cache_file, "PASS", f"matches {checked}" if checked else "", start)
+
+
+def _finish(result, cache_file, status, detail, start):
+    result.update(status=status, detail=detail, wall=time.perf_counter() - start)
+    with open(cache_file, 'w') as f:
+      json.dump({k: v for k, v in result.items() if k != "cached"}, f, indent=1)
+    return result
+
+
+def run(names=None, jobs=None, force=False, build_dir=BUILD_DIR, sim=None, extra_defines=None, model_dirs=()):
+    """
+    Run the selected benches (all by default) in parallel and print a summary.
+
+    Args:
+        names (list): bench names, see BENCHES.
+        jobs (int): simulations at a time, default os.cpu_count().
+        force (bool): recompile and rerun even if cached.
+        sim (Simulator): default Icarus Verilog from the PATH.
+        extra_defines (dict): added to every bench, e.g. {"DUMP_VCD": None}.
+        model_dirs (list): directories searched for IP / primitive simulation models before sim/ip_models.
+
+    Returns:
+        bool: every bench passed.
+    """
+    sim = sim or find_simulator("iverilog")
+    if sim is None:
+        print("Error: simulator not found, install Icarus Verilog or Verilator (or pass --iverilog / --vvp / --verilator)")
+        return False
+    benches = [b for b in BENCHES if not names or b.name in names]
+    unknown = set(names or ()) - {b.name for b in BENCHES}
+    if unknown:
+        print(f"Error: unknown bench(es) {', '.join(sorted(unknown))}; --list shows them")
+        return False
+    version = sim.version()
+    index = module_index(model_dirs)
+    build_dir = os.path.abspath(os.path.join(build_dir, sim.kind) if sim.kind != "iverilog" else build_dir)
+    print(f"{version}: {len(benches)} benches, {jobs or os.cpu_count()} at a time")
+
+    start = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+      futures = {pool.submit(run_bench, b, index, build_dir, sim, version, force, extra_defines): b
+                 for b in benches}
+      for future in as_completed(futures):
+        bench = futures[future]
+        try:
+            results[bench.name] = future.result()
+        except Exception as e:
+            results[bench.name] = {"status": "ERROR", "detail": str(e), "wall": 0.0, "cached": False}
+        r = results[bench.name]
+        print(f"  {bench.name} {r['status']}{' (cached)' if r['cached'] else ''}")
+
+    print(f"\n{'bench':<32}{'status':<10}{'wall':>9}  detail")
+    for bench in benches:
+        r = results[bench.name]
+        status = r["status"] + ("*" if r["cached"] else "")
+        print(f"{bench.name:<32}{status:<10}{r['wall']:>8.2f}s  {r['detail']}")
+    passed = sum(r["status"] == "PASS" for r in results.values())
+    print(f"\n{passed} / {len(benches)} passed in {time.perf_counter() - start:.2f} s (* = cached, not rerun)")
+    print("Test ****P A S S E D****" if passed == len(benches) else "Test ****F A I L E D****")
+    return passed == len(benches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and run the Verilog testbenches with Icarus Verilog or Verilator.")
+    parser.add_argument("benches", nargs="*", help="bench names (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the benches and their sources")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parallel simulations (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="ignore the cache")
+    parser.add_argument("--build", default=BUILD_DIR, help="build / cache directory")
+    parser.add_argument("--models", nargs="+", default=[], metavar="DIR",
+                        help="directories with simulation models of the Vivado IP and ODDR / IDDR primitives, "
+                             "used instead of sim/ip_models")
+    parser.add_argument("--vcd", action="store_true", help="define DUMP_VCD (ethernet_tb.vcd, image_process_top_tb.vcd)")
+    parser.add_argument("--simulator", choices=("iverilog", "verilator"), default="iverilog")
+    parser.add_argument("--iverilog", default="iverilog")
+    parser.add_argument("--vvp", default="vvp")
+    parser.add_argument("--verilator", default="verilator")
+    args = parser.parse_args()
+
+    if args.list:
+        index = module_index(args.models)
+        for bench in BENCHES:
+            sources = bench_sources(os.path.join(SIM_DIR, bench.tb), index)
+            print(f"{bench.name}: " + " ".join(os.path.relpath(p, ROOT_DIR) for p in sources))
+        return
+    sim = find_simulator(args.simulator, args.iverilog, args.vvp, args.verilator)
+    if sim is None:
+        print(f"Error: {args.simulator} not found (pass --iverilog / --vvp / --verilator)")
+        sys.exit(1)
+    ok = run(args.benches, args.jobs, args.force, args.build, sim,
+             {"DUMP_VCD": None} if args.vcd else None, args.models)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@
 //!4. 该模块认为输入数据有效信号与hsync信号是同步的，即在行同步信号有效时，数据有效信号也是有效的，这或许需要后续对摄像头模块、图像预处理模块的信号进行调整
 //!   最好是直接在摄像头模块的输出端加上缓冲器以控制数据输出，使得valid信号与hsync信号同步，不再有valid无效的情况，这样可以最大限度避免出错
 //!   当然，这会不可避免地将图像处理模块的时钟再次拉低
+// 5. PROTOCOL_VERSION = 2时每LINES_PER_PACKET行图像打包为一个以太网帧（6字节报头 + K行像素），详见image_eth_formatter.v
+//    DATA_LENGTH随协议自动计算，IMAGE_HEIGHT须能被LINES_PER_PACKET整除
 //////////////////////////////////////////////////////////////////////////////////
 
 
@@ -35,7 +37,10 @@ module ethernet #(
     parameter [31:0] SRC_IP = 32'hc0_a8_00_02,          // 源IP地址，默认为192.168.0.2
     parameter [15:0] DES_UDP_PORT = 16'd6102,           // 目标UDP端口号，默认为6102
     parameter [15:0] SRC_UDP_PORT = 16'd5000,           // 源UDP端口号，默认为5000
-    parameter [15:0] DATA_LENGTH = IMAGE_WIDTH / 8 + 2  // 用户单帧数据长度（不包含任何报头）
+    parameter PROTOCOL_VERSION = 1,                     // 图像数据打包协议：1为每行一帧，2为每LINES_PER_PACKET行一帧
+    parameter LINES_PER_PACKET = 9,                     // 协议v2下每个以太网帧包含的行数，9行共1446字节
+    parameter [15:0] DATA_LENGTH = (PROTOCOL_VERSION == 2) ? 6 + LINES_PER_PACKET * IMAGE_WIDTH / 8
+                                                        : IMAGE_WIDTH / 8 + 2  // 用户单帧数据长度（不包含任何报头）
     )(
     input clk_pixel,            //*像素时钟，由OV5640提供，但需分频
     input clk_eth,              // 以太网发送时钟，125MHz
@@ -60,7 +65,10 @@ module ethernet #(
     wire fifo_write_req;        // FIFO写入请求信号
     wire fifo_aclr;             // FIFO异步清零信号
 
-    image_eth_formatter image_eth_formatter_inst(
+    image_eth_formatter #(
+        .PROTOCOL_VERSION (PROTOCOL_VERSION),
+        .LINES_PER_PACKET (LINES_PER_PACKET)
+    ) image_eth_formatter_inst(
         // inputs
         .clk_pixel       (clk_pixel),
         .rst_n           (rst_n),
@@ -15,6 +15,7 @@
 // 
 // Revision:
 // Revision 0.01 - File Created
+// Revision 0.02 - 增加协议v2：多行打包为一个以太网帧，报头中加入版本号、行数及帧计数器
 // Additional Comments:
 // 1. 该模块以行为单位对图像进行打包，并对每一行进行编号，编号位宽为2字节，置于每行像素最前方
 // 2. 采用FIFO缓冲区存储打包后的数据，便于后续的以太网发送模块处理
@@ -31,10 +32,20 @@
 //*   行同步信号在每行传输完成后拉低（无效）
 //!8. 该模块认为输入数据有效信号与hsync信号是同步的，即在行同步信号有效时，数据有效信号也是有效的，这或许需要后续对摄像头模块、图像预处理模块的信号进行调整
 // 9. 首先发送行号的第八位，而后发送行号的高八位
+//*10. 协议v2（PROTOCOL_VERSION = 2）：每LINES_PER_PACKET行打包为一个以太网帧，仅在每组首行前写入6字节报头：
+//*    [版本号 = 2][行数K][帧计数低8位][帧计数高8位][首行行号低8位][首行行号高8位]，随后为K行像素数据
+//*    以太网每帧传输数据大小为6 + K*1280/8字节，K = 9时为1446字节，不超过1500字节MTU，且720可被9整除
+//*    帧计数器在每帧图像结束（场同步信号拉低）时加一，上位机据此直接区分各帧
+//!11. 协议v2下像素数据延迟HEADER_BYTES + 1 = 7拍写入FIFO（非组首行同样等待6拍，只是不写入报头），
+//!    因此行与行之间、帧与帧之间至少需要间隔7拍时钟周期；IMAGE_HEIGHT必须能被LINES_PER_PACKET整除，
+//!    否则每帧最后一组数据不足一个以太网帧，会与下一帧的数据混在一起发送
 //////////////////////////////////////////////////////////////////////////////////
 
 
-module image_eth_formatter(
+module image_eth_formatter #(
+    parameter PROTOCOL_VERSION = 1,     // 1: 每行一个以太网帧（2字节行号）；2: 每LINES_PER_PACKET行一个以太网帧（6字节报头）
+    parameter LINES_PER_PACKET = 9      // 协议v2下每个以太网帧包含的行数
+    )(
     input clk_pixel,            // 像素时钟
     input rst_n,                // 复位信号，低有效
     input valid,                // 输入数据有效标志
@@ -48,15 +59,25 @@ module image_eth_formatter(
     );
 
     //* Step 1: 变量声明
+    localparam HEADER_BYTES = (PROTOCOL_VERSION == 2) ? 6 : 2;  // 每行像素数据前的报头发送拍数
+    localparam DELAY = HEADER_BYTES + 1;                        // 像素数据延迟拍数
+
     reg [15:0] line_count;      // 行计数器，用于记录当前行号
-    reg [2:0] hsync_reg;        // 行同步信号寄存器，用于处理行同步信号的延时
-    reg [2:0] sobel_reg;        // SOBEL输出像素寄存器，用于在发送行号的时候对像素数据进行寄存
-                                // 发送行号需要2拍，状态机切换需要1拍，因此寄存3位
+    reg [15:0] frame_count;     // 帧计数器（协议v2），每帧图像结束时加一
+    reg [7:0] group_line;       // 当前行在本组（本以太网帧）中的序号（协议v2）
+    reg vsync_reg;              // 场同步信号寄存器，用于检测一帧图像结束
+    reg [DELAY-1:0] hsync_reg;  // 行同步信号寄存器，用于处理行同步信号的延时
+    reg [DELAY-1:0] sobel_reg;  // SOBEL输出像素寄存器，用于在发送行号的时候对像素数据进行寄存
+                                // 发送报头需要HEADER_BYTES拍，状态机切换需要1拍，因此寄存HEADER_BYTES + 1位
+                                // 协议v1下报头为2字节行号，即寄存3位
+
+    wire send_header = (PROTOCOL_VERSION != 2) || (group_line == 8'd0); // 协议v2下仅组首行写入报头
 
     //* Step 2: 行同步信号及SOBEL像素寄存
     always @(posedge clk_pixel) begin
-        hsync_reg <= {hsync_reg[1:0], hsync};         // 行同步信号寄存，便于得知此时发送数据的状态
-        sobel_reg <= {sobel_reg[1:0], sobel};         // SOBEL像素数据寄存，便于在头部发送行号
+        hsync_reg <= {hsync_reg[DELAY-2:0], hsync};   // 行同步信号寄存，便于得知此时发送数据的状态
+        sobel_reg <= {sobel_reg[DELAY-2:0], sobel};   // SOBEL像素数据寄存，便于在头部发送行号
+        vsync_reg <= vsync;
     end
 
     //* Step 3: FIFO清零信号控制
@@ -99,29 +120,39 @@ module image_eth_formatter(
                 end
 
                 SEND_LINE: begin
-                    if (cnt_send >= 1) begin
+                    if (cnt_send >= HEADER_BYTES - 1) begin
                         cnt_send <= 4'b0;
                         state <= SEND_PIXEL;        // 发送行号后进入发送像素数据状态
                     end
                     else
                         cnt_send <= cnt_send + 1'b1;// 发送计数器加一
 
-                    write_data <= cnt_send == 0 ? line_count[7:0] : line_count[15:8]; // 发送行号的低8位和高8位
-                    write_req <= 1'b1;              // 发送行号时请求写入始终是有效的
+                    if (PROTOCOL_VERSION == 2)
+                        case (cnt_send)             // 协议v2报头：版本号、行数、帧计数、首行行号（均为低字节在前）
+                            4'd0: write_data <= 8'd2;
+                            4'd1: write_data <= LINES_PER_PACKET;
+                            4'd2: write_data <= frame_count[7:0];
+                            4'd3: write_data <= frame_count[15:8];
+                            4'd4: write_data <= line_count[7:0];
+                            default: write_data <= line_count[15:8];
+                        endcase
+                    else
+                        write_data <= cnt_send == 0 ? line_count[7:0] : line_count[15:8]; // 发送行号的低8位和高8位
+                    write_req <= send_header;       // 发送行号时请求写入始终是有效的（协议v2下非组首行只等待，不写入）
                     //? 可能需要在cnt_send == 1时将write_req清零以满足时序，即可能需要将write_req整体前移一拍（目前来看不需要）
                 end
 
                 SEND_PIXEL: begin
                     if (cnt_send >= 7) begin
                         cnt_send <= 4'b0;
-                        if (!(hsync_reg[2] || hsync_reg[1])) // 此处逻辑可以根据需要更改为if (!(hsync_reg[2] || hsync))，这是最严格的条件
+                        if (!(hsync_reg[DELAY-1] || hsync_reg[DELAY-2])) // 此处逻辑可以根据需要更改为if (!(hsync_reg[DELAY-1] || hsync))，这是最严格的条件
                             state <= IDLE;          // 如果hsync在延时3拍后为0，意味着当前行（包括行号）已经发送完毕
                     end
                     else
                         cnt_send <= cnt_send + 1'b1;
 
                     write_req <= (cnt_send >= 7) ? 1'b1 : 1'b0;     // 在发送像素数据时，只有在计数器达到7时才发送请求
-                    write_data <= {write_data[6:0], sobel_reg[2]};  // SOBEL像素数据不断移位
+                    write_data <= {write_data[6:0], sobel_reg[DELAY-1]};  // SOBEL像素数据不断移位
                     //* 该状态的本质仍然是8 bit串入并出移位寄存器
                 end
             endcase
@@ -135,4 +166,19 @@ module image_eth_formatter(
         else if ({hsync_reg[0], hsync} == 2'b10)    
             line_count <= line_count + 1'b1;    // 当当前行（不含行号）发送完毕时，行计数器加一
 
+    //* Step 7: 组内行序号及帧计数器更新（协议v2）
+    always @(posedge clk_pixel or negedge rst_n)
+        if (!rst_n)
+            group_line <= 8'd0;
+        else if (!vsync)
+            group_line <= 8'd0;                 // 每帧从组首行开始
+        else if ({hsync_reg[0], hsync} == 2'b10)
+            group_line <= (group_line >= LINES_PER_PACKET - 1) ? 8'd0 : group_line + 1'b1;
+
+    always @(posedge clk_pixel or negedge rst_n)
+        if (!rst_n)
+            frame_count <= 16'd0;
+        else if ({vsync_reg, vsync} == 2'b10)
+            frame_count <= frame_count + 1'b1;  // 场同步信号拉低，一帧图像发送完毕
+
 endmodule